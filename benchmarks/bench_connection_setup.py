@@ -0,0 +1,94 @@
+'''
+Benchmark of the per call overhead of the connection setup.
+
+Before the tuning profiles every Connection method executed
+``PRAGMA foreign_keys = ON`` and assigned the row factory of the connection
+before its query. Now both are done once when the connection is opened. This
+benchmark runs the same methods both ways on the same connection. The rows
+are built by the record factories of the cursors either way, the old rows are
+compared in bench_records.
+
+Users and rooms are served from the replica and booking lists of rooms from
+the cache of the Engine, which would hide the queries. The cache is disabled
+and the replica is emptied before every call, in both ways, so every call
+runs its SELECT.
+
+Run it from the project folder:
+
+    $ python -m benchmarks.bench_connection_setup [--repeat N]
+'''
+import argparse
+import sqlite3
+import sys
+
+from reservation import database
+from benchmarks.common import create_database, remove_database, measure
+
+REPEAT = 20000
+
+
+def uncached(engine, method):
+    '''
+    Returns a function that runs ``method`` with the replica of ``engine``
+    emptied first, so the tables are read from the database.
+
+    '''
+    def call():
+        engine.replica.clear()
+        method()
+    return call
+
+
+def per_call_setup(connection, method, foreign_keys):
+    '''
+    Returns a function that runs ``method`` the way it was run before the
+    tuning profiles: row factory, and foreign keys if ``foreign_keys`` is
+    ``True``, set before every call.
+
+    '''
+    def call():
+        if foreign_keys:
+            connection.set_foreign_keys_support()
+        connection.con.row_factory = sqlite3.Row
+        method()
+    return call
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.bench_connection_setup",
+                                     description="Per call overhead of the connection setup.")
+    parser.add_argument("--repeat", type=int, default=REPEAT,
+                        help="calls of each method, default %d" % REPEAT)
+    args = parser.parse_args(argv)
+    repeat = args.repeat
+
+    db_path = create_database()
+    try:
+        engine = database.Engine(db_path, booking_cache_size=0)
+        connection = engine.connect()
+        # get_users and get_rooms did not activate the foreign keys
+        calls = [
+            ("get_users", uncached(engine, connection.get_users), False),
+            ("get_rooms", uncached(engine, connection.get_rooms), False),
+            ("get_bookings", connection.get_bookings, True),
+            ("get_bookings(roomname)", lambda: connection.get_bookings("Aspire"), True)
+        ]
+        print "Per call overhead, %d calls each (microseconds per call)" % repeat
+        print "%-24s %12s %12s %10s" % ("method", "per call", "once", "saved")
+        for name, method, foreign_keys in calls:
+            before = measure(per_call_setup(connection, method, foreign_keys), repeat)
+            after = measure(method, repeat)
+            print "%-24s %12.2f %12.2f %9.1f%%" % (name, before, after,
+                                                   100.0 * (before - after) / before)
+        connection.close()
+
+        # Cost paid once per connection
+        opened = measure(lambda: engine.connect().close(), repeat / 10)
+        print "Opening a connection with profile '%s': %.2f us" % (engine.profile_name, opened)
+    finally:
+        remove_database(db_path)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
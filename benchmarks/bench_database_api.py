@@ -0,0 +1,215 @@
+'''
+Micro-benchmarks of the methods of Connection.
+
+Each method is timed call by call on synthetic databases of the sizes of
+benchmarks.datagen, and the 50th, 95th and 99th percentiles of the latency
+and the calls per second are reported. Writing methods work on their own
+rows: add_booking books hours far after the generated bookings,
+modify_booking moves those bookings and delete_booking removes them, and
+delete_user removes the users created by add_user.
+
+The results can be saved as a JSON baseline. When a baseline exists, every
+method whose median latency grew more than the threshold is flagged as a
+regression and the exit status is 1. Baselines depend on the machine, they
+are not kept in the repository.
+
+Run it from the project folder:
+
+    $ python -m benchmarks.bench_database_api --sizes 1k 10k --save
+    $ python -m benchmarks.bench_database_api --sizes 1k 10k
+'''
+import argparse
+import datetime
+import json
+import os
+import platform
+import sqlite3
+import sys
+import timeit
+
+from reservation import database
+from benchmarks import datagen
+from benchmarks.common import create_database, remove_database, percentile
+
+SIZES = ("1k", "10k", "100k")
+DEFAULT_BASELINE = "benchmarks/baseline_database_api.json"
+# Growth of the median latency over the baseline flagged as a regression
+THRESHOLD = 0.25
+# Each method is called at most CALLS times or for SECONDS seconds, but at
+# least MIN_CALLS times
+CALLS = 1000
+SECONDS = 2.0
+MIN_CALLS = 5
+# Time of the first booking added by the benchmark, after any generated one
+FIRST_BOOKING = datetime.datetime(2100, 1, 1)
+# Bookings of a page of the room, as the API reads them
+PAGE_SIZE = 100
+BOOKING_DICT = {"firstname": "Bench", "lastname": "Mark", "email": "bench@example.com",
+                "contactnumber": "0400000000"}
+
+
+def run_case(function, calls=CALLS, seconds=SECONDS):
+    '''
+    Calls ``function`` with the number of each call, one call at a time.
+
+    :return: the latencies in microseconds, sorted.
+    :rtype: list
+
+    '''
+    timer = timeit.default_timer
+    samples = []
+    deadline = timer() + seconds
+    for number in xrange(calls):
+        if number >= MIN_CALLS and timer() > deadline:
+            break
+        start = timer()
+        function(number)
+        samples.append((timer() - start) * 1000000.0)
+    samples.sort()
+    return samples
+
+
+def summary(samples):
+    '''
+    Returns the statistics of the latencies of a method.
+    '''
+    mean = sum(samples) / len(samples)
+    return {"calls": len(samples), "mean_us": mean, "p50_us": percentile(samples, 0.5),
+            "p95_us": percentile(samples, 0.95), "p99_us": percentile(samples, 0.99),
+            "ops": 1000000.0 / mean}
+
+
+def bench_size(size, seed=datagen.DEFAULT_SEED):
+    '''
+    Times the methods of Connection on a synthetic database.
+
+    :param str size: One of :py:data:`benchmarks.datagen.SIZES`.
+    :return: the statistics of each method, as ``(name, statistics)``.
+    :rtype: list
+
+    '''
+    db_path = create_database(populate=False)
+    try:
+        users, rooms, bookings = datagen.SIZES[size]
+        datagen.generate(db_path, users, rooms, bookings, seed)
+        connection = database.Engine(db_path).connect()
+        # The most popular room and the most active user of the data set
+        roomname = datagen.ROOM_NAMES[0]
+        username = connection.con.execute("SELECT username FROM Users ORDER BY userID LIMIT 1").fetchone()[0]
+        room = connection.get_room(roomname)
+        added = []
+
+        def booking_time(number, days=0):
+            return FIRST_BOOKING + datetime.timedelta(days=days, hours=number)
+
+        def add_booking(number):
+            booking = connection.add_booking(roomname, username, booking_time(number), BOOKING_DICT)
+            added.append(booking[0])
+
+        def modify_booking(number):
+            booking_dict = dict(BOOKING_DICT, bookingID=added[number], roomname=roomname,
+                                username=username, bookingTime=booking_time(number, days=365))
+            connection.modify_booking(added[number], roomname, username, booking_dict["bookingTime"],
+                                      booking_dict)
+
+        def modify_room(number):
+            connection.modify_room(roomname, {"picture": room["picture"],
+                                              "resources": "%s, Bench %d" % (room["resources"], number % 2)})
+
+        cases = [
+            ("get_users", lambda number: connection.get_users(), CALLS),
+            ("get_rooms", lambda number: connection.get_rooms(), CALLS),
+            ("get_bookings", lambda number: connection.get_bookings(), CALLS),
+            ("get_bookings(roomname)", lambda number: connection.get_bookings(roomname), CALLS),
+            # A page of the room, kept by the booking lists cache
+            ("get_bookings(page)", lambda number: connection.get_bookings(roomname, order="bookingTime",
+                                                                          limit=PAGE_SIZE), CALLS),
+            ("add_booking", add_booking, CALLS),
+            # The bookings added by add_booking
+            ("modify_booking", modify_booking, None),
+            ("delete_booking", lambda number: connection.delete_booking(added[number]), None),
+            ("add_user", lambda number: connection.add_user("benchuser%d" % number, {}), CALLS),
+            # The users added by add_user
+            ("delete_user", lambda number: connection.delete_user("benchuser%d" % number), None),
+            ("modify_room", modify_room, CALLS)
+        ]
+        results = []
+        samples = []
+        for name, function, calls in cases:
+            # Without a number of calls, as many as the method before
+            samples = run_case(function, len(samples) if calls is None else calls)
+            results.append((name, summary(samples)))
+        connection.close()
+    finally:
+        remove_database(db_path)
+    return results
+
+
+def compare(results, baseline):
+    '''
+    Compares the median latencies with a baseline.
+
+    :return: the ratio of each method to its baseline, as ``{size: {name:
+        ratio}}``. Methods which are not in the baseline are left out.
+    :rtype: dict
+
+    '''
+    ratios = {}
+    for size, methods in results.iteritems():
+        for name, stats in methods.iteritems():
+            before = baseline.get(size, {}).get(name)
+            if before:
+                ratios.setdefault(size, {})[name] = stats["p50_us"] / before["p50_us"]
+    return ratios
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.bench_database_api",
+                                     description="Micro-benchmarks of the methods of Connection.")
+    parser.add_argument("--sizes", nargs="+", choices=sorted(datagen.SIZES), default=list(SIZES))
+    parser.add_argument("--seed", type=int, default=datagen.DEFAULT_SEED)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="JSON file of the baseline")
+    parser.add_argument("--save", action="store_true", help="save the results as the baseline")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD,
+                        help="growth of the median flagged as a regression, default %.2f" % THRESHOLD)
+    args = parser.parse_args(argv)
+
+    baseline = {}
+    if os.path.exists(args.baseline) and not args.save:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)["results"]
+    results = {}
+    regressions = 0
+    for size in args.sizes:
+        print "%s: %d users, %d rooms, %d bookings" % ((size,) + datagen.SIZES[size])
+        print "%-24s %7s %11s %11s %11s %11s %9s" % ("method", "calls", "p50 (us)", "p95 (us)",
+                                                    "p99 (us)", "ops per s", "baseline")
+        methods = bench_size(size, args.seed)
+        results[size] = dict(methods)
+        ratios = compare({size: results[size]}, baseline).get(size, {})
+        for name, stats in methods:
+            flag = ""
+            if name in ratios:
+                flag = "%8.2fx" % ratios[name]
+                if ratios[name] > 1 + args.threshold:
+                    flag += " REGRESSION"
+                    regressions += 1
+            print "%-24s %7d %11.1f %11.1f %11.1f %11.0f %s" % (name, stats["calls"], stats["p50_us"],
+                                                              stats["p95_us"], stats["p99_us"],
+                                                              stats["ops"], flag)
+        print
+
+    if args.save:
+        with open(args.baseline, "w") as baseline_file:
+            json.dump({"created": datetime.datetime.now().strftime("%Y-%m-%d %H:%M"),
+                       "python": platform.python_version(), "sqlite": sqlite3.sqlite_version,
+                       "results": results}, baseline_file, indent=2, sort_keys=True)
+        print "Baseline saved in %s" % args.baseline
+    elif regressions:
+        print "%d regressions over %.0f%% against %s" % (regressions, args.threshold * 100, args.baseline)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
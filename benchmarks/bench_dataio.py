@@ -0,0 +1,99 @@
+'''
+Benchmark of the bulk import and export of reservation.dataio.
+
+A database with synthetic bookings is exported to CSV and NDJSON, and each
+file is imported into an empty database. The throughput and the growth of the
+resident memory are reported for every step, each one runs in a forked
+process so that its memory is measured alone. The files are written to a
+temporary folder and removed at the end.
+
+Run it from the project folder, the number of bookings can be given as an
+argument:
+
+    $ python -m benchmarks.bench_dataio [bookings]
+'''
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+
+from reservation import dataio
+from benchmarks.common import create_database, populate, remove_database
+
+USERS = 1000
+ROOMS = 100
+BOOKINGS = 10000000
+
+
+def run_step(step):
+    '''
+    Runs a step in a forked process.
+
+    :return: the number of rows, the time in seconds and the growth of the
+        maximum resident memory in MB.
+    :rtype: tuple
+
+    '''
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        start = time.time()
+        count = step()
+        elapsed = time.time() - start
+        after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        os.write(write_fd, "%d %f %f" % (count, elapsed, (after - before) / 1024.0))
+        os._exit(0)
+    os.close(write_fd)
+    result = os.read(read_fd, 1024).split()
+    os.close(read_fd)
+    os.waitpid(pid, 0)
+    return int(result[0]), float(result[1]), float(result[2])
+
+
+def export_step(db_path, path, file_format):
+    def step():
+        with open(path, "wb") as stream:
+            return dataio.export_table(db_path, "bookings", stream, file_format)
+    return step
+
+
+def import_step(db_path, path, file_format):
+    def step():
+        with open(path, "rb") as stream:
+            return dataio.import_table(db_path, "bookings", stream, file_format)
+    return step
+
+
+def main(bookings=BOOKINGS):
+    folder = tempfile.mkdtemp(prefix="tellus_bench_")
+    db_path = create_database(populate=False)
+    try:
+        populate(db_path, USERS, ROOMS, bookings)
+        print "%d bookings" % bookings
+        print "%-8s %-7s %10s %10s %14s %12s" % ("step", "format", "count", "time (s)",
+                                                "rows per s", "memory (MB)")
+        for file_format in ("csv", "ndjson"):
+            path = os.path.join(folder, "bookings." + file_format)
+            target = create_database(populate=False)
+            try:
+                # Bookings need their users and rooms
+                populate(target, USERS, ROOMS)
+                for name, step in (("export", export_step(db_path, path, file_format)),
+                                   ("import", import_step(target, path, file_format))):
+                    count, elapsed, memory = run_step(step)
+                    print "%-8s %-7s %10d %10.1f %14.0f %12.1f" % (name, file_format, count, elapsed,
+                                                                   count / elapsed, memory)
+            finally:
+                remove_database(target)
+                os.remove(path)
+    finally:
+        remove_database(db_path)
+        shutil.rmtree(folder)
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:2]])
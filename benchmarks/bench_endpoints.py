@@ -0,0 +1,380 @@
+'''
+Load harness of the HTTP endpoints of reservation.resources.
+
+Every route of the API is driven in turn by concurrent client threads, then a
+mixed workload of reads and new bookings is run. For each endpoint the
+requests per second and the 50th, 95th and 99th percentiles of the latency
+are reported, with the number of unexpected responses. The database is a
+synthetic data set of benchmarks.datagen.
+
+Requests are sent either through the Flask test client, which measures the
+application alone, or over HTTP to a local threaded WSGI server, which adds
+the server and the sockets.
+
+Writing endpoints work on their own rows: users and bookings are created by
+the POST requests, and the PUT and DELETE requests modify and remove them.
+
+With --compress the responses are compressed by the application and the
+clients ask for them with Accept-Encoding. With --bandwidth every client
+receives the responses over a link of that many kB per second: the time to
+transfer the body, as it was sent, is added to the latency. The kilobytes
+received per request are reported.
+
+Run it from the project folder:
+
+    $ python -m benchmarks.bench_endpoints --size 10k --threads 8
+    $ python -m benchmarks.bench_endpoints --transport server --threads 16 --wal
+    $ python -m benchmarks.bench_endpoints --bandwidth 256 --compress gzip
+'''
+import argparse
+import collections
+import datetime
+import httplib
+import itertools
+import json
+import random
+import sys
+import threading
+import time
+import timeit
+import zlib
+
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+from reservation import database, resources
+from benchmarks import datagen
+from benchmarks.common import create_database, remove_database, percentile
+
+THREADS = 4
+# Requests sent to each endpoint, and in the mixed workload
+REQUESTS = 500
+MIXED_REQUESTS = 5000
+# Bookings in one request to the bookings collection
+BULK_SIZE = 10
+# Times of the bookings added by the harness, after any generated one
+FIRST_BOOKING = datetime.datetime(2100, 1, 1)
+FIRST_BULK_BOOKING = datetime.datetime(2200, 1, 1)
+FIRST_MIXED_BOOKING = datetime.datetime(2300, 1, 1)
+# Share of each endpoint in the mixed workload
+MIX = [("GET room bookings", 40), ("GET rooms", 20), ("GET user bookings", 15),
+       ("GET bookings", 10), ("GET history", 5), ("POST room booking", 10)]
+
+Endpoint = collections.namedtuple("Endpoint", "name method request expected created")
+# Window bits of zlib by content coding
+WBITS = dict(resources.COMPRESSION_ENCODINGS)
+
+
+def receive(data, encoding, bandwidth):
+    '''
+    Waits the time the body takes over a link of ``bandwidth`` kB per second,
+    if any, and decompresses it.
+
+    :param str data: The body as it was sent.
+    :param str encoding: The Content-Encoding of the response, or None.
+    :return: the body.
+    :rtype: str
+
+    '''
+    if bandwidth:
+        time.sleep(len(data) / (bandwidth * 1024.0))
+    if encoding in WBITS:
+        return zlib.decompress(data, WBITS[encoding])
+    return data
+
+
+def request_headers(body, accept_encoding):
+    '''
+    Returns the headers of a request.
+    '''
+    headers = {"Content-Type": resources.JSON} if body is not None else {}
+    if accept_encoding:
+        headers["Accept-Encoding"] = accept_encoding
+    return headers
+
+
+class TestClientTransport(object):
+    '''
+    Sends the requests through the Flask test client, one client per thread.
+    '''
+    def __init__(self, app, accept_encoding=None, bandwidth=0):
+        self.app = app
+        self.accept_encoding = accept_encoding
+        self.bandwidth = bandwidth
+        self.local = threading.local()
+
+    def request(self, method, path, body=None):
+        '''
+        :return: the status code, the Location header, the body and the size
+            of the body as it was sent.
+        :rtype: tuple
+        '''
+        client = getattr(self.local, "client", None)
+        if client is None:
+            client = self.local.client = self.app.test_client()
+        resp = client.open(path, method=method, data=body,
+                           headers=request_headers(body, self.accept_encoding))
+        # Streamed collections are read to the end
+        data = resp.get_data()
+        return (resp.status_code, resp.headers.get("Location"),
+                receive(data, resp.headers.get("Content-Encoding"), self.bandwidth), len(data))
+
+    def close(self):
+        pass
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    '''
+    Request handler which does not log every request.
+    '''
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+class ServerTransport(object):
+    '''
+    Runs the application in a local threaded WSGI server and sends the
+    requests over HTTP, one connection per request.
+    '''
+    def __init__(self, app, accept_encoding=None, bandwidth=0, host="127.0.0.1"):
+        self.host = host
+        self.accept_encoding = accept_encoding
+        self.bandwidth = bandwidth
+        self.server = make_server(host, 0, app, threaded=True, request_handler=QuietRequestHandler)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def request(self, method, path, body=None):
+        '''
+        :return: the status code, the Location header, the body and the size
+            of the body as it was sent.
+        :rtype: tuple
+        '''
+        con = httplib.HTTPConnection(self.host, self.server.server_port)
+        try:
+            con.request(method, path, body, request_headers(body, self.accept_encoding))
+            resp = con.getresponse()
+            data = resp.read()
+            return (resp.status, resp.getheader("Location"),
+                    receive(data, resp.getheader("Content-Encoding"), self.bandwidth), len(data))
+        finally:
+            con.close()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def booking_body(roomname, user, booking_time):
+    '''
+    Returns the body of a new booking.
+    '''
+    return {"name": roomname, "username": user["username"],
+            "bookingTime": database.format_booking_time(booking_time),
+            "email": user["email"], "familyName": user["lastname"],
+            "givenName": user["firstname"], "telephone": user["contactnumber"]}
+
+
+def get_endpoints(rooms, user):
+    '''
+    Returns the endpoints of the API, in the order in which they are driven.
+    Each one builds the request number ``n`` of its run as ``(path, body)``.
+    Bookings created by a POST are kept for the PUT and DELETE requests.
+
+    :param list rooms: The rooms of the database, the first one is the most
+        popular.
+    :param dict user: The user of the bookings.
+
+    '''
+    roomname = rooms[0]["roomname"]
+    # Bookings added by the harness, as (room, id), by request number
+    created = {}
+    bulk_created = {}
+    url = "/tellus/api"
+
+    def room_booking(first):
+        def request(n):
+            room = rooms[n % len(rooms)]["roomname"]
+            booking_time = first + datetime.timedelta(hours=n // len(rooms))
+            return "%s/rooms/%s/bookings/" % (url, room), booking_body(room, user, booking_time)
+        return request
+
+    def created_booking(n, location, data):
+        room = rooms[n % len(rooms)]["roomname"]
+        created[n] = (room, int(location.rstrip("/").rsplit("/", 1)[1]))
+
+    def bulk_request(n):
+        return "%s/bookings/" % url, [
+            booking_body(rooms[(n * BULK_SIZE + i) % len(rooms)]["roomname"], user,
+                         FIRST_BULK_BOOKING + datetime.timedelta(hours=(n * BULK_SIZE + i) // len(rooms)))
+            for i in xrange(BULK_SIZE)]
+
+    def created_bulk(n, location, data):
+        bulk_created[n] = [item["bookingID"] for item in json.loads(data)["items"] if item["status"] == 201]
+
+    def modify_booking(n):
+        room, booking_id = created[n]
+        booking_time = database.format_booking_time(FIRST_BOOKING + datetime.timedelta(days=365 * 50, hours=n))
+        return "%s/rooms/%s/bookings/%d/" % (url, room, booking_id), {
+            "bookingID": booking_id, "roomname": room, "username": user["username"],
+            "bookingTime": booking_time, "firstname": user["firstname"], "lastname": user["lastname"],
+            "email": user["email"], "contactnumber": user["contactnumber"]}
+
+    def new_user(n):
+        username = "benchuser%d" % n
+        return "%s/users/%s/" % (url, username), {
+            "isAdmin": 0, "username": username, "password": "pass", "email": "bench@example.com",
+            "firstname": "Bench", "lastname": "Mark", "contactNumber": "0400000000"}
+
+    return [
+        Endpoint("GET rooms", "GET", lambda n: ("%s/rooms/" % url, None), (200,), None),
+        Endpoint("GET bookings", "GET", lambda n: ("%s/bookings/" % url, None), (200,), None),
+        Endpoint("GET history", "GET", lambda n: ("%s/bookings/history/" % url, None), (200,), None),
+        Endpoint("GET room bookings", "GET",
+                 lambda n: ("%s/rooms/%s/bookings/" % (url, roomname), None), (200,), None),
+        Endpoint("GET user bookings", "GET",
+                 lambda n: ("%s/users/%s/bookings/" % (url, user["username"]), None), (200,), None),
+        Endpoint("POST user", "POST", new_user, (201,), None),
+        Endpoint("PUT room", "PUT", lambda n: ("%s/rooms/%s/" % (url, roomname), {
+            "name": roomname, "photo": rooms[0]["picture"],
+            "resources": "%s, Bench %d" % (rooms[0]["resources"], n % 2)}), (204,), None),
+        Endpoint("POST room booking", "POST", room_booking(FIRST_BOOKING), (201,), created_booking),
+        Endpoint("POST bookings", "POST", bulk_request, (200,), created_bulk),
+        Endpoint("PUT room booking", "PUT", modify_booking, (204,), None),
+        Endpoint("DELETE room booking", "DELETE",
+                 lambda n: ("%s/rooms/%s/bookings/%d/" % ((url,) + created[n]), None), (204,), None),
+        Endpoint("DELETE user booking", "DELETE",
+                 lambda n: ("%s/users/%s/bookings/%d/" % (url, user["username"], bulk_created[n][0]), None),
+                 (204,), None),
+        Endpoint("DELETE user", "DELETE", lambda n: ("%s/users/benchuser%d/" % (url, n), None), (204,), None),
+        # Only used by the mixed workload, after the bookings of the
+        # endpoint above
+        Endpoint("MIXED room booking", "POST", room_booking(FIRST_MIXED_BOOKING), (201,), None)
+    ]
+
+
+def run(transport, endpoints, requests, threads):
+    '''
+    Sends requests from concurrent threads. The request number ``n`` goes
+    to ``endpoints[n]``.
+
+    :return: the time taken in seconds, the latencies in seconds of each
+        endpoint, the number of unexpected responses of each endpoint and
+        the bytes received from each endpoint.
+    :rtype: tuple
+
+    '''
+    timer = timeit.default_timer
+    numbers = itertools.count()
+    latencies = collections.defaultdict(list)
+    errors = collections.defaultdict(int)
+    received = collections.defaultdict(int)
+
+    def client():
+        while True:
+            n = next(numbers)
+            if n >= requests:
+                return
+            endpoint = endpoints[n]
+            path, body = endpoint.request(n)
+            start = timer()
+            status, location, data, size = transport.request(endpoint.method, path,
+                                                             None if body is None else json.dumps(body))
+            latencies[endpoint.name].append(timer() - start)
+            received[endpoint.name] += size
+            if status not in endpoint.expected:
+                errors[endpoint.name] += 1
+            elif endpoint.created:
+                endpoint.created(n, location, data)
+
+    workers = [threading.Thread(target=client) for _ in xrange(threads)]
+    start = timer()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return timer() - start, latencies, errors, received
+
+
+def report(name, samples, errors, elapsed, received):
+    samples.sort()
+    print "%-24s %9d %7d %11.0f %10.2f %10.2f %10.2f %10.1f" % (
+        name, len(samples), errors, len(samples) / elapsed, percentile(samples, 0.5) * 1000,
+        percentile(samples, 0.95) * 1000, percentile(samples, 0.99) * 1000,
+        received / 1024.0 / len(samples))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.bench_endpoints",
+                                     description="Load harness of the HTTP endpoints of the API.")
+    parser.add_argument("--size", choices=sorted(datagen.SIZES), default="10k")
+    parser.add_argument("--seed", type=int, default=datagen.DEFAULT_SEED)
+    parser.add_argument("--transport", choices=("client", "server"), default="client",
+                        help="Flask test client or local WSGI server, default client")
+    parser.add_argument("--threads", type=int, default=THREADS)
+    parser.add_argument("--requests", type=int, default=REQUESTS, help="requests per endpoint")
+    parser.add_argument("--mixed", type=int, default=MIXED_REQUESTS, help="requests of the mixed workload")
+    parser.add_argument("--wal", action="store_true", help="use an Engine in WAL mode")
+    parser.add_argument("--compress", choices=["none"] + sorted(WBITS), default="none",
+                        help="content coding the clients accept, default none")
+    parser.add_argument("--bandwidth", type=float, default=0,
+                        help="kB per second received by each client, default unlimited")
+    args = parser.parse_args(argv)
+
+    db_path = create_database(populate=False)
+    transport = None
+    try:
+        users, rooms, bookings = datagen.SIZES[args.size]
+        datagen.generate(db_path, users, rooms, bookings, args.seed)
+        engine = database.Engine(db_path, pool_size=max(args.threads, database.DEFAULT_POOL_SIZE),
+                                 wal=args.wal)
+        connection = engine.connect()
+        room_list = connection.get_rooms()
+        # The first user is the most active one of the data set
+        user = dict(connection.get_users()[0])
+        connection.close()
+
+        accept_encoding = None if args.compress == "none" else args.compress
+        resources.app.config.update({"Engine": engine, "COMPRESSION": accept_encoding is not None})
+        resources.app.debug = False
+        if args.transport == "server":
+            transport = ServerTransport(resources.app, accept_encoding, args.bandwidth)
+        else:
+            transport = TestClientTransport(resources.app, accept_encoding, args.bandwidth)
+
+        endpoints = get_endpoints(room_list, user)
+        print "%s: %d users, %d rooms, %d bookings, %s transport, %d threads" % (
+            args.size, users, rooms, bookings, args.transport, args.threads)
+        print "compression %s, bandwidth %s" % (args.compress,
+                                                "%g kB/s" % args.bandwidth if args.bandwidth else "unlimited")
+        print "%-24s %9s %7s %11s %10s %10s %10s %10s" % ("endpoint", "requests", "errors", "req per s",
+                                                         "p50 (ms)", "p95 (ms)", "p99 (ms)", "kB per req")
+        for endpoint in endpoints[:-1]:
+            elapsed, latencies, errors, received = run(transport, [endpoint] * args.requests,
+                                                       args.requests, args.threads)
+            report(endpoint.name, latencies[endpoint.name], errors[endpoint.name], elapsed,
+                   received[endpoint.name])
+
+        # The new bookings of the mixed workload have their own times
+        by_name = dict((endpoint.name, endpoint) for endpoint in endpoints)
+        by_name["POST room booking"] = by_name["MIXED room booking"]._replace(name="POST room booking")
+        rng = random.Random(args.seed)
+        weights = datagen.cumulative([weight for _, weight in MIX])
+        mixed = [by_name[MIX[datagen.pick(rng, weights)][0]] for _ in xrange(args.mixed)]
+        elapsed, latencies, errors, received = run(transport, mixed, args.mixed, args.threads)
+        print
+        print "Mixed workload"
+        for name, _ in MIX:
+            if latencies[name]:
+                report(name, latencies[name], errors[name], elapsed, received[name])
+        report("total", sum(latencies.values(), []), sum(errors.values()), elapsed,
+               sum(received.values()))
+    finally:
+        if transport is not None:
+            transport.close()
+        remove_database(db_path)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,92 @@
+'''
+Benchmark of the JSON encoders of the responses.
+
+Builds booking envelopes of 10k and 100k items, the same Mason objects as the
+bookings collection, and encodes them with json.dumps of the standard library
+(the encoder used before the serialization layer) and with every encoder of
+resources.JSON_ENCODERS which is installed. Each envelope is encoded as one
+document and item by item, as a streamed collection is. The time, the size of
+the document and the items encoded per second are reported.
+
+Run it from the project folder:
+
+    $ python -m benchmarks.bench_json
+    $ python -m benchmarks.bench_json --sizes 10k --repeat 10
+'''
+import argparse
+import json
+import sys
+
+from reservation import resources
+from benchmarks.common import measure
+
+SIZES = ["10k", "100k"]
+REPEAT = 5
+ROOMS = 10
+USERS = 10
+
+
+def parse_size(size):
+    '''
+    Converts a size like 10k to a number of items.
+    '''
+    if size.endswith("k"):
+        return int(size[:-1]) * 1000
+    return int(size)
+
+
+def create_envelope(items):
+    '''
+    Returns an envelope of the bookings collection with the given number of
+    items.
+    '''
+    envelope = resources.ReservationObject()
+    envelope.add_namespace("tellus", resources.LINK_RELATIONS_URL)
+    envelope.add_control("self", href="/tellus/api/bookings/")
+    envelope.add_control_history_bookings()
+    envelope.add_control_add_bookings()
+    envelope["items"] = []
+    for booking_id in xrange(1, items + 1):
+        roomname = "room%d" % (booking_id % ROOMS)
+        item = resources.ReservationObject(bookingID=booking_id,
+                                           name=roomname,
+                                           username="user%d" % (booking_id % USERS),
+                                           bookingTime="2017-10-%02d %02d:00" % (booking_id % 28 + 1,
+                                                                                 booking_id % 24))
+        item.add_control("profile", href=resources.TELLUS_BOOKING_PROFILE)
+        item.add_control_delete_booking_of_room(roomname, booking_id)
+        envelope["items"].append(item)
+    return envelope
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.bench_json",
+                                     description="Time of the JSON encoders of the responses.")
+    parser.add_argument("--sizes", nargs="+", default=SIZES, help="items of the envelopes, e.g. 10k")
+    parser.add_argument("--repeat", type=int, default=REPEAT, help="encodings of each envelope")
+    args = parser.parse_args(argv)
+
+    encoders = [("json.dumps", json.dumps)]
+    for name, _ in resources.JSON_ENCODERS:
+        try:
+            encoders.append(resources.select_json_encoder([name]))
+        except ValueError:
+            print "%s is not installed" % name
+    print "Selected encoder: %s" % resources.JSON_ENCODER
+    print
+    print "%-8s %-12s %-9s %12s %12s %12s" % ("items", "encoder", "mode", "time (ms)", "size (kB)",
+                                             "items/s")
+    for size in args.sizes:
+        items = parse_size(size)
+        envelope = create_envelope(items)
+        for name, encode in encoders:
+            size_kb = len(encode(envelope)) / 1024.0
+            document = measure(lambda: encode(envelope), args.repeat) / 1000.0
+            streamed = measure(lambda: [encode(item) for item in envelope["items"]], args.repeat) / 1000.0
+            for mode, elapsed in (("document", document), ("items", streamed)):
+                print "%-8s %-12s %-9s %12.1f %12.1f %12.0f" % (size, name, mode, elapsed, size_kb,
+                                                               items * 1000.0 / elapsed)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
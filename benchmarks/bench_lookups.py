@@ -0,0 +1,60 @@
+'''
+Benchmark of the point lookups of Connection.
+
+Compares the way the resources checked that a user, a room or a booking
+exists (filtering the list of the whole table) with get_user, get_room and
+get_booking.
+
+Run it from the project folder, sizes can be given as arguments:
+
+    $ python -m benchmarks.bench_lookups [users] [rooms] [bookings]
+'''
+import sys
+import time
+
+from reservation import database
+from benchmarks.common import create_database, populate, remove_database, measure
+
+USERS = 100000
+ROOMS = 1000
+BOOKINGS = 1000000
+
+
+def main(users=USERS, rooms=ROOMS, bookings=BOOKINGS):
+    db_path = create_database(populate=False)
+    try:
+        start = time.time()
+        populate(db_path, users, rooms, bookings)
+        print "Populated %d users, %d rooms, %d bookings in %.1f s" % (users, rooms, bookings,
+                                                                       time.time() - start)
+        connection = database.Engine(db_path).connect()
+        username = "user%d" % (users - 1)
+        roomname = "room%d" % (rooms - 1)
+        booking_id = bookings
+        calls = [
+            ("user exists",
+             lambda: filter(lambda x: x["username"] == username, connection.get_users()),
+             lambda: connection.get_user(username)),
+            ("room exists",
+             lambda: filter(lambda x: x["roomname"] == roomname, connection.get_rooms()),
+             lambda: connection.get_room(roomname)),
+            ("booking of room exists",
+             lambda: filter(lambda x: x["bookingID"] == booking_id, connection.get_bookings(roomname)),
+             lambda: connection.get_booking(booking_id, roomname=roomname)),
+            ("booking exists",
+             lambda: filter(lambda x: x["bookingID"] == booking_id, connection.get_bookings()),
+             lambda: connection.get_booking(booking_id))
+        ]
+        print "%-24s %16s %16s %10s" % ("check", "filter (us)", "lookup (us)", "speedup")
+        for name, scan, lookup in calls:
+            # Whole table scans are slow, a few runs are enough
+            before = measure(scan, 3)
+            after = measure(lookup, 10000)
+            print "%-24s %16.1f %16.1f %9.0fx" % (name, before, after, before / after)
+        connection.close()
+    finally:
+        remove_database(db_path)
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:4]])
@@ -0,0 +1,102 @@
+'''
+Benchmark of the rows returned by Connection.get_bookings.
+
+Compares a dictionary per row, built from a sqlite3.Row as Connection did
+before, with the BookingRecord built by the cursor row factory. For each way
+the whole Bookings table is listed and the throughput and the growth of the
+resident memory while the list is held are reported. Every listing runs in a
+forked process so that the memory of one does not hide the other.
+
+Run it from the project folder, the number of bookings can be given as an
+argument:
+
+    $ python -m benchmarks.bench_records [bookings]
+'''
+import os
+import resource
+import sqlite3
+import sys
+import time
+
+from reservation import database
+from benchmarks.common import create_database, populate, remove_database
+
+USERS = 1000
+ROOMS = 100
+BOOKINGS = 1000000
+
+
+def dict_listing(connection):
+    '''
+    Lists the bookings with a sqlite3.Row and a dictionary per row.
+    '''
+    connection.con.row_factory = sqlite3.Row
+    cur = connection.con.cursor()
+    cur.execute('SELECT * FROM Bookings')
+    bookings = []
+    for row in cur.fetchall():
+        bookings.append({
+            "bookingID": row["bookingID"],
+            "roomname": row["roomName"],
+            "username": str(row["username"]),
+            "bookingTime": str(row["bookingTime"]),
+            "firstname": row["firstName"],
+            "lastname": row["lastName"],
+            "email": row["email"],
+            "contactnumber": row["contactNumber"]
+        })
+    return bookings
+
+
+def record_listing(connection):
+    '''
+    Lists the bookings with Connection.get_bookings.
+    '''
+    return connection.get_bookings()
+
+
+def run_listing(db_path, listing):
+    '''
+    Runs a listing in a forked process.
+
+    :return: the number of rows, the time in seconds and the growth of the
+        maximum resident memory in MB.
+    :rtype: tuple
+
+    '''
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        connection = database.Engine(db_path).connect()
+        before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        start = time.time()
+        bookings = listing(connection)
+        # Read one value of every row, as a handler would
+        for booking in bookings:
+            booking["bookingTime"]
+        elapsed = time.time() - start
+        after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        os.write(write_fd, "%d %f %f" % (len(bookings), elapsed, (after - before) / 1024.0))
+        os._exit(0)
+    os.close(write_fd)
+    result = os.read(read_fd, 1024).split()
+    os.close(read_fd)
+    os.waitpid(pid, 0)
+    return int(result[0]), float(result[1]), float(result[2])
+
+
+def main(bookings=BOOKINGS):
+    db_path = create_database(populate=False)
+    try:
+        populate(db_path, USERS, ROOMS, bookings)
+        print "%-10s %10s %10s %14s %12s" % ("rows", "count", "time (s)", "rows per s", "memory (MB)")
+        for name, listing in (("dict", dict_listing), ("record", record_listing)):
+            count, elapsed, memory = run_listing(db_path, listing)
+            print "%-10s %10d %10.2f %14.0f %12.1f" % (name, count, elapsed, count / elapsed, memory)
+    finally:
+        remove_database(db_path)
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:2]])
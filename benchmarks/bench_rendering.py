@@ -0,0 +1,79 @@
+'''
+Benchmark of the rendering of the booking collections.
+
+Measures the cost of one item of the booking lists of the API: a page of
+PAGE_SIZE bookings and a page of one booking are requested, and the
+difference divided by the extra bookings is the time spent per item to read
+the row, build its Mason object with its controls and serialize it. With
+--profile the functions which take most of the time of the big pages are
+listed.
+
+Run it from the project folder:
+
+    $ python -m benchmarks.bench_rendering
+    $ python -m benchmarks.bench_rendering --profile
+'''
+import argparse
+import cProfile
+import pstats
+import sys
+
+from reservation import database, resources
+from benchmarks.common import create_database, populate, remove_database, measure
+
+USERS = 10
+ROOMS = 10
+BOOKINGS = 20000
+PAGE_SIZE = resources.MAX_PAGE_SIZE
+REPEAT = 20
+# Functions listed by --profile
+PROFILE_LINES = 25
+ENDPOINTS = [("GET bookings", "/tellus/api/bookings/?limit=%d"),
+             ("GET room bookings", "/tellus/api/rooms/room0/bookings/?limit=%d"),
+             ("GET user bookings", "/tellus/api/users/user0/bookings/?limit=%d")]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.bench_rendering",
+                                     description="Cost per item of the booking collections.")
+    parser.add_argument("--repeat", type=int, default=REPEAT, help="requests of each page")
+    parser.add_argument("--profile", action="store_true", help="profile the big pages")
+    args = parser.parse_args(argv)
+
+    db_path = create_database(populate=False)
+    try:
+        populate(db_path, USERS, ROOMS, BOOKINGS)
+        resources.app.config.update({"Engine": database.Engine(db_path)})
+        resources.app.debug = False
+        client = resources.app.test_client()
+
+        def get(url):
+            resp = client.get(url)
+            resp.get_data()
+            assert resp.status_code == 200, url
+
+        print "%-20s %14s %14s %14s" % ("endpoint", "1 item (us)", "%d items (us)" % PAGE_SIZE,
+                                        "per item (us)")
+        for name, url in ENDPOINTS:
+            # Warm up the caches of the database and of the application
+            get(url % PAGE_SIZE)
+            small = measure(lambda: get(url % 1), args.repeat)
+            big = measure(lambda: get(url % PAGE_SIZE), args.repeat)
+            print "%-20s %14.1f %14.1f %14.2f" % (name, small, big, (big - small) / (PAGE_SIZE - 1))
+
+        if args.profile:
+            profiler = cProfile.Profile()
+            profiler.enable()
+            for name, url in ENDPOINTS:
+                for _ in xrange(args.repeat):
+                    get(url % PAGE_SIZE)
+            profiler.disable()
+            print
+            stats = pstats.Stats(profiler, stream=sys.stdout)
+            stats.sort_stats("cumulative").print_stats(PROFILE_LINES)
+    finally:
+        remove_database(db_path)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,77 @@
+'''
+Benchmark of the streamed booking collections.
+
+Measures the time to first byte, the total time and the largest chunk held at
+once when a page of bookings is rendered as a whole document and when it is
+streamed (the STREAM_COLLECTIONS setting of the application).
+
+Run it from the project folder, the number of bookings can be given as an
+argument:
+
+    $ python -m benchmarks.bench_streaming [bookings]
+'''
+import sys
+import time
+
+from reservation import database, resources
+from benchmarks.common import create_database, populate, remove_database
+
+USERS = 1000
+ROOMS = 100
+BOOKINGS = 100000
+PAGE_SIZES = (100, resources.MAX_PAGE_SIZE)
+REPEAT = 20
+
+
+def get_collection(client, url):
+    '''
+    Sends one GET request and reads the body chunk by chunk.
+
+    :return: the time to first byte and the total time in milliseconds, and
+        the size of the largest chunk in bytes.
+    :rtype: tuple
+
+    '''
+    start = time.time()
+    resp = client.get(url)
+    first = None
+    largest = 0
+    for chunk in resp.response:
+        if first is None:
+            first = time.time()
+        largest = max(largest, len(chunk))
+    end = time.time()
+    resp.close()
+    return (first - start) * 1000.0, (end - start) * 1000.0, largest
+
+
+def main(bookings=BOOKINGS):
+    db_path = create_database(populate=False)
+    try:
+        populate(db_path, USERS, ROOMS, bookings)
+        engine = database.Engine(db_path)
+        resources.app.config.update({"Engine": engine, "SERVER_NAME": "localhost:5000"})
+        client = resources.app.test_client()
+        urls = [("bookings", "/tellus/api/bookings/"),
+                ("bookings of room", "/tellus/api/rooms/room0/bookings/")]
+        print "%d bookings, %d requests per row" % (bookings, REPEAT)
+        print "%-18s %6s %-9s %12s %12s %14s" % ("collection", "limit", "mode", "ttfb (ms)",
+                                                 "total (ms)", "chunk (bytes)")
+        for name, url in urls:
+            for limit in PAGE_SIZES:
+                for mode, stream in (("rendered", False), ("streamed", True)):
+                    resources.app.config["STREAM_COLLECTIONS"] = stream
+                    results = [get_collection(client, url + "?limit=%d" % limit)
+                               for _ in xrange(REPEAT)]
+                    print "%-18s %6d %-9s %12.2f %12.2f %14d" % (
+                        name, limit, mode,
+                        sum(result[0] for result in results) / REPEAT,
+                        sum(result[1] for result in results) / REPEAT,
+                        max(result[2] for result in results))
+        engine.dispose()
+    finally:
+        remove_database(db_path)
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:2]])
@@ -0,0 +1,113 @@
+'''
+Helpers shared by the benchmarks.
+
+Benchmarks never touch *database/tellus.db*, they build their own database
+file from the schema and data dumps under *database/*.
+'''
+import datetime
+import os
+import sqlite3
+import tempfile
+import time
+
+from reservation import database
+
+DB_FOLDER = "database/"
+DB_SCHEMA_FILE = DB_FOLDER + "tellus_schema_dump.sql"
+DB_DATA_FILE = DB_FOLDER + "tellus_data_dump.sql"
+# Time of the first synthetic booking, the others follow hour by hour
+FIRST_BOOKING = datetime.datetime(2000, 1, 1)
+
+
+def create_database(path=None, populate=True):
+    '''
+    Creates a database file with the Tellus schema.
+
+    :param str path: Location of the new file. A temporary file is used if it
+        is not given. An existing file is removed first.
+    :param bool populate: If ``True`` the rows of the data dump are inserted.
+    :return: the path of the database file.
+    :rtype: str
+
+    '''
+    if path is None:
+        fd, path = tempfile.mkstemp(prefix="tellus_bench_", suffix=".db")
+        os.close(fd)
+    if os.path.exists(path):
+        os.remove(path)
+    con = sqlite3.connect(path)
+    with open(DB_SCHEMA_FILE) as schema:
+        con.executescript(schema.read())
+    if populate:
+        with open(DB_DATA_FILE) as data:
+            con.executescript(data.read())
+    con.commit()
+    con.close()
+    return path
+
+
+def populate(path, users=0, rooms=0, bookings=0, batch=50000):
+    '''
+    Inserts synthetic rows with plain SQL. Users are named *user<n>*, rooms
+    *room<n>* and bookings are spread evenly over users, rooms and hours.
+
+    :param str path: Location of a database created with
+        :py:func:`create_database`.
+    :param int users: Number of users to add.
+    :param int rooms: Number of rooms to add.
+    :param int bookings: Number of bookings to add. Needs users and rooms.
+    :param int batch: Number of rows inserted per transaction.
+
+    '''
+    con = sqlite3.connect(path)
+    con.executemany("INSERT INTO Users(isAdmin, username, password, firstName, lastName, email, contactNumber) "
+                    "VALUES(0, ?, 'pass', 'First', 'Last', 'user@example.com', '0400000000')",
+                    (("user%d" % i,) for i in xrange(users)))
+    con.executemany("INSERT INTO Rooms(roomName, picture, resources) VALUES(?, 'room.jpg', 'TV, Tables')",
+                    (("room%d" % i,) for i in xrange(rooms)))
+    con.commit()
+    for start in xrange(0, bookings, batch):
+        rows = []
+        for i in xrange(start, min(start + batch, bookings)):
+            booking_time = FIRST_BOOKING + datetime.timedelta(hours=i // rooms)
+            rows.append(("room%d" % (i % rooms), "user%d" % (i % users),
+                         database.format_booking_time(booking_time), database.to_minutes(booking_time)))
+        con.executemany("INSERT INTO Bookings(roomName, username, bookingTime, firstName, lastName, email, contactNumber, "
+                        "bookingStart) VALUES(?, ?, ?, 'First', 'Last', 'user@example.com', '0400000000', ?)", rows)
+        con.commit()
+    con.close()
+
+
+def remove_database(path):
+    '''
+    Removes a database file created with :py:func:`create_database` and its
+    journal files.
+
+    '''
+    for suffix in ("", "-journal", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+
+def measure(function, repeat):
+    '''
+    Calls ``function`` ``repeat`` times.
+
+    :return: the average time of one call in microseconds.
+    :rtype: float
+
+    '''
+    start = time.time()
+    for _ in xrange(repeat):
+        function()
+    return (time.time() - start) * 1000000.0 / repeat
+
+
+def percentile(samples, share):
+    '''
+    Returns the nearest rank percentile of sorted samples.
+
+    :param float share: The percentile, from 0 to 1.
+
+    '''
+    return samples[max(0, int(round(share * len(samples))) - 1)]
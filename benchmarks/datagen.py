@@ -0,0 +1,218 @@
+'''
+Seeded generator of synthetic Tellus data for scale and load testing.
+
+Users get realistic names, e-mails and phone numbers, rooms get a picture and
+a list of resources. Bookings are skewed like real ones: a few rooms are much
+more popular than the others, a few users book much more than the others,
+working days are busier than weekends and the mornings and early afternoons
+are the peak hours. Bookings last BOOKING_DURATION minutes, start on the hour
+within the opening hours and never overlap in a room. They are generated day
+by day, so the memory used does not grow with the number of bookings.
+
+The rows are written directly into a database through Engine, with the bulk
+tuning profile. The same seed and sizes always give the same database.
+
+Run it from the project folder with one of the SIZES or explicit numbers:
+
+    $ python -m benchmarks.datagen /tmp/tellus_1m.db --size 1m
+    $ python -m benchmarks.datagen /tmp/tellus.db --users 500 --rooms 40 --bookings 50000 --seed 7
+'''
+import argparse
+import bisect
+import datetime
+import itertools
+import os
+import random
+import sys
+import time
+
+from reservation import database, dataio
+
+# Sizes of the generated data sets, as (users, rooms, bookings)
+SIZES = {
+    "1k": (100, 10, 1000),
+    "10k": (1000, 20, 10000),
+    "100k": (5000, 100, 100000),
+    "1m": (20000, 500, 1000000),
+    "10m": (100000, 2000, 10000000)
+}
+DEFAULT_SEED = 2017
+# Day of the first bookings, a Monday
+FIRST_DAY = datetime.date(2017, 1, 2)
+# Booking starts of a day, one per hour from 8:00 to 19:00
+OPENING_HOURS = range(8, 20)
+# Relative demand of each opening hour: peaks at 10:00 and 14:00
+HOUR_WEIGHTS = [2, 4, 6, 4, 2, 3, 6, 5, 3, 2, 1, 1]
+# Share of the slots of a room booked on a working day, from the most popular
+# room (POPULAR_OCCUPANCY + BASE_OCCUPANCY) down to BASE_OCCUPANCY
+POPULAR_OCCUPANCY = 0.75
+BASE_OCCUPANCY = 0.15
+# Demand on Saturdays and Sundays compared with working days
+WEEKEND_DEMAND = 0.2
+# Exponent of the popularity of users, a higher value gives fewer heavy users
+USER_SKEW = 0.8
+# Rows inserted per transaction
+BATCH = 50000
+
+FIRST_NAMES = ["Aino", "Eero", "Onur", "Lam", "Paramartha", "Maria", "Juha", "Sara",
+               "Mikko", "Laura", "Ivan", "Emma", "Antti", "Nora", "Ville", "Hanna",
+               "Pekka", "Elina", "Tuomas", "Kaisa", "Ahmed", "Li", "Sofia", "Jussi"]
+LAST_NAMES = ["Huynh", "Ozuduru", "Narendradhipa", "Korhonen", "Virtanen", "Nieminen",
+              "Makinen", "Hamalainen", "Laine", "Heikkinen", "Koskinen", "Jarvinen",
+              "Lehtonen", "Saarinen", "Salminen", "Sanchez", "Oja", "Nguyen", "Kim",
+              "Tanaka", "Smith", "Garcia", "Rossi", "Muller"]
+EMAIL_DOMAINS = ["ee.oulu.fi", "student.oulu.fi", "oulu.fi", "example.com"]
+ROOM_NAMES = ["Stage", "Aspire", "Chill", "Aurora", "Boreal", "Cedar", "Delta", "Ember",
+              "Fjord", "Glacier", "Harbor", "Island", "Juniper", "Kelo", "Lagoon",
+              "Meadow", "Nordic", "Orbit", "Pine", "Quartz", "River", "Summit",
+              "Tundra", "Umbra", "Vista", "Willow"]
+RESOURCES = ["Projector", "Microphone", "Speaker", "Webcam", "Tables", "Chairs", "TV",
+             "Bean Bags", "Whiteboard", "Flipchart", "Video Conference", "Sofa",
+             "Coffee Machine", "Piano", "Standing Desks"]
+
+
+def generate_users(rng, count):
+    '''
+    Yields user rows in the column order of Users, without the userID.
+    '''
+    for number in xrange(count):
+        first = rng.choice(FIRST_NAMES)
+        last = rng.choice(LAST_NAMES)
+        # The number makes the username unique
+        username = "%s%s%d" % (first[0].lower(), last.lower(), number)
+        email = "%s.%s%d@%s" % (first.lower(), last.lower(), number, rng.choice(EMAIL_DOMAINS))
+        yield (int(rng.random() < 0.02), username, "pass%06d" % rng.randrange(1000000), first, last,
+               email, "04%08d" % rng.randrange(100000000))
+
+
+def generate_rooms(rng, count):
+    '''
+    Yields room rows in the column order of Rooms, without the roomID.
+    '''
+    for number in xrange(count):
+        name = ROOM_NAMES[number % len(ROOM_NAMES)]
+        if number >= len(ROOM_NAMES):
+            name += " %d" % (number // len(ROOM_NAMES) + 1)
+        resources = rng.sample(RESOURCES, rng.randint(2, 6))
+        yield (name, name.lower().replace(" ", "_") + ".jpg", ", ".join(resources))
+
+
+def cumulative(weights):
+    '''
+    Returns the cumulative sums of weights, for picking with bisect.
+    '''
+    total = 0.0
+    sums = []
+    for weight in weights:
+        total += weight
+        sums.append(total)
+    return sums
+
+
+def pick(rng, sums):
+    '''
+    Returns the index of an item picked with the weights of sums.
+    '''
+    return bisect.bisect_right(sums, rng.random() * sums[-1])
+
+
+def generate_bookings(rng, users, rooms, count):
+    '''
+    Yields booking rows in the column order of Bookings, without the
+    bookingID, in order of day.
+
+    :param list users: The user rows, the first ones are the heavy users.
+    :param list rooms: The room rows, the first ones are the most popular.
+
+    '''
+    # Share of the slots of each room booked on a working day
+    occupancy = [BASE_OCCUPANCY + POPULAR_OCCUPANCY / (1 + number) ** 0.5
+                 for number in xrange(len(rooms))]
+    user_sums = cumulative([1.0 / (1 + number) ** USER_SKEW for number in xrange(len(users))])
+    slots = len(OPENING_HOURS)
+    day = FIRST_DAY
+    generated = 0
+    while generated < count:
+        demand = WEEKEND_DEMAND if day.weekday() >= 5 else 1.0
+        day_text = day.strftime("%Y-%m-%d")
+        day_start = database.to_minutes(datetime.datetime(day.year, day.month, day.day))
+        for room, share in zip(rooms, occupancy):
+            # Number of booked slots, then the slots weighted by the peak
+            # hours, without repeating one
+            booked = sum(1 for _ in xrange(slots) if rng.random() < share * demand)
+            keys = sorted(((rng.random() ** (1.0 / weight), hour)
+                           for hour, weight in zip(OPENING_HOURS, HOUR_WEIGHTS)), reverse=True)
+            for _, hour in sorted(keys[:booked], key=lambda key: key[1]):
+                user = users[pick(rng, user_sums)]
+                yield (room[0], user[1], "%s %02d:00" % (day_text, hour), user[3], user[4],
+                       user[5], user[6], day_start + hour * 60)
+                generated += 1
+                if generated == count:
+                    return
+        day += datetime.timedelta(days=1)
+
+
+def generate(db_path, users, rooms, bookings, seed=DEFAULT_SEED, batch=BATCH):
+    '''
+    Writes a synthetic data set into a database created from the schema dump.
+    The rows are added after the rows already in the database, whose room
+    and user names must not be repeated.
+
+    :param str db_path: The path of the database file.
+    :param int users: Number of users, at least one if there are bookings.
+    :param int rooms: Number of rooms, at least one if there are bookings.
+    :param int bookings: Number of bookings.
+    :param int seed: Seed of the random numbers.
+    :param int batch: Number of rows inserted per transaction.
+
+    '''
+    rng = random.Random(seed)
+    connection = database.Engine(db_path, profile="bulk").connect()
+    con = connection.con
+    try:
+        user_rows = list(generate_users(rng, users))
+        con.executemany("INSERT INTO Users(isAdmin, username, password, firstName, lastName, email, "
+                        "contactNumber) VALUES(?, ?, ?, ?, ?, ?, ?)", user_rows)
+        room_rows = list(generate_rooms(rng, rooms))
+        con.executemany("INSERT INTO Rooms(roomName, picture, resources) VALUES(?, ?, ?)", room_rows)
+        con.commit()
+        rows = generate_bookings(rng, user_rows, room_rows, bookings)
+        while True:
+            chunk = list(itertools.islice(rows, batch))
+            if not chunk:
+                break
+            con.executemany("INSERT INTO Bookings(roomName, username, bookingTime, firstName, lastName, "
+                            "email, contactNumber, bookingStart) VALUES(?, ?, ?, ?, ?, ?, ?, ?)", chunk)
+            con.commit()
+    finally:
+        connection.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.datagen",
+                                     description="Generate a synthetic Tellus database.")
+    parser.add_argument("database", help="database file, created if it does not exist")
+    parser.add_argument("--size", choices=sorted(SIZES, key=lambda size: SIZES[size][2]), default="10k")
+    parser.add_argument("--users", type=int, help="number of users, default from the size")
+    parser.add_argument("--rooms", type=int, help="number of rooms, default from the size")
+    parser.add_argument("--bookings", type=int, help="number of bookings, default from the size")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    args = parser.parse_args(argv)
+    users, rooms, bookings = SIZES[args.size]
+    users = args.users if args.users is not None else users
+    rooms = args.rooms if args.rooms is not None else rooms
+    bookings = args.bookings if args.bookings is not None else bookings
+    if bookings and not (users and rooms):
+        parser.error("bookings need at least one user and one room")
+
+    if not os.path.exists(args.database):
+        dataio.create_database(args.database, data=None)
+    start = time.time()
+    generate(args.database, users, rooms, bookings, args.seed)
+    print >> sys.stderr, "Generated %d users, %d rooms and %d bookings in %.1f s" % (
+        users, rooms, bookings, time.time() - start)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
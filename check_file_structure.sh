@@ -11,11 +11,11 @@ TEST_FOLDER="tests/"
 
 # File names
 declare -a db_files=("tellus_schema_dump.sql" "tellus_data_dump.sql")
-declare -a api_files=("database.py" "resources.py")
+declare -a api_files=("database.py" "resources.py" "dataio.py" "metrics.py")
 declare -a test_files=("tests_database_api_bookings.py" "tests_database_api_users.py" "tests_database_api_rooms.py"
 "tests_resource_api_room.py" "tests_resource_api_bookings_of_room.py" "tests_resource_api_booking_of_user.py"
 "tests_resource_api_bookings_of_user.py" "tests_resource_api_history_bookings.py" "func_tests_database_api_users.py"
-"func_tests_database_api_rooms.py" "func_tests_database_api_bookings.py")
+"func_tests_database_api_rooms.py" "func_tests_database_api_bookings.py" "tests_database_api_pool.py" "tests_database_api_profile.py" "tests_database_api_wal.py" "tests_database_api_indexes.py" "tests_resource_api_streaming.py" "tests_database_api_intervals.py" "tests_database_api_concurrency.py" "tests_resource_api_bookings.py" "tests_dataio.py" "tests_resource_api_metrics.py" "tests_database_api_profiler.py" "tests_database_api_replica.py" "tests_database_api_booking_cache.py" "tests_resource_api_url_templates.py" "tests_resource_api_json.py" "tests_resource_api_compression.py")
 
 # Messages to inform user
 ERR="ERROR: API cannot work properly without this file."
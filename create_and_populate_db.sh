@@ -3,6 +3,9 @@
 # It is recommended to run this script for creating db.
 # WARNING: It removes old db files, so, be careful if you have changes and
 # want to keep them. Please, create a copy of your changes to keep them safe.
+# The database is created by reservation/dataio.py from the schema and data
+# dumps. Bigger data sets are loaded from CSV or NDJSON files with
+#   python -m reservation.dataio import database/tellus.db <table> <file>
 ###############################################################################
 #!/bin/bash
 
@@ -30,23 +33,11 @@ if [ ! -f "$DB_FOLDER$DB_DATA_FILE_NAME" ]; then
     exit 0
 fi
 
-## Remove old database
-if [ -f "$DB_FOLDER$DB_FILE_NAME" ]; then
-    echo "Removing old database."
-    rm $DB_FOLDER$DB_FILE_NAME
-    echo "Old database is removed."
-    echo ".........................."
-fi
-
-## Create and populate new database
-echo "Tables are creating."
-echo ".........................."
-cat $DB_FOLDER$DB_SCHEMA_FILE_NAME | sqlite3 $DB_FOLDER$DB_FILE_NAME
-
-echo "Database is populating."
+## Create and populate new database, the old one is removed
+echo "Tables are creating and database is populating."
 echo ".........................."
-cat $DB_FOLDER$DB_DATA_FILE_NAME | sqlite3 $DB_FOLDER$DB_FILE_NAME
+python -m reservation.dataio create --force --schema $DB_FOLDER$DB_SCHEMA_FILE_NAME \
+    --data $DB_FOLDER$DB_DATA_FILE_NAME $DB_FOLDER$DB_FILE_NAME
 
-echo "Database is created."
 echo "Bye"
-exit 0
\ No newline at end of file
+exit 0
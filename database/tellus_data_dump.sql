@@ -4,8 +4,8 @@ INSERT INTO `Users` VALUES (3,0,'para','paradise','Paramartha','Narendradhipa','
 INSERT INTO `Rooms` VALUES (1,'Stage','stage.jpg','Projector, Microphone, Speaker, Webcam, Tables, Chairs');
 INSERT INTO `Rooms` VALUES (2,'Aspire','aspire.jpg','TV, Webcam, Microphone, Tables, Chairs');
 INSERT INTO `Rooms` VALUES (3,'Chill','chill.jpg','TV, Bean Bags');
-INSERT INTO `Bookings` VALUES (1,'Stage','onur','2017-03-01 12:00','Onur','Ozuduru','onur.ozuduru@ee.oulu.fi','0411311911');
-INSERT INTO `Bookings` VALUES (2,'Chill','para','2017-03-27 16:00','Paramartha','Narendradhipa','paramartha.n@ee.oulu.fi','0417511944');
-INSERT INTO `Bookings` VALUES (3,'Aspire','lam','2017-04-15 09:00','Lam','Huynh','lam.huynh@ee.oulu.fi','0411322922');
-INSERT INTO `Bookings` VALUES (4,'Aspire','lam','2017-03-16 12:00','Lam','Huynh','lam.huynh@ee.oulu.fi','0411322922');
-INSERT INTO `Bookings` VALUES (5,'Aspire','lam','2017-09-05 10:00','Lam','Huynh','lam.huynh@ee.oulu.fi','0411322922');
+INSERT INTO `Bookings` VALUES (1,'Stage','onur','2017-03-01 12:00','Onur','Ozuduru','onur.ozuduru@ee.oulu.fi','0411311911',24806160);
+INSERT INTO `Bookings` VALUES (2,'Chill','para','2017-03-27 16:00','Paramartha','Narendradhipa','paramartha.n@ee.oulu.fi','0417511944',24843840);
+INSERT INTO `Bookings` VALUES (3,'Aspire','lam','2017-04-15 09:00','Lam','Huynh','lam.huynh@ee.oulu.fi','0411322922',24870780);
+INSERT INTO `Bookings` VALUES (4,'Aspire','lam','2017-03-16 12:00','Lam','Huynh','lam.huynh@ee.oulu.fi','0411322922',24827760);
+INSERT INTO `Bookings` VALUES (5,'Aspire','lam','2017-09-05 10:00','Lam','Huynh','lam.huynh@ee.oulu.fi','0411322922',25076760);
@@ -27,9 +27,14 @@ CREATE TABLE "Bookings" (
 	`lastName`	TEXT,
 	`email`	TEXT,
 	`contactNumber`	TEXT,
+	`bookingStart`	INTEGER,
 	PRIMARY KEY(`bookingID`)
     FOREIGN KEY(roomName) REFERENCES Rooms(roomName) ON DELETE CASCADE,
     FOREIGN KEY(username) REFERENCES Users(username) ON DELETE CASCADE
 );
+CREATE UNIQUE INDEX `idx_bookings_room_start` ON `Bookings` (`roomName`, `bookingStart`);
+CREATE INDEX `idx_bookings_user_start` ON `Bookings` (`username`, `bookingStart`);
+CREATE INDEX `idx_bookings_start` ON `Bookings` (`bookingStart`);
+PRAGMA user_version = 4;
 COMMIT;
 PRAGMA foreign_keys=ON;
\ No newline at end of file
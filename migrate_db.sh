@@ -0,0 +1,23 @@
+###############################################################################
+# Bash script file to upgrade the schema of an existing database.
+# It applies the pending migrations of reservation/database.py, the data is
+# kept. Databases created from tellus_schema_dump.sql are already up to date.
+# Usage: ./migrate_db.sh [database file], default is database/tellus.db
+###############################################################################
+#!/bin/bash
+
+DB_FILE=${1:-"database/tellus.db"}
+
+## Check database file exists
+if [ ! -f "$DB_FILE" ]; then
+    echo "$DB_FILE does not exist. Please control your setup."
+    exit 0
+fi
+
+echo "Migrating $DB_FILE."
+echo ".........................."
+python -c "import reservation.database as database; database.Engine('$DB_FILE', auto_migrate=True)"
+
+echo "Database is up to date."
+echo "Bye"
+exit 0
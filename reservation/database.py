@@ -1,44 +1,1557 @@
+import binascii
+import bisect
+import calendar
+import collections
+import datetime
+import logging
+import os
+import re
 import sqlite3
+import sys
+import threading
+import time
+import timeit
+from collections import Mapping
 
 # Default path for database
 DEFAULT_DB_PATH = "database/tellus.db"
+# Default maximum number of connections kept by the Engine pool
+DEFAULT_POOL_SIZE = 5
+# Default number of seconds an idle pooled connection is kept before it is
+# closed and replaced by a fresh one
+DEFAULT_POOL_RECYCLE = 300
+# Default number of seconds to wait for a free connection when the pool is
+# exhausted
+DEFAULT_POOL_TIMEOUT = 30
+# Default number of booking lists kept by the Engine cache, 0 disables it
+DEFAULT_BOOKING_CACHE_SIZE = 256
+# Longest booking list kept by the cache
+BOOKING_CACHE_MAX_ROWS = 1001
+
+# Defaults of the QueryProfiler: seconds after which a statement is slow,
+# statements a unit of work may run and times it may run the same SQL with
+# other parameters before it is reported
+SLOW_QUERY_TIME = 0.1
+MAX_STATEMENTS = 10
+MAX_REPEATS = 3
+# Statements which have a query plan
+EXPLAINABLE = re.compile(r"\s*(SELECT|INSERT|UPDATE|DELETE|REPLACE|WITH)\b", re.IGNORECASE)
+# Statements which are not counted as repeated
+TRANSACTION = re.compile(r"\s*(BEGIN|COMMIT|END|ROLLBACK|SAVEPOINT|RELEASE|PRAGMA)\b", re.IGNORECASE)
+
+# Connection tuning profiles. The settings of a profile are applied once, when
+# a connection is opened, instead of before every query. A setting with the
+# value None is left as the database file has it.
+#
+# * ``journal_mode``: PRAGMA journal_mode (DELETE, TRUNCATE, WAL...)
+# * ``synchronous``: PRAGMA synchronous (OFF, NORMAL, FULL)
+# * ``cache_size``: PRAGMA cache_size, pages or -KiB if negative
+# * ``mmap_size``: PRAGMA mmap_size in bytes
+# * ``temp_store``: PRAGMA temp_store (DEFAULT, FILE, MEMORY)
+# * ``busy_timeout``: PRAGMA busy_timeout in milliseconds
+# * ``foreign_keys``: PRAGMA foreign_keys, True or False
+# * ``wal_autocheckpoint``: PRAGMA wal_autocheckpoint in pages, 0 disables
+#   the automatic checkpoints so they are only run by Engine.checkpoint()
+DEFAULT_PROFILE = "default"
+PROFILES = {
+    # Safe settings, same behaviour as a plain sqlite3 connection with
+    # foreign keys enabled
+    "default": {
+        "journal_mode": None,
+        "synchronous": "FULL",
+        "cache_size": -2000,
+        "mmap_size": 0,
+        "temp_store": "DEFAULT",
+        "busy_timeout": 5000,
+        "foreign_keys": True,
+        "wal_autocheckpoint": None
+    },
+    # Settings for a busy server: bigger page cache, memory mapped reads and
+    # temporary tables in memory
+    "fast": {
+        "journal_mode": None,
+        "synchronous": "NORMAL",
+        "cache_size": -16000,
+        "mmap_size": 268435456,
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000,
+        "foreign_keys": True,
+        "wal_autocheckpoint": None
+    },
+    # Settings of the fast profile in write-ahead log mode, readers do not
+    # wait for the writer. Used by Engine(wal=True).
+    "wal": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -16000,
+        "mmap_size": 268435456,
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000,
+        "foreign_keys": True,
+        "wal_autocheckpoint": 1000
+    },
+    # Settings for loading many rows at once (reservation.dataio): no sync
+    # to disk, a big page cache for building the indexes and no foreign key
+    # checks. A crash while loading may corrupt the file. The journal mode of
+    # the file is kept, so a WAL database stays in WAL mode. No memory map and
+    # temporary files on disk, so the memory used is bounded by the cache.
+    "bulk": {
+        "journal_mode": None,
+        "synchronous": "OFF",
+        "cache_size": -64000,
+        "mmap_size": 0,
+        "temp_store": "FILE",
+        "busy_timeout": 5000,
+        "foreign_keys": False,
+        "wal_autocheckpoint": None
+    }
+}
+# Order in which the settings of a profile are applied
+PROFILE_SETTINGS = ("journal_mode", "synchronous", "cache_size", "mmap_size",
+                    "temp_store", "busy_timeout", "foreign_keys",
+                    "wal_autocheckpoint")
+# Modes accepted by Engine.checkpoint()
+CHECKPOINT_MODES = ("PASSIVE", "FULL", "RESTART", "TRUNCATE")
+
+# Format of Bookings.bookingTime. Booking times are in UTC.
+BOOKING_TIME_FORMAT = "%Y-%m-%d %H:%M"
+# Origin of Bookings.bookingStart, which is the booking time in minutes since
+# the epoch
+EPOCH = datetime.datetime(1970, 1, 1)
+# SQL expression of the bookingStart of the booking time {time}, NULL if the
+# time is not in BOOKING_TIME_FORMAT. Same result as to_minutes().
+BOOKING_START_SQL = ("CASE WHEN strftime('%Y-%m-%d %H:%M', {time}) = {time} "
+                     "THEN CAST(strftime('%s', {time}) AS INTEGER) / 60 END")
+# Length of a booking in minutes, a room is booked for this long from the
+# booking time
+BOOKING_DURATION = 60
+# Keys of the bookings given to Connection.add_bookings()
+BOOKING_KEYS = ("roomname", "username", "bookingTime", "firstname", "lastname",
+                "email", "contactnumber")
+
+
+def _add_booking_start(cur):
+    '''
+    Adds the bookingStart column to Bookings, unless it is already there, and
+    fills it from bookingTime. Times which are not in BOOKING_TIME_FORMAT are
+    left without a start.
+    '''
+    cur.execute("PRAGMA table_info(Bookings)")
+    if "bookingStart" not in [column[1] for column in cur.fetchall()]:
+        cur.execute("ALTER TABLE Bookings ADD COLUMN bookingStart INTEGER")
+    cur.execute("UPDATE Bookings SET bookingStart = " + BOOKING_START_SQL.format(time="bookingTime"))
+
+def _check_unique_room_starts(cur):
+    '''
+    Checks that no two bookings of a room have the same start, which the
+    unique index of migration 4 does not allow. Bookings made before it could
+    share a start if their users were different.
+
+    :raises sqlite3.IntegrityError: naming the bookingID of every booking
+        which shares its start with another one.
+
+    '''
+    cur.execute("SELECT roomName, bookingStart, group_concat(bookingID, ', ') FROM Bookings "
+                "WHERE bookingStart IS NOT NULL GROUP BY roomName, bookingStart "
+                "HAVING COUNT(*) > 1 ORDER BY roomName, bookingStart")
+    duplicates = ["%s at %s: bookings %s" % (roomname, format_booking_time(from_minutes(start)),
+                                             booking_ids)
+                  for roomname, start, booking_ids in cur.fetchall()]
+    if duplicates:
+        raise sqlite3.IntegrityError(
+            "Rooms are booked twice at the same time, delete or move all but one of "
+            "these bookings and migrate again. " + "; ".join(duplicates))
+
+# Schema migrations, as (version, description, statements). The statements of
+# a migration are applied by Engine.migrate() to databases whose
+# PRAGMA user_version is lower than its version. A statement may also be a
+# function, which is called with the cursor. A database created from
+# tellus_schema_dump.sql is already at SCHEMA_VERSION.
+MIGRATIONS = [
+    (1, "Secondary indexes on Bookings", [
+        "CREATE INDEX IF NOT EXISTS idx_bookings_room_time ON Bookings (roomName, bookingTime)",
+        "CREATE INDEX IF NOT EXISTS idx_bookings_user_time ON Bookings (username, bookingTime)"
+    ]),
+    (2, "Index on Bookings time", [
+        "CREATE INDEX IF NOT EXISTS idx_bookings_time ON Bookings (bookingTime)"
+    ]),
+    (3, "Integer start time of Bookings", [
+        _add_booking_start,
+        "DROP INDEX IF EXISTS idx_bookings_room_time",
+        "DROP INDEX IF EXISTS idx_bookings_user_time",
+        "DROP INDEX IF EXISTS idx_bookings_time",
+        "CREATE INDEX IF NOT EXISTS idx_bookings_room_start ON Bookings (roomName, bookingStart)",
+        "CREATE INDEX IF NOT EXISTS idx_bookings_user_start ON Bookings (username, bookingStart)",
+        "CREATE INDEX IF NOT EXISTS idx_bookings_start ON Bookings (bookingStart)"
+    ]),
+    (4, "Unique start time of the bookings of a room", [
+        _check_unique_room_starts,
+        "DROP INDEX IF EXISTS idx_bookings_room_start",
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_bookings_room_start ON Bookings (roomName, bookingStart)"
+    ])
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+# Orders accepted by Connection.get_bookings(), as ORDER BY clauses. bookingID
+# is the order of creation. Bookings without a start come first in time order.
+BOOKING_ORDERS = {
+    "bookingID": "bookingID",
+    "bookingTime": "bookingStart, bookingID",
+    "-bookingTime": "bookingStart DESC, bookingID DESC"
+}
+# Keyset conditions of the orders which can be paginated. A page starts right
+# after the key (bookingStart, bookingID) of the last booking of the previous
+# page. The second condition is used when that booking has no start.
+BOOKING_KEYSETS = {
+    "bookingTime": ("(bookingStart, bookingID) > (?, ?)",
+                    "(bookingStart IS NOT NULL OR bookingID > ?)"),
+    "-bookingTime": ("(bookingStart, bookingID) < (?, ?)",
+                     "bookingStart IS NULL AND bookingID < ?")
+}
+
+
+def to_minutes(booking_time):
+    '''
+    Converts a booking time to minutes since the epoch, the value of
+    Bookings.bookingStart.
+
+    :param booking_time: a datetime, naive datetimes are in UTC, or a string
+        in :py:data:`BOOKING_TIME_FORMAT`.
+    :rtype: int
+    :raises ValueError: if the string is not in
+        :py:data:`BOOKING_TIME_FORMAT`.
+
+    '''
+    if not isinstance(booking_time, datetime.datetime):
+        text = booking_time
+        booking_time = datetime.datetime.strptime(text, BOOKING_TIME_FORMAT)
+        # strptime also accepts numbers without leading zeros
+        if format_booking_time(booking_time) != text:
+            raise ValueError("time data %r does not match format %r" % (text, BOOKING_TIME_FORMAT))
+    return calendar.timegm(booking_time.utctimetuple()) // 60
+
+
+def from_minutes(minutes):
+    '''
+    Converts minutes since the epoch to a naive UTC datetime.
+
+    :param int minutes: the minutes, or None.
+    :return: the datetime, or None if minutes is None.
+
+    '''
+    if minutes is None:
+        return None
+    return EPOCH + datetime.timedelta(minutes=minutes)
+
+
+def format_booking_time(booking_time):
+    '''
+    Formats a datetime in :py:data:`BOOKING_TIME_FORMAT`. Strings are
+    returned as they are.
+    '''
+    if not isinstance(booking_time, datetime.datetime):
+        return booking_time
+    if booking_time.utcoffset() is not None:
+        booking_time = booking_time.replace(tzinfo=None) - booking_time.utcoffset()
+    # strftime does not support years before 1900
+    return "%04d-%02d-%02d %02d:%02d" % (booking_time.year, booking_time.month,
+                                         booking_time.day, booking_time.hour,
+                                         booking_time.minute)
+
+
+def _booking_start(booking_time):
+    '''
+    Returns the bookingStart of a booking time, or None if the time is not in
+    :py:data:`BOOKING_TIME_FORMAT`.
+    '''
+    try:
+        return to_minutes(booking_time)
+    except (TypeError, ValueError):
+        return None
+
+
+# Records makes rows readable like the dictionaries used before
+class Record(object):
+    '''
+    Compact read-only record of one row, used instead of a dictionary per row.
+
+    A record keeps the tuple of column values returned by SQLite and converts
+    a value only when it is read. It supports the read operations of a
+    dictionary: ``record[key]``, :py:meth:`get`, ``in``, ``len``,
+    :py:meth:`keys`, :py:meth:`items`, iteration over the keys and equality
+    with dictionaries.
+
+    Subclasses define :py:attr:`FIELDS`, the keys of the record,
+    :py:attr:`COLUMNS`, the columns to select for them in the same order, and
+    :py:attr:`STRINGS`, the keys whose values are returned as str.
+    '''
+    __slots__ = ("_values",)
+    FIELDS = ()
+    COLUMNS = ""
+    STRINGS = frozenset()
+    _INDEX = {}
+    # Records are not hashable, as dictionaries
+    __hash__ = None
+
+    def __init__(self, values):
+        '''
+        :param tuple values: the column values in the order of
+            :py:attr:`COLUMNS`.
+        '''
+        self._values = values
+
+    @classmethod
+    def row_factory(cls, cursor, row):
+        '''
+        Row factory for a cursor which selects :py:attr:`COLUMNS`.
+        '''
+        return cls(row)
+
+    def __getitem__(self, key):
+        value = self._values[self._INDEX[key]]
+        if key in self.STRINGS:
+            return str(value)
+        return value
+
+    def get(self, key, default=None):
+        if key in self._INDEX:
+            return self[key]
+        return default
+
+    def __contains__(self, key):
+        return key in self._INDEX
+
+    def __len__(self):
+        return len(self.FIELDS)
+
+    def __iter__(self):
+        return iter(self.FIELDS)
+
+    def iterkeys(self):
+        return iter(self.FIELDS)
+
+    def itervalues(self):
+        for key in self.FIELDS:
+            yield self[key]
+
+    def iteritems(self):
+        for key in self.FIELDS:
+            yield key, self[key]
+
+    def keys(self):
+        return list(self.FIELDS)
+
+    def values(self):
+        return list(self.itervalues())
+
+    def items(self):
+        return list(self.iteritems())
+
+    def copy(self):
+        '''
+        :return: the record as a dictionary.
+        '''
+        return dict(self.iteritems())
+
+    def __eq__(self, other):
+        if isinstance(other, Record):
+            return type(self) is type(other) and self._values == other._values
+        if isinstance(other, Mapping):
+            return self.copy() == dict(other.items())
+        return NotImplemented
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        if equal is NotImplemented:
+            return equal
+        return not equal
+
+    def __repr__(self):
+        return "%s(%r)" % (type(self).__name__, self.copy())
+
+Mapping.register(Record)
+
+
+class UserRecord(Record):
+    '''
+    Record of a row of Users, see :py:meth:`Connection.get_users`.
+    '''
+    __slots__ = ()
+    FIELDS = ("userID", "isAdmin", "username", "password", "firstname",
+              "lastname", "email", "contactnumber")
+    COLUMNS = "userID, isAdmin, username, password, firstName, lastName, " \
+              "email, contactNumber"
+    STRINGS = frozenset(["userID", "isAdmin"])
+    _INDEX = dict(zip(FIELDS, range(len(FIELDS))))
+
+
+class RoomRecord(Record):
+    '''
+    Record of a row of Rooms, see :py:meth:`Connection.get_rooms`.
+    '''
+    __slots__ = ()
+    FIELDS = ("roomid", "roomname", "picture", "resources")
+    COLUMNS = "roomID, roomName, picture, resources"
+    STRINGS = frozenset(["roomid"])
+    _INDEX = dict(zip(FIELDS, range(len(FIELDS))))
+
+
+class BookingRecord(Record):
+    '''
+    Record of a row of Bookings, see :py:meth:`Connection.get_bookings`.
+    '''
+    __slots__ = ()
+    FIELDS = ("bookingID", "roomname", "username", "bookingTime", "firstname",
+              "lastname", "email", "contactnumber")
+    COLUMNS = "bookingID, roomName, username, bookingTime, firstName, " \
+              "lastName, email, contactNumber, bookingStart"
+    STRINGS = frozenset(["username", "bookingTime"])
+    _INDEX = dict(zip(FIELDS, range(len(FIELDS))))
+
+    @property
+    def start(self):
+        '''
+        The booking time as a naive UTC datetime, or None if the booking time
+        is not in :py:data:`BOOKING_TIME_FORMAT`.
+        '''
+        return from_minutes(self._values[8])
+
+    @property
+    def key(self):
+        '''
+        The (bookingStart, bookingID) of the booking, where bookingStart is in
+        minutes since the epoch. It is the start parameter of
+        :py:meth:`Connection.get_bookings` for the next page.
+        '''
+        return self._values[8], self._values[0]
+
+
+# Engine class makes use of codes from Forum exercise
+class Engine(object):
+    '''
+    Abstraction of the database.
+
+    It includes tools to connect to the sqlite file. You can access the Connection
+    instance.
+    :py:meth:`connection`.
+
+    The Engine also owns a :py:class:`ConnectionPool`. Short lived users of the
+    database (e.g. one HTTP request) should borrow a connection with
+    :py:meth:`checkout` and give it back with :py:meth:`checkin` instead of
+    opening and closing a new sqlite3 connection every time.
+
+    With ``wal=True`` the database is used in write-ahead log mode. The Engine
+    then keeps two pools: read-only connections for the readers and a single
+    writer connection, so readers never wait for the writer and writes of this
+    process are serialized. Checkpoints of the log are run automatically every
+    ``wal_autocheckpoint`` pages of the profile, or only with
+    :py:meth:`checkpoint` if it is 0.
+
+    :Example:
+
+    > engine = Engine()
+    > con = engine.connect()
+
+    > con = engine.checkout()
+    > engine.checkin(con)
+
+    > engine = Engine(wal=True)
+    > con = engine.checkout(readonly=True)
+    > engine.checkin(con)
+
+    :param db_path: The path of the database file (always with respect to the
+        calling script. If not specified, the Engine will use the file located
+        at *database/tellus.db*
+    :param int pool_size: Maximum number of connections handed out by the pool
+        at the same time.
+    :param int pool_recycle: Seconds an idle pooled connection is kept before
+        it is reopened.
+    :param int pool_timeout: Seconds :py:meth:`checkout` waits for a free
+        connection before it gives up.
+    :param profile: Name of the tuning profile in :py:data:`PROFILES` or a
+        dictionary with the same keys. It is applied to every connection of
+        this Engine when the connection is opened. Defaults to the *wal*
+        profile if ``wal`` is ``True``.
+    :param bool wal: If ``True`` use the write-ahead log mode with a pool of
+        ``pool_size`` read-only connections and one writer connection.
+    :param profiler: If given, the statements of every connection of this
+        Engine are recorded by it.
+    :type profiler: QueryProfiler
+    :param int booking_cache_size: Number of booking lists of rooms kept by
+        the :py:class:`BookingListCache` of the Engine, 0 disables it.
+    :param bool auto_migrate: If ``True`` an existing database with an older
+        schema is migrated to :py:data:`SCHEMA_VERSION` when the Engine is
+        created, see :py:meth:`migrate`.
+    :raises ValueError: if the schema of an existing database is not at
+        :py:data:`SCHEMA_VERSION` and it is not migrated.
+
+    '''
+    def __init__(self, db_path=None, pool_size=DEFAULT_POOL_SIZE,
+                 pool_recycle=DEFAULT_POOL_RECYCLE, pool_timeout=DEFAULT_POOL_TIMEOUT,
+                 profile=None, wal=False, profiler=None,
+                 booking_cache_size=DEFAULT_BOOKING_CACHE_SIZE, auto_migrate=False):
+        super(Engine, self).__init__()
+        if db_path is not None:
+            self.db_path = db_path
+        else:
+            self.db_path = DEFAULT_DB_PATH
+        if profile is None:
+            profile = "wal" if wal else DEFAULT_PROFILE
+        if isinstance(profile, basestring):
+            self.profile_name = profile
+            self.profile = PROFILES[profile]
+        else:
+            self.profile_name = "custom"
+            self.profile = profile
+        self.wal = wal
+        self.profiler = profiler
+        # Booked intervals of the rooms and versions of the data, shared by
+        # all connections
+        self.intervals = BookingIntervals()
+        self.versions = Versions()
+        # Copy of the Users and Rooms tables and booking lists of the rooms,
+        # shared by all connections
+        self.replica = TableReplica()
+        self.booking_cache = BookingListCache(booking_cache_size)
+        self.read_pool = None
+        if wal:
+            # The writer switches the file to WAL, readers keep the mode of
+            # the file and never run checkpoints.
+            self.profile = dict(self.profile, journal_mode="WAL")
+            self.read_profile = dict(self.profile, journal_mode=None,
+                                     wal_autocheckpoint=0)
+            self.read_pool = ConnectionPool(self._create_read_connection, pool_size,
+                                            pool_recycle, pool_timeout)
+            self.pool = ConnectionPool(self._create_pooled_connection, 1,
+                                       pool_recycle, pool_timeout)
+        else:
+            self.pool = ConnectionPool(self._create_pooled_connection, pool_size,
+                                       pool_recycle, pool_timeout)
+        self.check_schema(auto_migrate)
+
+    def connect(self):
+        '''
+        Creates a connection to the database.
+
+        :return: A Connection instance
+        :rtype: Connection
+
+        '''
+        return Connection(self.db_path, profile=self.profile,
+                          intervals=self.intervals, profiler=self.profiler,
+                          versions=self.versions, replica=self.replica,
+                          booking_cache=self.booking_cache)
+
+    def _create_pooled_connection(self):
+        '''
+        Creates a connection which can be shared between threads, one thread
+        at a time. Used by the pool.
+
+        '''
+        return Connection(self.db_path, check_same_thread=False, profile=self.profile,
+                          intervals=self.intervals, profiler=self.profiler,
+                          versions=self.versions, replica=self.replica,
+                          booking_cache=self.booking_cache)
+
+    def _create_read_connection(self):
+        '''
+        Creates a read-only connection which can be shared between threads,
+        one thread at a time. Used by the read pool in WAL mode.
+
+        '''
+        return Connection(self.db_path, check_same_thread=False,
+                          profile=self.read_profile, readonly=True,
+                          intervals=self.intervals, profiler=self.profiler,
+                          versions=self.versions, replica=self.replica,
+                          booking_cache=self.booking_cache)
+
+    def checkout(self, readonly=False):
+        '''
+        Borrows a connection from the pool. It **MUST** be given back with
+        :py:meth:`checkin` instead of being closed.
+
+        :param bool readonly: ``True`` if the connection is only used for
+            reading. In WAL mode a read-only connection is given, otherwise
+            the writer connection. Ignored if the Engine is not in WAL mode.
+        :return: A Connection instance
+        :rtype: Connection
+        :raises sqlite3.OperationalError: if no connection is free after
+            waiting ``pool_timeout`` seconds.
+
+        '''
+        if readonly and self.read_pool is not None:
+            return self.read_pool.checkout()
+        return self.pool.checkout()
+
+    def checkin(self, connection):
+        '''
+        Gives back a connection borrowed with :py:meth:`checkout`, commiting
+        all changes.
+
+        :param connection: The borrowed connection.
+        :type connection: Connection
+
+        '''
+        if connection.readonly and self.read_pool is not None:
+            self.read_pool.checkin(connection)
+        else:
+            self.pool.checkin(connection)
+
+    def checkpoint(self, mode="PASSIVE"):
+        '''
+        Copies the write-ahead log back into the database file with the writer
+        connection. Only meaningful in WAL mode.
+
+        :param str mode: One of :py:data:`CHECKPOINT_MODES`. ``PASSIVE`` never
+            waits for readers, ``TRUNCATE`` waits for them and empties the log.
+        :return: a tuple (busy, log pages, checkpointed pages) as returned by
+            ``PRAGMA wal_checkpoint``.
+        :rtype: tuple
+        :raises ValueError: if the mode is unknown.
+
+        '''
+        mode = mode.upper()
+        if mode not in CHECKPOINT_MODES:
+            raise ValueError("Unknown checkpoint mode %s" % mode)
+        connection = self.checkout()
+        try:
+            cur = connection.con.cursor()
+            cur.execute("PRAGMA wal_checkpoint(%s)" % mode)
+            row = cur.fetchone()
+        finally:
+            self.checkin(connection)
+        return tuple(row)
+
+    def pool_stats(self):
+        '''
+        Returns the statistics of the connection pool.
+
+        :return: a dictionary, see :py:meth:`ConnectionPool.stats`. In WAL
+            mode it is the statistics of the writer and the statistics of the
+            read pool are under the key ``readers``.
+        :rtype: dict
+
+        '''
+        stats = self.pool.stats()
+        if self.read_pool is not None:
+            stats["readers"] = self.read_pool.stats()
+        return stats
+
+    def cache_stats(self):
+        '''
+        Returns the statistics of the booking lists cache.
+
+        :return: a dictionary, see :py:meth:`BookingListCache.stats`.
+        :rtype: dict
+
+        '''
+        return self.booking_cache.stats()
+
+    def get_settings(self):
+        '''
+        Reports the settings that are active on the connections of this
+        Engine.
+
+        :return: a dictionary with the name of the profile under ``profile``
+            and the values read back from the database for every key of
+            :py:data:`PROFILE_SETTINGS`.
+        :rtype: dict
+
+        '''
+        connection = self.checkout()
+        try:
+            settings = connection.get_settings()
+        finally:
+            self.checkin(connection)
+        settings["profile"] = self.profile_name
+        return settings
+
+    def schema_version(self):
+        '''
+        Reads the schema version of the database file.
+
+        :return: ``PRAGMA user_version`` of the database, or ``None`` if the
+            file does not exist or has no tables yet.
+        :rtype: int
+
+        '''
+        if not os.path.exists(self.db_path):
+            return None
+        con = sqlite3.connect(self.db_path)
+        try:
+            cur = con.cursor()
+            cur.execute("SELECT COUNT(*) FROM sqlite_master")
+            if cur.fetchone()[0] == 0:
+                return None
+            cur.execute("PRAGMA user_version")
+            return cur.fetchone()[0]
+        finally:
+            con.close()
+
+    def check_schema(self, auto_migrate=False):
+        '''
+        Checks that the schema of the database is at :py:data:`SCHEMA_VERSION`.
+        Databases which do not exist yet are not checked.
+
+        :param bool auto_migrate: If ``True`` an older schema is migrated
+            instead.
+        :raises ValueError: if the schema is newer than
+            :py:data:`SCHEMA_VERSION`, or older and not migrated.
+
+        '''
+        version = self.schema_version()
+        if version is None or version == SCHEMA_VERSION:
+            return
+        if version > SCHEMA_VERSION:
+            raise ValueError("Database %s has schema version %d, newer than version %d of "
+                             "this code" % (self.db_path, version, SCHEMA_VERSION))
+        if not auto_migrate:
+            raise ValueError("Database %s has schema version %d, expected %d. Run "
+                             "./migrate_db.sh %s to upgrade it" % (self.db_path, version,
+                                                                  SCHEMA_VERSION, self.db_path))
+        self.migrate()
+
+    def migrate(self):
+        '''
+        Brings the schema of the database up to :py:data:`SCHEMA_VERSION` by
+        applying the pending :py:data:`MIGRATIONS`, each one in its own
+        transaction.
+
+        :return: the versions of the applied migrations.
+        :rtype: list
+
+        '''
+        applied = []
+        connection = self.connect()
+        # Transactions are handled here, sqlite3 would commit before DDL
+        connection.con.isolation_level = None
+        try:
+            cur = connection.con.cursor()
+            cur.execute("PRAGMA user_version")
+            version = cur.fetchone()[0]
+            for number, description, statements in MIGRATIONS:
+                if number <= version:
+                    continue
+                print "Applying migration %d: %s" % (number, description)
+                cur.execute("BEGIN IMMEDIATE")
+                try:
+                    for statement in statements:
+                        if callable(statement):
+                            statement(cur)
+                        else:
+                            cur.execute(statement)
+                    cur.execute("PRAGMA user_version = %d" % number)
+                except:
+                    cur.execute("ROLLBACK")
+                    raise
+                cur.execute("COMMIT")
+                applied.append(number)
+        finally:
+            connection.close()
+        return applied
+
+    def dispose(self):
+        '''
+        Closes all idle pooled connections. Connections that are checked out
+        are not affected.
+
+        '''
+        self.pool.dispose()
+        if self.read_pool is not None:
+            self.read_pool.dispose()
+
+
+class ConnectionPool(object):
+    '''
+    Bounded pool of initialized :py:class:`Connection` instances.
+
+    A connection is handed to only one thread at a time. Idle connections are
+    reused in LIFO order, so the most recently used (and warmest) connection is
+    given out first, and connections idle for longer than ``recycle`` seconds
+    are closed and replaced by new ones.
+
+    An instance of this class should not be instantiated directly using the
+    constructor. It is created by :py:class:`Engine`.
+
+    :param factory: Callable that returns a new Connection.
+    :param int max_size: Maximum number of connections checked out at the same
+        time. Also the maximum number of idle connections kept.
+    :param int recycle: Seconds an idle connection is kept. ``None`` keeps
+        connections forever.
+    :param int timeout: Seconds :py:meth:`checkout` waits for a free
+        connection. ``None`` waits forever.
+
+    '''
+    def __init__(self, factory, max_size=DEFAULT_POOL_SIZE,
+                 recycle=DEFAULT_POOL_RECYCLE, timeout=DEFAULT_POOL_TIMEOUT):
+        super(ConnectionPool, self).__init__()
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        self.factory = factory
+        self.max_size = max_size
+        self.recycle = recycle
+        self.timeout = timeout
+        # Idle connections as (connection, last use time) pairs
+        self._idle = []
+        self._in_use = 0
+        self._cond = threading.Condition(threading.Lock())
+        self._counters = {
+            "created": 0,
+            "closed": 0,
+            "recycled": 0,
+            "checkouts": 0,
+            "checkins": 0,
+            "waits": 0,
+            "timeouts": 0
+        }
+
+    def checkout(self):
+        '''
+        Takes an idle connection or creates a new one if the pool is not full.
+        Otherwise waits until another thread gives one back.
+
+        :return: A Connection instance
+        :rtype: Connection
+        :raises sqlite3.OperationalError: if no connection is free in time.
+
+        '''
+        stale = []
+        connection = None
+        with self._cond:
+            deadline = None
+            while connection is None:
+                # Reuse an idle connection unless it has been idle too long
+                while self._idle and connection is None:
+                    candidate, last_used = self._idle.pop()
+                    if self.recycle is not None and time.time() - last_used > self.recycle:
+                        stale.append(candidate)
+                        self._counters["recycled"] += 1
+                    else:
+                        connection = candidate
+                if connection is not None or self._in_use < self.max_size:
+                    # Reserve the slot, a new connection is opened outside the lock
+                    self._in_use += 1
+                    self._counters["checkouts"] += 1
+                    break
+                # Pool is exhausted, wait for a checkin
+                self._counters["waits"] += 1
+                now = time.time()
+                if self.timeout is not None:
+                    if deadline is None:
+                        deadline = now + self.timeout
+                    if now >= deadline:
+                        self._counters["timeouts"] += 1
+                        raise sqlite3.OperationalError("Connection pool exhausted")
+                    self._cond.wait(deadline - now)
+                else:
+                    self._cond.wait()
+        self._close_all(stale)
+        if connection is None:
+            try:
+                connection = self.factory()
+            except:
+                with self._cond:
+                    self._in_use -= 1
+                    self._cond.notify()
+                raise
+            with self._cond:
+                self._counters["created"] += 1
+        return connection
+
+    def checkin(self, connection):
+        '''
+        Gives back a connection, commiting all changes. If the commit fails the
+        connection is closed instead of being reused.
+
+        :param connection: The borrowed connection.
+        :type connection: Connection
+
+        '''
+        reusable = connection.con is not None
+        if reusable:
+            try:
+                connection.con.commit()
+            except sqlite3.Error, excp:
+                print "Error %s:" % excp.args[0]
+                reusable = False
+        with self._cond:
+            self._in_use -= 1
+            self._counters["checkins"] += 1
+            if reusable and len(self._idle) < self.max_size:
+                self._idle.append((connection, time.time()))
+                connection = None
+            self._cond.notify()
+        if connection is not None:
+            self._close_all([connection])
+
+    def stats(self):
+        '''
+        Returns the statistics of the pool.
+
+        :return: a dictionary with the following keys:
+
+            * ``max_size``: Maximum number of connections.
+            * ``idle``: Number of idle connections.
+            * ``in_use``: Number of checked out connections.
+            * ``created``: Number of connections opened.
+            * ``closed``: Number of connections closed.
+            * ``recycled``: Number of idle connections closed because of age.
+            * ``checkouts``: Number of checkouts.
+            * ``checkins``: Number of checkins.
+            * ``waits``: Number of times a checkout waited for a connection.
+            * ``timeouts``: Number of checkouts that gave up waiting.
+
+        :rtype: dict
+
+        '''
+        with self._cond:
+            stats = dict(self._counters)
+            stats["max_size"] = self.max_size
+            stats["idle"] = len(self._idle)
+            stats["in_use"] = self._in_use
+        return stats
+
+    def dispose(self):
+        '''
+        Closes all idle connections.
+
+        '''
+        with self._cond:
+            idle = [connection for connection, _ in self._idle]
+            self._idle = []
+        self._close_all(idle)
+
+    def _close_all(self, connections):
+        '''
+        Closes the given connections, ignoring errors.
+
+        '''
+        for connection in connections:
+            try:
+                connection.close()
+            except sqlite3.Error, excp:
+                print "Error %s:" % excp.args[0]
+        if connections:
+            with self._cond:
+                self._counters["closed"] += len(connections)
+
+
+class BookingIntervals(object):
+    '''
+    In-memory index of the booked intervals of the rooms, used to find
+    conflicting bookings without reading all bookings of a room.
+
+    The bookings of a room are kept as a sorted list of (bookingStart,
+    bookingID). A room is loaded from the database the first time it is
+    queried, then :py:class:`Connection` keeps it up to date when bookings are
+    added, modified or deleted. Every booking lasts ``duration`` minutes, so
+    two bookings overlap when their starts are less than ``duration`` apart
+    and an overlap query is a binary search. Bookings without a start are not
+    indexed.
+
+    The index only sees the changes made through the connections of its
+    Engine, which share it. It can be used from several threads.
+
+    An instance of this class should not be instantiated directly using the
+    constructor. It is created by :py:class:`Engine`.
+
+    :param int duration: Length of a booking in minutes.
+
+    '''
+    def __init__(self, duration=BOOKING_DURATION):
+        super(BookingIntervals, self).__init__()
+        self.duration = duration
+        # Sorted (bookingStart, bookingID) lists of the loaded rooms
+        self._rooms = {}
+        # (roomname, bookingStart) of the bookings of the loaded rooms
+        self._bookings = {}
+        self._lock = threading.Lock()
+
+    def overlapping(self, connection, roomname, start):
+        '''
+        Finds the bookings of a room which overlap a booking starting at
+        ``start``.
+
+        :param connection: Connection used to load the room if it is not
+            loaded yet.
+        :type connection: Connection
+        :param str roomname: The name of the room.
+        :param int start: The start in minutes since the epoch.
+        :return: the IDs of the overlapping bookings, in order of start.
+        :rtype: list
+
+        '''
+        with self._lock:
+            intervals = self._rooms.get(roomname)
+            if intervals is None:
+                intervals = self._load(connection, roomname)
+            # First booking which ends after start
+            index = bisect.bisect_right(intervals, (start - self.duration, sys.maxint))
+            found = []
+            while index < len(intervals) and intervals[index][0] < start + self.duration:
+                found.append(intervals[index][1])
+                index += 1
+            return found
+
+    def add(self, roomname, booking_id, start):
+        '''
+        Adds a booking, or moves it if it is already indexed. Nothing is done
+        if the room is not loaded, it is read from the database when needed.
+
+        :param str roomname: The name of the room.
+        :param int booking_id: ID of the booking.
+        :param int start: The start in minutes since the epoch, or None.
+
+        '''
+        with self._lock:
+            self._remove(booking_id)
+            intervals = self._rooms.get(roomname)
+            if intervals is None or start is None:
+                return
+            bisect.insort(intervals, (start, booking_id))
+            self._bookings[booking_id] = (roomname, start)
+
+    def remove(self, booking_id):
+        '''
+        Removes a booking if it is indexed.
+
+        :param int booking_id: ID of the booking.
+
+        '''
+        with self._lock:
+            self._remove(booking_id)
+
+    def clear(self):
+        '''
+        Forgets all rooms, they are loaded again when queried. Used when
+        bookings are deleted by the database itself (ON DELETE CASCADE).
+
+        '''
+        with self._lock:
+            self._rooms = {}
+            self._bookings = {}
+
+    def _remove(self, booking_id):
+        '''
+        Removes a booking. The lock must be held.
+        '''
+        entry = self._bookings.pop(booking_id, None)
+        if entry is None:
+            return
+        roomname, start = entry
+        intervals = self._rooms[roomname]
+        index = bisect.bisect_left(intervals, (start, booking_id))
+        del intervals[index]
+
+    def _load(self, connection, roomname):
+        '''
+        Reads the bookings of a room with the index of Bookings. The lock must
+        be held, so changes of other threads wait until the room is loaded.
+        '''
+        cur = connection.con.cursor()
+        cur.row_factory = None
+        cur.execute('SELECT bookingStart, bookingID FROM Bookings '
+                    'WHERE roomName = ? AND bookingStart IS NOT NULL '
+                    'ORDER BY bookingStart, bookingID', (roomname,))
+        intervals = cur.fetchall()
+        self._rooms[roomname] = intervals
+        for start, booking_id in intervals:
+            self._bookings[booking_id] = (roomname, start)
+        return intervals
+
+
+class Versions(object):
+    '''
+    Versions of the data changed through the connections of an Engine, used
+    to tell whether a representation built from the data is still current.
+
+    A version is a number, from 0, which every change of its data increases.
+    It is increased after the change is committed, so a version read before
+    reading the data is never newer than the data. The versions are not
+    stored: the token is new for every instance, so versions of another
+    process or of an earlier run are never taken for current ones. Changes
+    made outside the connections of the Engine are not seen.
+
+    The keys are:
+
+    * ``rooms``: The Rooms table.
+    * ``bookings``: All bookings, for changes of several rooms at once.
+    * ``("bookings", roomname)``: The bookings of a room.
+
+    An instance of this class should not be instantiated directly using the
+    constructor. It is created by :py:class:`Engine`.
+
+    '''
+    def __init__(self):
+        super(Versions, self).__init__()
+        self.token = binascii.hexlify(os.urandom(8))
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        '''
+        Returns the current version of a key.
+        '''
+        return self._versions.get(key, 0)
+
+    def bump(self, key):
+        '''
+        Increases the version of a key after its data has changed.
+
+        :return: the new version.
+        :rtype: int
+
+        '''
+        with self._lock:
+            version = self._versions[key] = self._versions.get(key, 0) + 1
+        return version
+
+    def tag(self, key):
+        '''
+        Returns a text which is different for every version of a key, in
+        this and in any other instance, e.g. for an HTTP ETag.
+        '''
+        return "%s-%s-%d" % (key, self.token, self.get(key))
+
+
+class TableReplica(object):
+    '''
+    In-process copy of the small tables which are read by almost every
+    request, Users and Rooms, so existence checks are dictionary lookups
+    without SQL.
+
+    A table is read with one SELECT the first time it is queried. Each table
+    is kept as the list of its records in order of ID and a dictionary of the
+    records by name. :py:class:`Connection` keeps the copy up to date when
+    users are added or deleted and rooms are modified: the change and its
+    commit are done while :py:attr:`lock` is held and the changed row is then
+    put in the copy, so the changes of the connections are applied in the
+    order of their commits. Readers never wait for the lock.
+
+    The replica only sees the changes made through the connections of its
+    Engine, which share it. Reads do not take part in the transaction of the
+    connection, e.g. the read transaction of a WAL reader.
+
+    An instance of this class should not be instantiated directly using the
+    constructor. It is created by :py:class:`Engine`.
+
+    '''
+    # Record class and key of the name of each replicated table. The first
+    # column of the records is the ID.
+    TABLES = {
+        "Users": (UserRecord, "username"),
+        "Rooms": (RoomRecord, "roomname")
+    }
+
+    def __init__(self):
+        super(TableReplica, self).__init__()
+        # (records, IDs, records by name) of the loaded tables
+        self._tables = {}
+        # Number of changes of each table, a table read before a change is
+        # not kept
+        self._changes = {}
+        # Held by the connections while they change a replicated table
+        self.lock = threading.RLock()
+
+    def rows(self, connection, table):
+        '''
+        Returns all records of a table in order of ID.
+
+        :param connection: Connection used to load the table if it is not
+            loaded yet.
+        :type connection: Connection
+        :param str table: ``Users`` or ``Rooms``.
+        :rtype: list
+
+        '''
+        return list(self._table(connection, table)[0])
+
+    def get(self, connection, table, name):
+        '''
+        Returns the record with the given name, or None if there is none.
+
+        :param connection: Connection used to load the table if it is not
+            loaded yet.
+        :type connection: Connection
+        :param str table: ``Users`` or ``Rooms``.
+        :param name: The username or the roomname.
+        :type name: str or unicode
+
+        '''
+        if isinstance(name, str):
+            # SQLite returns the names as unicode
+            try:
+                name = name.decode("utf-8")
+            except UnicodeDecodeError:
+                return None
+        return self._table(connection, table)[2].get(name)
+
+    def put(self, table, record):
+        '''
+        Adds a record, or replaces the record with the same name. Nothing is
+        done if the table is not loaded, it is read from the database when
+        needed.
+
+        :param str table: ``Users`` or ``Rooms``.
+        :param record: The row as it is in the database.
+        :type record: UserRecord or RoomRecord
+
+        '''
+        name = record[self.TABLES[table][1]]
+        with self.lock:
+            self._changes[table] = self._changes.get(table, 0) + 1
+            replica = self._tables.get(table)
+            if replica is None:
+                return
+            self._remove(replica, name)
+            records, ids, index = replica
+            position = bisect.bisect_left(ids, record._values[0])
+            ids.insert(position, record._values[0])
+            records.insert(position, record)
+            index[name] = record
+
+    def remove(self, table, name):
+        '''
+        Removes the record with the given name if it is in the copy.
+
+        :param str table: ``Users`` or ``Rooms``.
+        :param name: The username or the roomname.
+        :type name: str or unicode
+
+        '''
+        if isinstance(name, str):
+            name = name.decode("utf-8", "replace")
+        with self.lock:
+            self._changes[table] = self._changes.get(table, 0) + 1
+            replica = self._tables.get(table)
+            if replica is not None:
+                self._remove(replica, name)
+
+    def clear(self):
+        '''
+        Forgets all tables, they are loaded again when queried.
+        '''
+        with self.lock:
+            for table in self.TABLES:
+                self._changes[table] = self._changes.get(table, 0) + 1
+            self._tables = {}
+
+    def _remove(self, replica, name):
+        '''
+        Removes a record from a loaded table. The lock must be held.
+        '''
+        records, ids, index = replica
+        record = index.pop(name, None)
+        if record is None:
+            return
+        position = bisect.bisect_left(ids, record._values[0])
+        del ids[position]
+        del records[position]
+
+    def _table(self, connection, table):
+        '''
+        Returns the copy of a table, loaded if needed.
+        '''
+        replica = self._tables.get(table)
+        if replica is None:
+            replica = self._load(connection, table)
+        return replica
+
+    def _load(self, connection, table):
+        '''
+        Reads a table without holding the lock. The copy is only kept if the
+        table did not change while it was read.
+        '''
+        record_class, key = self.TABLES[table]
+        with self.lock:
+            changes = self._changes.get(table, 0)
+        cur = connection.con.cursor()
+        cur.execute('SELECT %s FROM %s ORDER BY 1' % (record_class.COLUMNS, table))
+        records = [record_class(tuple(row)) for row in cur.fetchall()]
+        replica = (records, [record._values[0] for record in records],
+                   dict((record[key], record) for record in records))
+        with self.lock:
+            if self._changes.get(table, 0) == changes:
+                self._tables[table] = replica
+        return replica
+
+
+class BookingListCache(object):
+    '''
+    Least recently used cache of the booking lists of the rooms, so the
+    bookings of a room are not read again while nobody books it.
+
+    The lists are kept by :py:meth:`Connection.get_bookings` under the room,
+    the query parameters and two versions of :py:class:`Versions`: the
+    version of the room, which the connections increase when they add,
+    modify or delete one of its bookings, and the version of all bookings,
+    increased when bookings of several rooms are deleted at once (the
+    cascade of :py:meth:`Connection.delete_user`). A list is never found
+    again once its room has changed, and it is evicted when ``max_size``
+    more recently used lists are kept.
+
+    The cache only sees the changes made through the connections of its
+    Engine, which share it. It can be used from several threads.
 
+    An instance of this class should not be instantiated directly using the
+    constructor. It is created by :py:class:`Engine`.
+
+    :param int max_size: Number of lists kept, 0 disables the cache.
 
-# Engine class makes use of codes from Forum exercise
-class Engine(object):
     '''
-    Abstraction of the database.
+    def __init__(self, max_size=DEFAULT_BOOKING_CACHE_SIZE):
+        super(BookingListCache, self).__init__()
+        self.max_size = max_size
+        self._lists = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        '''
+        Returns the list kept under a key and marks it as recently used.
 
-    It includes tools to connect to the sqlite file. You can access the Connection
-    instance.
-    :py:meth:`connection`.
+        :return: a copy of the list, or None if it is not kept.
+        :rtype: list
 
-    :Example:
+        '''
+        with self._lock:
+            bookings = self._lists.pop(key, None)
+            if bookings is None:
+                self.misses += 1
+                return None
+            self._lists[key] = bookings
+            self.hits += 1
+        return list(bookings)
 
-    > engine = Engine()
-    > con = engine.connect()
+    def put(self, key, bookings):
+        '''
+        Keeps a list, evicting the least recently used ones over
+        ``max_size``.
 
-    :param db_path: The path of the database file (always with respect to the
-        calling script. If not specified, the Engine will use the file located
-        at *database/tellus.db*
+        :param tuple key: The room, query parameters and versions.
+        :param list bookings: The :py:class:`BookingRecord` of the list.
+
+        '''
+        if not self.max_size:
+            return
+        with self._lock:
+            self._lists.pop(key, None)
+            self._lists[key] = list(bookings)
+            while len(self._lists) > self.max_size:
+                self._lists.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        '''
+        Forgets all lists. The counters are kept.
+        '''
+        with self._lock:
+            self._lists.clear()
+
+    def stats(self):
+        '''
+        Returns the statistics of the cache.
 
+        :return: a dictionary with the following keys:
+
+            * ``size``: Number of lists kept.
+            * ``max_size``: Maximum number of lists kept.
+            * ``hits``: Lists found since the cache was created.
+            * ``misses``: Lists read from the database.
+            * ``evictions``: Lists evicted to make room for newer ones.
+
+        :rtype: dict
+
+        '''
+        with self._lock:
+            return {"size": len(self._lists), "max_size": self.max_size,
+                    "hits": self.hits, "misses": self.misses,
+                    "evictions": self.evictions}
+
+
+class Statement(object):
     '''
-    def __init__(self, db_path=None):
-        super(Engine, self).__init__()
-        if db_path is not None:
-            self.db_path = db_path
-        else:
-            self.db_path = DEFAULT_DB_PATH
+    A SQL statement recorded by :py:class:`QueryProfiler`.
 
-    def connect(self):
+    :param con: The sqlite3 connection which ran the statement.
+    :param str sql: The SQL text.
+    :param parameters: The parameters of the statement, None for
+        ``executemany`` and ``executescript``.
+
+    '''
+    def __init__(self, con, sql, parameters):
+        super(Statement, self).__init__()
+        self.con = con
+        self.sql = sql
+        self.parameters = parameters
+        # Seconds spent running the statement and fetching its rows
+        self.seconds = 0.0
+
+    def __repr__(self):
+        return "<Statement %.3f ms %s %r>" % (self.seconds * 1000, self.sql, self.parameters)
+
+
+class QueryProfiler(object):
+    '''
+    Records the SQL statements run by the connections of an Engine during a
+    unit of work, such as a request: their text, their parameters and the
+    time spent running them and fetching their rows.
+
+    A unit of work runs in one thread between :py:meth:`start` and
+    :py:meth:`finish`. Statements run outside of it are not recorded. When it
+    finishes, the profiler logs a warning for every slow statement with its
+    query plan, and if the unit ran more than ``max_statements`` statements,
+    ran the same statement with the same parameters twice or ran the same SQL
+    more than ``max_repeats`` times, as loops of queries (N+1) do.
+
+    The profiler is given to the Engine, whose connections then use profiled
+    cursors. Without a profiler connections are not slowed down.
+
+    :param float slow_query: Seconds after which a statement is slow.
+    :param int max_statements: Number of statements a unit of work may run.
+    :param int max_repeats: Number of times a unit of work may run the same
+        SQL with other parameters.
+    :param logger: The logger of the warnings, *reservation.database* by
+        default.
+    :type logger: logging.Logger
+
+    '''
+    def __init__(self, slow_query=SLOW_QUERY_TIME, max_statements=MAX_STATEMENTS,
+                 max_repeats=MAX_REPEATS, logger=None):
+        super(QueryProfiler, self).__init__()
+        self.slow_query = slow_query
+        self.max_statements = max_statements
+        self.max_repeats = max_repeats
+        self.logger = logger if logger is not None else logging.getLogger("reservation.database")
+        # Statements of the unit of work of each thread
+        self._local = threading.local()
+
+    def start(self):
         '''
-        Creates a connection to the database.
+        Starts recording the statements of this thread.
 
-        :return: A Connection instance
-        :rtype: Connection
+        '''
+        self._local.statements = []
 
+    def record(self, con, sql, parameters):
         '''
-        return Connection(self.db_path)
+        Records a statement if a unit of work is running in this thread.
+
+        :return: the :py:class:`Statement`, or None if it is not recorded.
+
+        '''
+        statements = getattr(self._local, "statements", None)
+        if statements is None:
+            return None
+        statement = Statement(con, sql, parameters)
+        statements.append(statement)
+        return statement
+
+    def finish(self, label="unit of work"):
+        '''
+        Stops recording the statements of this thread and logs the slow,
+        repeated and too many statements.
+
+        :param str label: Name of the unit of work in the warnings, e.g. the
+            method and the path of a request.
+        :return: the recorded statements in the order they were run.
+        :rtype: list
+
+        '''
+        statements = getattr(self._local, "statements", None)
+        self._local.statements = None
+        if statements is None:
+            return []
+        for statement in statements:
+            if statement.seconds >= self.slow_query:
+                plan = self.explain(statement)
+                self.logger.warning("%s: slow query (%.1f ms): %s %r%s", label, statement.seconds * 1000,
+                                    statement.sql, statement.parameters, "\n" + plan if plan else "")
+        if len(statements) > self.max_statements:
+            self.logger.warning("%s: ran %d statements, more than %d", label, len(statements),
+                                self.max_statements)
+        counted = [statement for statement in statements if not TRANSACTION.match(statement.sql)]
+        identical = collections.Counter((statement.sql, repr(statement.parameters)) for statement in counted)
+        for (sql, parameters), count in identical.iteritems():
+            if count > 1:
+                self.logger.warning("%s: ran the same statement %d times: %s %s", label, count, sql, parameters)
+        repeated = collections.Counter(statement.sql for statement in counted)
+        for sql, count in repeated.iteritems():
+            if count > self.max_repeats:
+                self.logger.warning("%s: ran the same query %d times with other parameters: %s",
+                                    label, count, sql)
+        return statements
+
+    def explain(self, statement):
+        '''
+        Returns the query plan of a statement, one step per line, or an
+        empty string if it has none.
+
+        '''
+        if statement.parameters is None or not EXPLAINABLE.match(statement.sql):
+            return ""
+        try:
+            # A plain cursor, the plan is not recorded
+            cur = sqlite3.Connection.cursor(statement.con)
+            cur.execute("EXPLAIN QUERY PLAN " + statement.sql, statement.parameters)
+            return "\n".join("QUERY PLAN %s" % row[-1] for row in cur.fetchall())
+        except sqlite3.Error, excp:
+            return "QUERY PLAN unknown: %s" % excp.args[0]
+
+
+class ProfiledCursor(sqlite3.Cursor):
+    '''
+    Cursor which records its statements in the :py:class:`QueryProfiler` of
+    its connection, with the time spent running them and fetching their rows.
+
+    '''
+    statement = None
+
+    def _timed(self, method, *args):
+        start = timeit.default_timer()
+        try:
+            return method(self, *args)
+        finally:
+            if self.statement is not None:
+                self.statement.seconds += timeit.default_timer() - start
+
+    def execute(self, sql, parameters=()):
+        self.statement = self.connection.profiler.record(self.connection, sql, parameters)
+        return self._timed(sqlite3.Cursor.execute, sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        self.statement = self.connection.profiler.record(self.connection, sql, None)
+        return self._timed(sqlite3.Cursor.executemany, sql, seq_of_parameters)
+
+    def executescript(self, script):
+        self.statement = self.connection.profiler.record(self.connection, script, None)
+        return self._timed(sqlite3.Cursor.executescript, script)
+
+    def fetchone(self):
+        return self._timed(sqlite3.Cursor.fetchone)
+
+    def fetchmany(self, *args):
+        return self._timed(sqlite3.Cursor.fetchmany, *args)
+
+    def fetchall(self):
+        return self._timed(sqlite3.Cursor.fetchall)
+
+    def next(self):
+        return self._timed(sqlite3.Cursor.next)
+
+
+class ProfiledConnection(sqlite3.Connection):
+    '''
+    sqlite3 connection whose cursors are :py:class:`ProfiledCursor`. Its
+    ``profiler`` attribute is set by :py:class:`Connection`.
+
+    '''
+    profiler = None
+
+    def cursor(self, factory=ProfiledCursor):
+        return sqlite3.Connection.cursor(self, factory)
 
 
 class Connection(object):
@@ -49,19 +1562,101 @@ class Connection(object):
     class through the :py:attr:`self.con` attribute.
 
     An instance of this class should not be instantiated directly using the
-    constructor. Instead use the :py:meth:`Engine.connect`.
+    constructor. Instead use the :py:meth:`Engine.connect` or borrow one from
+    the pool with :py:meth:`Engine.checkout`.
 
     Use the method :py:meth:`close` in order to close a connection.
     A :py:class:`Connection` **MUST** always be closed once when it is not going to be
-    utilized anymore in order to release internal locks.
+    utilized anymore in order to release internal locks. Borrowed connections
+    are given back with :py:meth:`Engine.checkin` instead.
 
     :param db_path: Location of the database file.
     :type dbpath: str
+    :param bool check_same_thread: If ``False`` the connection can be used
+        from other threads than the one that created it (one at a time).
+    :param dict profile: Tuning profile applied once when the connection is
+        opened. If not specified the *default* profile of :py:data:`PROFILES`
+        is used.
+    :param bool readonly: If ``True`` any statement that modifies the
+        database fails (PRAGMA query_only).
+    :param intervals: The booked intervals of the rooms, shared by the
+        connections of an Engine. If not specified the connection has its
+        own.
+    :type intervals: BookingIntervals
+    :param profiler: If given, the statements are recorded by it.
+    :type profiler: QueryProfiler
+    :param versions: The versions of the data, shared by the connections of
+        an Engine. If not specified the connection has its own.
+    :type versions: Versions
+    :param replica: The copy of the Users and Rooms tables, shared by the
+        connections of an Engine. If not specified the connection has its
+        own.
+    :type replica: TableReplica
+    :param booking_cache: The booking lists of the rooms, shared by the
+        connections of an Engine. If not specified the connection has its
+        own.
+    :type booking_cache: BookingListCache
 
     '''
-    def __init__(self, db_path):
+    def __init__(self, db_path, check_same_thread=True, profile=None, readonly=False,
+                 intervals=None, profiler=None, versions=None, replica=None,
+                 booking_cache=None):
         super(Connection, self).__init__()
-        self.con = sqlite3.connect(db_path)
+        if profiler is not None:
+            self.con = sqlite3.connect(db_path, check_same_thread=check_same_thread,
+                                       factory=ProfiledConnection)
+            self.con.profiler = profiler
+        else:
+            self.con = sqlite3.connect(db_path, check_same_thread=check_same_thread)
+        self.readonly = readonly
+        self.intervals = intervals if intervals is not None else BookingIntervals()
+        self.versions = versions if versions is not None else Versions()
+        self.replica = replica if replica is not None else TableReplica()
+        self.booking_cache = booking_cache if booking_cache is not None else BookingListCache()
+        self._apply_profile(profile if profile is not None else PROFILES[DEFAULT_PROFILE])
+        if readonly:
+            self.con.execute("PRAGMA query_only = ON")
+
+    def _apply_profile(self, profile):
+        '''
+        Initializes the connection: rows are returned as :py:class:`sqlite3.Row`
+        and every setting of the profile is executed as a PRAGMA.
+
+        :param dict profile: The tuning profile.
+
+        '''
+        self.con.row_factory = sqlite3.Row
+        cur = self.con.cursor()
+        for name in PROFILE_SETTINGS:
+            value = profile.get(name, None)
+            if value is None:
+                continue
+            if isinstance(value, bool):
+                value = "ON" if value else "OFF"
+            cur.execute("PRAGMA %s = %s" % (name, value))
+            if name == "journal_mode":
+                # journal_mode returns the new mode as a row
+                cur.fetchall()
+
+    def get_settings(self):
+        '''
+        Reads back the settings of :py:data:`PROFILE_SETTINGS` from the
+        database.
+
+        :return: a dictionary with one key per setting. ``journal_mode`` is
+            lower case, ``foreign_keys`` is a boolean and the other values are
+            the integers returned by SQLite.
+        :rtype: dict
+
+        '''
+        cur = self.con.cursor()
+        settings = {}
+        for name in PROFILE_SETTINGS:
+            cur.execute("PRAGMA %s" % name)
+            row = cur.fetchone()
+            settings[name] = row[0] if row is not None else None
+        settings["foreign_keys"] = settings["foreign_keys"] == 1
+        return settings
 
     def close(self):
         '''
@@ -71,6 +1666,7 @@ class Connection(object):
         if self.con:
             self.con.commit()
             self.con.close()
+            self.con = None
 
     # FOREIGN KEY STATUS
     # check_foreign_keys_status function makes use of codes from Forum exercise
@@ -90,8 +1686,8 @@ class Connection(object):
             cur.execute('PRAGMA foreign_keys')
             # We know we retrieve just one record: use fetchone()
             data = cur.fetchone()
-            is_activated = data == (1,)
-            print "Foreign Keys status: %s" % 'ON' if is_activated else 'OFF'
+            is_activated = data[0] == 1
+            print "Foreign Keys status: %s" % ('ON' if is_activated else 'OFF')
         except sqlite3.Error, excp:
             print "Error %s:" % excp.args[0]
             self.close()
@@ -138,141 +1734,13 @@ class Connection(object):
             print "Error %s:" % excp.args[0]
             return False
 
-    # Helpers
-    # _create_user_object function makes use of codes from Forum exercise
-    def _create_user_object(self, row):
-        '''
-        It takes a database Row and transform it into a python dictionary.
-
-        :param row: The row obtained from the database.
-        :type row: sqlite3.Row
-        :return: a dictionary with the following format:
-
-            .. code-block:: javascript
-
-                {
-                    "userid": '',
-                    "accounttype": '',
-                    "username": '',
-                    "password": '',
-                    "firstname": '',
-                    "lastname": '',
-                    "email": '',
-                    "contactnumber": ''
-                }
-
-            where:
-
-            * ``userid``: Unique identifying user ID.
-            * ``isAdmin``: Account type to identify User or Admin.
-            * ``username``: Username of user login.
-            * ``password``: User's login password.
-            * ``firstname``: First name of user.
-            * ``lastname``: Last name of user.
-            * ``email``: Email of user.
-            * ``contactnumber``: Contact number of user.
-
-            Note that all values are string if they are not otherwise indicated.
-
-        '''
-        return {
-            "userID": str(row["userID"]),
-            "isAdmin": str(row["isAdmin"]),
-            "username": row["username"],
-            "password": row["password"],
-            "firstname": row["firstName"],
-            "lastname": row["lastName"],
-            "email": row["email"],
-            "contactnumber": row["contactNumber"]
-        }
-    
-    # _create_room_object function makes use of codes from Forum exercise
-    def _create_room_object(self, row):
-        '''
-        It takes a database Row and transform it into a python dictionary.
-
-        :param row: The row obtained from the database.
-        :type row: sqlite3.Row
-        :return: a dictionary with the following format:
-
-            .. code-block:: javascript
-
-                {
-                    "roomid": '',
-                    "roomname": '',
-                    "picture": '',
-                    "resources": ''
-                }
-
-            where:
-
-            * ``roomid``: Unique identifying room ID.
-            * ``roomname``: Name of room to be booked.
-            * ``picture``: Image of the room.
-            * ``resources``: Room equiments.
-
-        '''
-        return {
-            "roomid": str(row["roomID"]),
-            "roomname": row["roomName"],
-            "picture": row["picture"],
-            "resources": row["resources"]
-        }
-
-    # _create_booking_object function makes use of codes from Forum exercise
-    def _create_booking_object(self, row):
-        '''
-        It takes a database Row and transform it into a python dictionary.
-
-        :param row: The row obtained from the database.
-        :type row: sqlite3.Row
-        :return: a dictionary with the following format:
-
-            .. code-block:: javascript
-
-                {
-                    "bookingID": '',
-                    "roomname": '',
-                    "username": '',
-                    "bookingTime": '',
-                    "firstname": '',
-                    "lastname": '',
-                    "email": '',
-                    "contactnumber": ''
-                }
-
-            where:
-
-            * ``bookingID``: ID number of the booking.
-            * ``roomname``: Name of room to be booked.
-            * ``username``: User name of the user create the booking.
-            * ``bookingTime``: Date and time of booking.
-            * ``firstname``: First name of user.
-            * ``lastname``: Last name of user.
-            * ``email``: Email of user.
-            * ``contactnumber``: Contact number of user.
-
-            Note that all values are string if they are not otherwise indicated.
-
-        '''
-        return {
-            "bookingID": row["bookingID"],
-            "roomname": row["roomName"],
-            "username": str(row["username"]),
-            "bookingTime": str(row["bookingTime"]),
-            "firstname": row["firstName"],
-            "lastname": row["lastName"],
-            "email": row["email"],
-            "contactnumber": row["contactNumber"]
-        }
-
     #DATABASE API
     #User
     def get_users(self):
         '''
         Extracts all existence Users in the database.
-        :return:A list of Users. Each user is a dictionary containing
-                the following keys:
+        :return:A list of Users. Each user is a :py:class:`UserRecord`, read
+                like a dictionary containing the following keys:
 
             *``userID``     :ID of User. INTEGER. UNIQUE.
             *``isAdmin``    :is current user admin or not. 0 mean not admin. INTEGER. UNIQUE.
@@ -286,23 +1754,36 @@ class Connection(object):
             *There is no FOREIGN KEY.
             *None is returned if the database has no Users.
 
+        The users are read from the :py:class:`TableReplica` of the
+        connection, in order of userID.
+
         '''
-        # SQL query to get the list of existence Users
-        query = 'SELECT * FROM Users'
-        # Cursor and row initialization
-        self.con.row_factory = sqlite3.Row
+        return self.replica.rows(self, "Users")
+
+    def get_user(self, username):
+        '''
+        Extracts one User from the database with an index lookup.
+
+        :param str username: The username of the user.
+        :return: A :py:class:`UserRecord` with the keys of
+            :py:meth:`get_users` or None if there is no user with the given
+            username.
+
+        Names are looked up in the :py:class:`TableReplica` of the
+        connection, without SQL.
+
+        '''
+        if isinstance(username, basestring):
+            return self.replica.get(self, "Users", username)
+        # SQL query to get one User, username is UNIQUE
+        query = 'SELECT ' + UserRecord.COLUMNS + ' FROM Users WHERE username = ?'
+        # Cursor initialization, rows are built as records
         cur = self.con.cursor()
+        cur.row_factory = UserRecord.row_factory
         # Execute main SQL Statement
-        cur.execute(query)
-        # Get results
-        rows = cur.fetchall()
-        if rows is None:
-            return None
-        # Build the return object
-        users = []
-        for row in rows:
-            users.append(self._create_user_object(row))
-        return users
+        cur.execute(query, (username,))
+        # Only one value expected, None if there is no user
+        return cur.fetchone()
 
     def add_user(self, username, user_dict):
         '''
@@ -355,28 +1836,33 @@ class Connection(object):
         _email = user_dict.get('email', None)
         _contactnumber = user_dict.get('contactNumber', None)
 
-        # Activate foreign key support
-        self.set_foreign_keys_support()
-        # Cursor and row initialization
-        self.con.row_factory = sqlite3.Row
+        # SQL Statement to read the new row back for the replica
+        query3 = 'SELECT ' + UserRecord.COLUMNS + ' FROM Users WHERE userID = ?'
+
+        # Cursor initialization
         cur = self.con.cursor()
-        # Execute the statement to extract the id associated to a username
-        pvalue = (username,)
-        cur.execute(query1, pvalue)
-        # No value expected (no other user with that username expected)
-        row = cur.fetchone()
-        # If there is no user add rows in user and user profile
-        if row is None:
-            # Add the row in users table
-            # Execute the statement
-            pvalue = (_isadmin, username, _password, _firstname, _lastname,
-                      _email, _contactnumber)
-            cur.execute(query2, pvalue)
-            self.con.commit()
-            # We do not do any composition and return the username
-            return username
-        else:
-            return None
+        # Changes of Users are applied to the replica in order of commit
+        with self.replica.lock:
+            # Execute the statement to extract the id associated to a username
+            pvalue = (username,)
+            cur.execute(query1, pvalue)
+            # No value expected (no other user with that username expected)
+            row = cur.fetchone()
+            # If there is no user add rows in user and user profile
+            if row is None:
+                # Add the row in users table
+                # Execute the statement
+                pvalue = (_isadmin, username, _password, _firstname, _lastname,
+                          _email, _contactnumber)
+                cur.execute(query2, pvalue)
+                self.con.commit()
+                # The row as SQLite stored it
+                cur.execute(query3, (cur.lastrowid,))
+                self.replica.put("Users", UserRecord(tuple(cur.fetchone())))
+                # We do not do any composition and return the username
+                return username
+            else:
+                return None
 
     def delete_user(self, username):
         '''
@@ -391,26 +1877,29 @@ class Connection(object):
         # Create the SQL Statements
         # SQL Statement for deleting the user information
         query = 'DELETE FROM Users WHERE username = ?'
-        # Activate foreign key support
-        self.set_foreign_keys_support()
-        # Cursor and row initialization
-        self.con.row_factory = sqlite3.Row
+        # Cursor initialization
         cur = self.con.cursor()
-        # Execute the statement to delete
-        pvalue = (username,)
-        cur.execute(query, pvalue)
-        self.con.commit()
-        # Check that it has been deleted
-        if cur.rowcount < 1:
-            return False
+        # Changes of Users are applied to the replica in order of commit
+        with self.replica.lock:
+            # Execute the statement to delete
+            pvalue = (username,)
+            cur.execute(query, pvalue)
+            self.con.commit()
+            # Check that it has been deleted
+            if cur.rowcount < 1:
+                return False
+            self.replica.remove("Users", username)
+        # The bookings of the user were deleted too
+        self.intervals.clear()
+        self.versions.bump("bookings")
         return True
 
     #Room
     def get_rooms(self):
         '''
         Extracts all existence rooms in the database.
-        :return:A list of Rooms. Each Room is a dictionary containing
-                the following keys:
+        :return:A list of Rooms. Each Room is a :py:class:`RoomRecord`, read
+                like a dictionary containing the following keys:
 
             *``roomID``     :ID of the room. INTEGER. UNIQUE.
             *``roomName``   :Name of the room. TEXT. UNIQUE.
@@ -420,23 +1909,36 @@ class Connection(object):
             *There is no FOREIGN KEY.
             *None is returned if the database has no rooms.
 
+        The rooms are read from the :py:class:`TableReplica` of the
+        connection, in order of roomID.
+
         '''
-        # SQL query to get the list of existence rooms
-        query = 'SELECT * FROM Rooms'
-        # Cursor and row initialization
-        self.con.row_factory = sqlite3.Row
+        return self.replica.rows(self, "Rooms")
+
+    def get_room(self, roomname):
+        '''
+        Extracts one Room from the database with an index lookup.
+
+        :param str roomname: The name of the room.
+        :return: A :py:class:`RoomRecord` with the keys of
+            :py:meth:`get_rooms` or None if there is no room with the given
+            name.
+
+        Names are looked up in the :py:class:`TableReplica` of the
+        connection, without SQL.
+
+        '''
+        if isinstance(roomname, basestring):
+            return self.replica.get(self, "Rooms", roomname)
+        # SQL query to get one Room, roomName is UNIQUE
+        query = 'SELECT ' + RoomRecord.COLUMNS + ' FROM Rooms WHERE roomName = ?'
+        # Cursor initialization, rows are built as records
         cur = self.con.cursor()
+        cur.row_factory = RoomRecord.row_factory
         # Execute main SQL Statement
-        cur.execute(query)
-        # Get results
-        rows = cur.fetchall()
-        if rows is None:
-            return None
-        # Build the return object
-        rooms = []
-        for row in rows:
-            rooms.append(self._create_room_object(row))
-        return rooms
+        cur.execute(query, (roomname,))
+        # Only one value expected, None if there is no room
+        return cur.fetchone()
 
     def modify_room(self, roomName, room_dict):
         '''
@@ -454,6 +1956,8 @@ class Connection(object):
         query1 = 'SELECT roomID from Rooms WHERE roomName = ?'
         #SQL Statement to update the Rooms table
         query2 = 'UPDATE Rooms SET picture = ?,resources = ? WHERE roomname = ?'
+        #SQL Statement to read the row back for the replica
+        query3 = 'SELECT ' + RoomRecord.COLUMNS + ' FROM Rooms WHERE roomID = ?'
         # Check dict
         if not 'picture' in room_dict:
             return None
@@ -463,18 +1967,18 @@ class Connection(object):
         #temporal variables
         _picture = room_dict.get('picture', None)
         _resources = room_dict.get('resources', None)
-        #Cursor and row initialization
-        self.con.row_factory = sqlite3.Row
+        #Cursor initialization
         cur = self.con.cursor()
-        #Execute the statement to extract the id associated to a roomName
-        pvalue = (roomName,)
-        cur.execute(query1, pvalue)
-        #Only one value expected
-        row = cur.fetchone()
-        #if does not exist, return
-        if row is None:
-            return None
-        else:
+        #Changes of Rooms are applied to the replica in order of commit
+        with self.replica.lock:
+            #Execute the statement to extract the id associated to a roomName
+            pvalue = (roomName,)
+            cur.execute(query1, pvalue)
+            #Only one value expected
+            row = cur.fetchone()
+            #if does not exist, return
+            if row is None:
+                return None
             #execute the main statement
             pvalue = (_picture, _resources, roomName)
             cur.execute(query2, pvalue)
@@ -482,21 +1986,44 @@ class Connection(object):
             #Check that we have modified the user
             if cur.rowcount < 1:
                 return None
+            #The row as SQLite stored it
+            cur.execute(query3, (row[0],))
+            self.replica.put("Rooms", RoomRecord(tuple(cur.fetchone())))
+            # Representations of the rooms are out of date
+            self.versions.bump("rooms")
             return roomName
 
     #Booking
-    def get_bookings(self, roomname=None):
+    def get_bookings(self, roomname=None, username=None, before=None, after=None,
+                     order="bookingID", start=None, limit=None):
         '''
         Return a list of all the bookings in the database filtered by the
-        roomname if it is passed as argument.
+        roomname, username and booking time if they are passed as arguments.
+        All filters are done by SQLite with the indexes of Bookings.
 
         :param roomname: default None. Search bookings of a room with the given
             roomname. If this parameter is None, it returns the bookings of
             any room in the system.
         :type roomname: str
-
-        :return: A list of bookings. Each booking is a dictionary containing
-            the following keys:
+        :param str username: default None. Search bookings of the user with
+            the given username.
+        :param before: default None. Only bookings whose start is strictly
+            earlier than this time, a datetime or a string in
+            :py:data:`BOOKING_TIME_FORMAT`.
+        :param after: default None. Only bookings whose start is this time or
+            later, a datetime or a string in :py:data:`BOOKING_TIME_FORMAT`.
+        :param str order: default "bookingID", the order of creation. One of
+            the keys of :py:data:`BOOKING_ORDERS`.
+        :param tuple start: default None. The :py:attr:`BookingRecord.key` of
+            the last booking of the previous page. Only the bookings after it
+            in the given order are returned. The order must be one of the keys
+            of :py:data:`BOOKING_KEYSETS`.
+        :param int limit: default None. The maximum number of bookings to
+            return. If None, all bookings are returned.
+
+        :return: A list of bookings. Each booking is a
+            :py:class:`BookingRecord`, read like a dictionary containing the
+            following keys:
 
             * ``bookingID``: ID number of the booking.
             * ``roomname``: Name of room to be booked.
@@ -508,31 +2035,185 @@ class Connection(object):
             * ``contactnumber``: Contact number of user.
 
             Note that all values in the returned dictionary are string unless
-            otherwise stated.
+            otherwise stated. The booking time as a datetime is
+            :py:attr:`BookingRecord.start`. Bookings whose time is not in
+            :py:data:`BOOKING_TIME_FORMAT` have no start, so the before and
+            after filters never return them.
+
+        The bookings of a room without other filters are kept in the
+        :py:class:`BookingListCache` of the connection until the room
+        changes.
+
+        :raises ValueError: if start is given with an order which cannot be
+            paginated or if before or after is a malformed string.
+
+        '''
+        key = None
+        if roomname is not None and username is None and before is None and after is None \
+                and self.booking_cache.max_size:
+            # Versions are read before the bookings, so a list is never kept
+            # under a version newer than its data
+            key = (roomname, order, tuple(start) if start is not None else None, limit,
+                   self.versions.get("bookings"),
+                   self.versions.get(("bookings", roomname)))
+            bookings = self.booking_cache.get(key)
+            if bookings is not None:
+                return bookings
+        # Execute main SQL Statement
+        cur = self._select_bookings(roomname, username, before, after, order,
+                                    start, limit)
+        # Get results
+        bookings = cur.fetchall()
+        if key is not None and len(bookings) <= BOOKING_CACHE_MAX_ROWS:
+            self.booking_cache.put(key, bookings)
+        return bookings
+
+    def iter_bookings(self, roomname=None, username=None, before=None,
+                      after=None, order="bookingID", start=None, limit=None):
+        '''
+        Iterator version of :py:meth:`get_bookings`. The statement is
+        executed when it is called, then the rows are read from the cursor
+        one at a time, so only one booking is in memory at once. It accepts
+        the same parameters as :py:meth:`get_bookings`.
+
+        :return: An iterator over the bookings, in the format of
+            :py:meth:`get_bookings`.
+        :raises ValueError: if start is given with an order which cannot be
+            paginated or if before or after is a malformed string.
+
+        Pages of the bookings of a room are read with :py:meth:`get_bookings`,
+        so they are kept by the :py:class:`BookingListCache`.
+
+        '''
+        if roomname is not None and username is None and before is None and after is None \
+                and limit is not None and limit <= BOOKING_CACHE_MAX_ROWS:
+            return iter(self.get_bookings(roomname, order=order, start=start, limit=limit))
+        return iter(self._select_bookings(roomname, username, before, after, order,
+                                          start, limit))
+
+    def _select_bookings(self, roomname, username, before, after, order, start,
+                         limit):
+        '''
+        Executes the SELECT statement of :py:meth:`get_bookings` and
+        :py:meth:`iter_bookings`.
+
+        :return: the cursor of the executed statement.
+        :raises ValueError: if start is given with an order which cannot be
+            paginated or if before or after is a malformed string.
 
         '''
+        if start is not None and order not in BOOKING_KEYSETS:
+            raise ValueError("Bookings in order %s cannot be paginated" % order)
         # Create the SQL Statement build the string depending on the existence
-        # of roomname argument.
-        query = 'SELECT * FROM Bookings'
-        # Nickname restriction
+        # of the filter arguments.
+        query = 'SELECT ' + BookingRecord.COLUMNS + ' FROM Bookings'
+        conditions = []
+        pvalue = []
+        # Roomname restriction
         if roomname is not None:
-            query += " WHERE roomName = '%s'" % roomname
-        # Activate foreign key support
-        self.set_foreign_keys_support()
-        # Cursor and row initialization
-        self.con.row_factory = sqlite3.Row
+            conditions.append('roomName = ?')
+            pvalue.append(roomname)
+        # Username restriction
+        if username is not None:
+            conditions.append('username = ?')
+            pvalue.append(username)
+        # Booking time restrictions, in minutes
+        if before is not None:
+            conditions.append('bookingStart < ?')
+            pvalue.append(to_minutes(before))
+        if after is not None:
+            conditions.append('bookingStart >= ?')
+            pvalue.append(to_minutes(after))
+        # Page start restriction
+        if start is not None:
+            booking_start, booking_id = start
+            keyset, null_keyset = BOOKING_KEYSETS[order]
+            if booking_start is None:
+                conditions.append(null_keyset)
+                pvalue.append(booking_id)
+            elif order.startswith('-') and before is None and after is None:
+                # Bookings without start come after the others in descending
+                # order
+                conditions.append('(' + keyset + ' OR bookingStart IS NULL)')
+                pvalue.extend(start)
+            else:
+                conditions.append(keyset)
+                pvalue.extend(start)
+        if conditions:
+            query += ' WHERE ' + ' AND '.join(conditions)
+        query += ' ORDER BY ' + BOOKING_ORDERS[order]
+        if limit is not None:
+            query += ' LIMIT ?'
+            pvalue.append(limit)
+        # Cursor initialization, rows are built as records
+        cur = self.con.cursor()
+        cur.row_factory = BookingRecord.row_factory
+        cur.execute(query, pvalue)
+        return cur
+
+    def get_booking(self, booking_id, roomname=None, username=None):
+        '''
+        Extracts one booking from the database with a primary key lookup.
+
+        :param int booking_id: ID number of the booking.
+        :param str roomname: default None. If given, the booking is returned
+            only if it is a booking of this room.
+        :param str username: default None. If given, the booking is returned
+            only if it is a booking of this user.
+        :return: A :py:class:`BookingRecord` with the keys of
+            :py:meth:`get_bookings` or None if there is no such booking.
+
+        '''
+        # SQL query to get one booking, restricted to a room and a user if given
+        query = 'SELECT ' + BookingRecord.COLUMNS + ' FROM Bookings WHERE bookingID = ?'
+        pvalue = [booking_id]
+        if roomname is not None:
+            query += ' AND roomName = ?'
+            pvalue.append(roomname)
+        if username is not None:
+            query += ' AND username = ?'
+            pvalue.append(username)
+        # Cursor initialization, rows are built as records
         cur = self.con.cursor()
+        cur.row_factory = BookingRecord.row_factory
         # Execute main SQL Statement
-        cur.execute(query)
-        # Get results
-        rows = cur.fetchall()
-        if rows is None:
-            return None
-        # Build the return object
-        bookings = []
-        for row in rows:
-            bookings.append(self._create_booking_object(row))
-        return bookings
+        cur.execute(query, pvalue)
+        # Only one value expected, None if there is no such booking
+        return cur.fetchone()
+
+    def get_overlapping_bookings(self, roomname, booking_time):
+        '''
+        Finds the bookings of a room which conflict with a new booking, with
+        the in-memory index of the booked intervals (:py:attr:`intervals`).
+        Every booking lasts :py:data:`BOOKING_DURATION` minutes.
+
+        :param str roomname: The name of the room.
+        :param booking_time: Date and time of the new booking, a datetime or a
+            string in :py:data:`BOOKING_TIME_FORMAT`.
+        The bookings found in the index are confirmed in the database by
+        their primary key, as other processes may have deleted or moved them.
+        Those which do not overlap any more are dropped from the index.
+
+        :return: the IDs of the overlapping bookings, an empty list if there
+            are none.
+        :rtype: list
+        :raises ValueError: if booking_time is a malformed string.
+
+        '''
+        start = to_minutes(booking_time)
+        found = self.intervals.overlapping(self, roomname, start)
+        if not found:
+            return found
+        # Usually one booking, looked up by its primary key
+        cur = self.con.cursor()
+        cur.execute('SELECT bookingID FROM Bookings WHERE bookingID IN (%s) AND roomName = ?\
+                    AND bookingStart > ? AND bookingStart < ?' % ','.join('?' * len(found)),
+                    found + [roomname, start - BOOKING_DURATION, start + BOOKING_DURATION])
+        confirmed = set(row[0] for row in cur.fetchall())
+        for booking_id in found:
+            if booking_id not in confirmed:
+                self.intervals.remove(booking_id)
+        return [booking_id for booking_id in found if booking_id in confirmed]
 
     def add_booking(self, roomname, username, bookingTime, booking_dict):
         '''
@@ -540,7 +2221,8 @@ class Connection(object):
 
         :param string roomname: The name of the room to book
         :param string username: The user name of user who create the booking
-        :param string bookingTime: Date and time of the booking
+        :param bookingTime: Date and time of the booking, a datetime or a
+            string in :py:data:`BOOKING_TIME_FORMAT`
         :param dict booking: a dictionary with the information to be modified.
 
         :return: tuple booking: a tuple which includes roomname username and bookingTime
@@ -548,11 +2230,17 @@ class Connection(object):
 
         '''
         # Create the SQL Statements
-        # SQL Statement for extracting the bookingID given a bookingID
-        query1 = 'SELECT bookingID from Bookings WHERE roomName = ? AND username = ? AND bookingTime = ?'
-        # SQL Statement to create the row in  Bookings table
-        query2 = 'INSERT INTO Bookings(roomName, username, bookingTime, firstName, lastName, email, contactNumber)\
-                                        VALUES(?,?,?,?,?,?,?)'
+        # SQL Statement to create the row in Bookings table unless the room
+        # is already booked, a single statement so that no other booking can
+        # be written between the check and the insert. A booking overlaps if
+        # it starts less than BOOKING_DURATION minutes before or after. Times
+        # which are not well formed are compared as text.
+        query = 'INSERT INTO Bookings(roomName, username, bookingTime, firstName, lastName, email, contactNumber, bookingStart)\
+                                        SELECT ?,?,?,?,?,?,?,? WHERE NOT EXISTS\
+                                        (SELECT 1 FROM Bookings WHERE roomName = ? AND bookingStart > ? AND bookingStart < ?)'
+        query_text = 'INSERT INTO Bookings(roomName, username, bookingTime, firstName, lastName, email, contactNumber, bookingStart)\
+                                        SELECT ?,?,?,?,?,?,?,? WHERE NOT EXISTS\
+                                        (SELECT 1 FROM Bookings WHERE roomName = ? AND bookingTime = ?)'
         # Check dict
         if not 'firstname' in booking_dict:
             return None
@@ -563,30 +2251,151 @@ class Connection(object):
         if not 'contactnumber' in booking_dict:
             return None
 
-        # Activate foreign key support
-        self.set_foreign_keys_support()
-        # Cursor and row initialization
-        self.con.row_factory = sqlite3.Row
-        cur = self.con.cursor()
-        # Execute the statement to extract the roomname, username, bookingTime associated to a bookingID
-        pvalue = (roomname, username, bookingTime)
-        cur.execute(query1, pvalue)
-        # Returns row if already exists
-        row = cur.fetchone()
-        # If there is no booking add rows in Bookings and booking details
-        if row is None:
-            # Add the row in Bookings table
-            # Execute the statement
-            pvalue = (roomname, username, bookingTime, booking_dict['firstname'], booking_dict['lastname'],
-                      booking_dict['email'], booking_dict['contactnumber'])
-            cur.execute(query2, pvalue)
-            # Get last row id (AUTO_INCREMENT)
-            booking_id = cur.lastrowid
-            self.con.commit()
-            # We do not do any comprobation and return the booking_id, roomname, username, bookingTime
-            return booking_id, roomname, username, bookingTime
+        # Booking time as text and as minutes since the epoch
+        _bookingtime = format_booking_time(bookingTime)
+        _bookingstart = _booking_start(bookingTime)
+        pvalue = (roomname, username, _bookingtime, booking_dict['firstname'], booking_dict['lastname'],
+                  booking_dict['email'], booking_dict['contactnumber'], _bookingstart, roomname)
+        if _bookingstart is not None:
+            pvalue += (_bookingstart - BOOKING_DURATION, _bookingstart + BOOKING_DURATION)
         else:
+            query = query_text
+            pvalue += (_bookingtime,)
+        # Cursor initialization
+        cur = self.con.cursor()
+
+        def write():
+            cur.execute(query, pvalue)
+            # No row is inserted if the room is already booked. Get last row
+            # id (AUTO_INCREMENT)
+            return cur.rowcount, cur.lastrowid
+
+        inserted, booking_id = self._write_immediately(cur, write)
+        if inserted < 1:
             return None
+        self.intervals.add(roomname, booking_id, _bookingstart)
+        self.versions.bump(("bookings", roomname))
+        # We do not do any comprobation and return the booking_id, roomname, username, bookingTime
+        return booking_id, roomname, username, bookingTime
+
+    def add_bookings(self, bookings):
+        '''
+        Add several bookings in one transaction. The bookings are checked in
+        one pass: each room is read once, in the range of the new bookings,
+        and every booking is compared with the bookings of the database and
+        the earlier bookings of the list. The accepted bookings are inserted
+        with one executemany.
+
+        :param list bookings: dictionaries with the keys roomname, username,
+            bookingTime, firstname, lastname, email and contactnumber. The
+            bookingTime is a datetime or a string in
+            :py:data:`BOOKING_TIME_FORMAT`.
+
+        :return: a list with, in the order of bookings, the tuple returned by
+            :py:meth:`add_booking` for each added booking, or None if the
+            booking is not complete, its room or user does not exist or it
+            overlaps another booking of the room.
+        :rtype: list
+
+        '''
+        # SQL Statement to create the rows in Bookings table
+        query = 'INSERT INTO Bookings(bookingID, roomName, username, bookingTime, firstName, lastName, email, contactNumber, bookingStart)\
+                                        VALUES(?,?,?,?,?,?,?,?,?)'
+        results = [None] * len(bookings)
+        # Complete bookings as (position, roomname, username, text time,
+        # start, booking), and the earliest and latest start of each room
+        candidates = []
+        ranges = {}
+        for number, booking in enumerate(bookings):
+            if [key for key in BOOKING_KEYS if key not in booking]:
+                continue
+            _bookingstart = _booking_start(booking['bookingTime'])
+            candidates.append((number, booking['roomname'], booking['username'],
+                               format_booking_time(booking['bookingTime']), _bookingstart, booking))
+            if _bookingstart is not None:
+                first, last = ranges.get(booking['roomname'], (_bookingstart, _bookingstart))
+                ranges[booking['roomname']] = (min(first, _bookingstart), max(last, _bookingstart))
+        # Cursor initialization
+        cur = self.con.cursor()
+
+        def write():
+            # Rooms and users which exist, each looked up once
+            found = {}
+            # Booked starts and times without a start of each room
+            starts = {}
+            times = {}
+            for roomname, (first, last) in ranges.iteritems():
+                cur.execute('SELECT bookingStart FROM Bookings WHERE roomName = ? AND bookingStart > ? AND bookingStart < ?\
+                            ORDER BY bookingStart',
+                            (roomname, first - BOOKING_DURATION, last + BOOKING_DURATION))
+                starts[roomname] = [row[0] for row in cur.fetchall()]
+            # The new bookings get the next ids, nobody else writes until
+            # the commit
+            cur.execute('SELECT MAX(bookingID) FROM Bookings')
+            booking_id = cur.fetchone()[0] or 0
+            rows = []
+            for number, roomname, username, _bookingtime, _bookingstart, booking in candidates:
+                for table, column, value in (('Rooms', 'roomName', roomname), ('Users', 'username', username)):
+                    if (table, value) not in found:
+                        cur.execute('SELECT 1 FROM %s WHERE %s = ?' % (table, column), (value,))
+                        found[(table, value)] = cur.fetchone() is not None
+                if not found[('Rooms', roomname)] or not found[('Users', username)]:
+                    continue
+                if _bookingstart is not None:
+                    # First booked start after the start of a booking
+                    # overlapping this one
+                    booked = starts[roomname]
+                    index = bisect.bisect_right(booked, _bookingstart - BOOKING_DURATION)
+                    if index < len(booked) and booked[index] < _bookingstart + BOOKING_DURATION:
+                        continue
+                    booked.insert(index, _bookingstart)
+                else:
+                    if roomname not in times:
+                        cur.execute('SELECT bookingTime FROM Bookings WHERE roomName = ? AND bookingStart IS NULL',
+                                    (roomname,))
+                        times[roomname] = set(row[0] for row in cur.fetchall())
+                    if _bookingtime in times[roomname]:
+                        continue
+                    times[roomname].add(_bookingtime)
+                booking_id += 1
+                rows.append((booking_id, roomname, username, _bookingtime, booking['firstname'],
+                             booking['lastname'], booking['email'], booking['contactnumber'], _bookingstart))
+                results[number] = (booking_id, roomname, username, booking['bookingTime'])
+            cur.executemany(query, rows)
+            return rows
+
+        rows = self._write_immediately(cur, write)
+        for row in rows:
+            self.intervals.add(row[1], row[0], row[8])
+        for roomname in set(row[1] for row in rows):
+            self.versions.bump(("bookings", roomname))
+        return results
+
+    def _write_immediately(self, cur, write):
+        '''
+        Calls write() inside a transaction which takes the write lock before
+        reading, so concurrent writers wait for it instead of reading the same
+        free slot. The transaction is committed if write() returns and rolled
+        back if it raises.
+
+        :return: what write() returns.
+
+        '''
+        # Commit what is pending, the transaction is handled here
+        self.con.commit()
+        isolation_level = self.con.isolation_level
+        self.con.isolation_level = None
+        try:
+            cur.execute("BEGIN IMMEDIATE")
+            try:
+                result = write()
+            except:
+                cur.execute("ROLLBACK")
+                raise
+            cur.execute("COMMIT")
+        finally:
+            self.con.isolation_level = isolation_level
+        return result
 
     def modify_booking(self, booking_id, roomname, username, bookingTime, booking_dict):
         '''
@@ -596,9 +2405,12 @@ class Connection(object):
         :param string username: The user name of user who create the booking
         :param string bookingTime: Date and bookingTime of the booking
         :param dict booking: a dictionary with the information to be modified.
+            Its bookingTime is a datetime or a string in
+            :py:data:`BOOKING_TIME_FORMAT`.
 
         :return: tuple booking: a tuple which includes roomname username and bookingTime
-            it returns None if booking is not modify in database.
+            it returns None if booking is not modify in database: the booking
+            does not exist or the room is already booked at the new time.
 
         '''
         # Check dict
@@ -626,26 +2438,54 @@ class Connection(object):
         _lastname       = booking_dict.get('lastname', None)
         _email          = booking_dict.get('email', None)
         _contactnumber  = booking_dict.get('contactnumber', None)
-        # Activate foreign key support
-        self.set_foreign_keys_support()
-        # Cursor and row initialization
-        self.con.row_factory = sqlite3.Row
+        # SQL Statement to update the row in Bookings table unless the room
+        # is already booked at the new time by another booking, a single
+        # statement as in add_booking. Times which are not well formed are
+        # compared as text.
+        query = '''UPDATE Bookings SET bookingTime=?, bookingStart=?, firstname=?, lastname=?, email=?, contactnumber=?\
+                                        WHERE bookingID = ? AND NOT EXISTS\
+                                        (SELECT 1 FROM Bookings AS other WHERE other.roomName = Bookings.roomName\
+                                         AND other.bookingID != Bookings.bookingID AND other.bookingStart > ? AND other.bookingStart < ?)'''
+        query_text = '''UPDATE Bookings SET bookingTime=?, bookingStart=?, firstname=?, lastname=?, email=?, contactnumber=?\
+                                        WHERE bookingID = ? AND NOT EXISTS\
+                                        (SELECT 1 FROM Bookings AS other WHERE other.roomName = Bookings.roomName\
+                                         AND other.bookingID != Bookings.bookingID AND other.bookingTime = ?)'''
+        _bookingstart = _booking_start(_bookingtime)
+        pvalue = (format_booking_time(_bookingtime), _bookingstart, _firstname, _lastname, _email,
+                  _contactnumber, booking_id)
+        if _bookingstart is not None:
+            pvalue += (_bookingstart - BOOKING_DURATION, _bookingstart + BOOKING_DURATION)
+        else:
+            query = query_text
+            pvalue += (format_booking_time(_bookingtime),)
+        # Cursor initialization
         cur = self.con.cursor()
-        # Check is that booking exist
-        cur.execute('''SELECT * from Bookings WHERE bookingID=%d''' % booking_id)
-        row = cur.fetchone()
-        # If there is no booking return None, otherwise update the existence booking
-        if row is None:
+
+        def write():
+            # Check is that booking exist
+            cur.execute('''SELECT roomName from Bookings WHERE bookingID = ?''', (booking_id,))
+            row = cur.fetchone()
+            if row is None:
+                return None
+            cur.execute(query, pvalue)
+            # No row is updated if the room is already booked at the new time
+            if cur.rowcount < 1:
+                return None
+            return row[0]
+
+        try:
+            _roomname = self._write_immediately(cur, write)
+        except sqlite3.IntegrityError:
+            # The unique index of the starts of a room, e.g. a booking with
+            # the same start written by an older version of this module
             return None
-        else:
-            # Update the row in Bookings table, run cursor.execute()
-            try:
-                cur.execute('''UPDATE Bookings SET bookingTime=?, firstname=?, lastname=?, email=?, contactnumber=? WHERE bookingID = ?''', (_bookingtime, _firstname, _lastname, _email, _contactnumber, booking_id))
-                self.con.commit()
-            except:
-                print "database.py modify_booking UPDATE database ERROR"
-            # We do not do any comprobation and return the booking_id, roomname, username, bookingTime
-            return booking_id, roomname, username, _bookingtime
+        # If there is no booking or the room is booked, return None
+        if _roomname is None:
+            return None
+        self.intervals.add(_roomname, booking_id, _bookingstart)
+        self.versions.bump(("bookings", _roomname))
+        # We do not do any comprobation and return the booking_id, roomname, username, bookingTime
+        return booking_id, roomname, username, _bookingtime
 
     def delete_booking(self, booking_id, roomName=None, username=None, bookingTime=None):
         '''
@@ -654,22 +2494,29 @@ class Connection(object):
 
         '''
         #Create the SQL Statements
-        query = "DELETE FROM Bookings WHERE bookingID = '%d'" % booking_id
+        query = "DELETE FROM Bookings WHERE bookingID = ?"
+        pvalue = [booking_id]
         if roomName is not None:
-            query += " AND roomName = '%s'" % roomName 
+            query += " AND roomName = ?"
+            pvalue.append(roomName)
         if username is not None:
-            query += " AND username = '%s'" % username
+            query += " AND username = ?"
+            pvalue.append(username)
         if bookingTime is not None:
-            query += " AND bookingTime = '%s'" % bookingTime
-        # Activate foreign key support
-        self.set_foreign_keys_support()
-        #Cursor and row initialization
-        self.con.row_factory = sqlite3.Row
+            query += " AND bookingTime = ?"
+            pvalue.append(format_booking_time(bookingTime))
+        #Cursor initialization
         cur = self.con.cursor()
         #Execute the statement to delete
-        cur.execute(query)
+        cur.execute(query, pvalue)
         self.con.commit()
         #Check that it has been deleted
         if cur.rowcount < 1:
             return False
+        self.intervals.remove(booking_id)
+        # Without the room, the lists of every room are out of date
+        if roomName is not None:
+            self.versions.bump(("bookings", roomName))
+        else:
+            self.versions.bump("bookings")
         return True
\ No newline at end of file
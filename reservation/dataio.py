@@ -0,0 +1,349 @@
+'''
+Bulk import and export of the Tellus database.
+
+Users, rooms and bookings are read and written as CSV files, with a header
+row, or NDJSON files, with one JSON object per line. The columns are named as
+in the tables, see :py:data:`TABLES`. An empty value is NULL. The
+bookingStart column of Bookings is not in the files, it is computed from
+bookingTime. Rows are streamed in batches, so the memory used does not grow
+with the size of the files.
+
+Imports open the database with the *bulk* tuning profile (no journal sync and
+no foreign key checks), drop the indexes of the table which are not unique,
+insert the rows in one transaction per batch and create the indexes again at
+the end.
+
+Run it from the project folder:
+
+    $ python -m reservation.dataio create --force database/tellus.db
+    $ python -m reservation.dataio import database/tellus.db bookings bookings.csv
+    $ python -m reservation.dataio export database/tellus.db bookings bookings.ndjson
+
+A file name of ``-`` is the standard input or output, its format must be
+given with ``--format``.
+'''
+import argparse
+import csv
+import itertools
+import json
+import os
+import sys
+import time
+
+import database
+
+# Files of each table, as (table, columns). The columns are in the order of
+# the CSV files.
+TABLES = {
+    "users": ("Users", ("userID", "isAdmin", "username", "password", "firstName",
+                        "lastName", "email", "contactNumber")),
+    "rooms": ("Rooms", ("roomID", "roomName", "picture", "resources")),
+    "bookings": ("Bookings", ("bookingID", "roomName", "username", "bookingTime",
+                              "firstName", "lastName", "email", "contactNumber"))
+}
+# Order in which the tables are imported and exported, rooms and users first
+# because bookings refer to them
+TABLE_ORDER = ("users", "rooms", "bookings")
+# File formats and their extensions
+FORMATS = {".csv": "csv", ".ndjson": "ndjson", ".jsonl": "ndjson"}
+# Number of rows inserted per transaction
+DEFAULT_BATCH = 50000
+SCHEMA_FILE = "database/tellus_schema_dump.sql"
+DATA_FILE = "database/tellus_data_dump.sql"
+
+
+def get_format(path, file_format=None):
+    '''
+    Returns the format of a file, given or guessed from the extension.
+
+    :raises ValueError: if the format is not known.
+
+    '''
+    if file_format is None:
+        file_format = FORMATS.get(os.path.splitext(path)[1].lower())
+    if file_format not in FORMATS.values():
+        raise ValueError("Unknown format of %s, use --format csv or ndjson" % path)
+    return file_format
+
+
+def _open(path, mode):
+    '''
+    Opens a file, or returns the standard input or output for ``-``.
+    '''
+    if path == "-":
+        return sys.stdin if "r" in mode else sys.stdout
+    return open(path, mode)
+
+
+def read_rows(stream, file_format, columns):
+    '''
+    Reads the rows of a file one at a time. CSV values are returned as UTF-8
+    byte strings, NDJSON values as decoded by json.
+
+    :param stream: An open file.
+    :param str file_format: ``csv`` or ``ndjson``.
+    :param tuple columns: The columns of the table.
+    :return: the columns of the file and an iterator over its rows, as
+        tuples in the order of those columns.
+    :rtype: tuple
+    :raises ValueError: if the file has columns which are not in the table.
+        The keys of the NDJSON objects are checked while they are read.
+
+    '''
+    if file_format == "csv":
+        reader = csv.reader(stream)
+        header = tuple(next(reader, ()))
+        unknown = [column for column in header if column not in columns]
+        if unknown:
+            raise ValueError("Unknown columns: %s" % ", ".join(unknown))
+        return header, (row for row in reader if row)
+    return columns, _read_objects(stream, columns)
+
+
+def _read_objects(stream, columns):
+    '''
+    Reads the objects of an NDJSON file as lists in the order of columns.
+    Missing keys are NULL.
+
+    :raises ValueError: if a line is not an object or has keys which are not
+        in columns.
+
+    '''
+    for number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        item = json.loads(line)
+        if not isinstance(item, dict):
+            raise ValueError("Line %d is not an object" % number)
+        unknown = [key for key in item if key not in columns]
+        if unknown:
+            raise ValueError("Unknown columns on line %d: %s" % (number, ", ".join(sorted(unknown))))
+        yield [item.get(column) for column in columns]
+
+
+def write_rows(stream, file_format, columns, rows):
+    '''
+    Writes rows to a file one at a time. Text values are UTF-8 byte strings
+    and NULL is None. The keys of the NDJSON objects are in no particular
+    order.
+
+    :return: the number of rows written.
+    :rtype: int
+
+    '''
+    count = 0
+    if file_format == "csv":
+        writer = csv.writer(stream)
+        writer.writerow(columns)
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+    else:
+        encode = json.JSONEncoder().encode
+        for row in rows:
+            stream.write(encode(dict(zip(columns, row))))
+            stream.write("\n")
+            count += 1
+    return count
+
+
+def connect(db_path):
+    '''
+    Opens the database with the bulk tuning profile.
+
+    :return: A :py:class:`reservation.database.Connection` whose rows are
+        plain tuples.
+
+    '''
+    connection = database.Engine(db_path, profile="bulk").connect()
+    connection.con.row_factory = None
+    return connection
+
+
+def create_database(db_path, schema=SCHEMA_FILE, data=DATA_FILE):
+    '''
+    Creates a database file from the schema dump and inserts the rows of the
+    data dump in one transaction.
+
+    :param str data: SQL file of the rows, nothing is inserted if it is None.
+
+    '''
+    connection = connect(db_path)
+    try:
+        with open(schema) as schema_file:
+            connection.con.executescript(schema_file.read())
+        if data is not None:
+            with open(data) as data_file:
+                connection.con.executescript("BEGIN;\n" + data_file.read() + "\nCOMMIT;")
+    finally:
+        connection.close()
+
+
+def import_table(db_path, name, stream, file_format, batch=DEFAULT_BATCH):
+    '''
+    Inserts the rows of a file into a table. The indexes of the table which
+    are not unique are dropped first and created again when the rows are
+    inserted, also if the import fails. Rows inserted by earlier batches are
+    kept if it fails.
+
+    :param str name: The name of the file in :py:data:`TABLES`.
+    :param stream: An open file.
+    :param str file_format: ``csv`` or ``ndjson``.
+    :param int batch: Number of rows inserted per transaction.
+    :return: the number of rows inserted.
+    :rtype: int
+    :raises ValueError: if a value of the file is wrong.
+    :raises sqlite3.IntegrityError: if a row repeats a unique value.
+
+    '''
+    table, columns = TABLES[name]
+    header, rows = read_rows(stream, file_format, columns)
+    # Values are converted by SQLite: empty values are NULL, the column
+    # affinity turns numbers to integers and the start of a booking is
+    # computed from its time
+    values = ["NULLIF(?%d, '')" % number for number in xrange(1, len(header) + 1)]
+    insert_columns = header
+    if table == "Bookings" and "bookingTime" in header:
+        insert_columns = header + ("bookingStart",)
+        values.append(database.BOOKING_START_SQL.format(time="?%d" % (header.index("bookingTime") + 1)))
+    query = "INSERT INTO %s(%s) VALUES(%s)" % (table, ", ".join(insert_columns), ", ".join(values))
+    connection = connect(db_path)
+    con = connection.con
+    # CSV values are UTF-8 byte strings, stored as they are
+    con.text_factory = str
+    count = 0
+    try:
+        # Secondary indexes are built once at the end instead of row by row.
+        # Unique indexes are kept, a repeated value fails its batch.
+        cur = con.cursor()
+        cur.execute("PRAGMA index_list(%s)" % table)
+        names = [row[1] for row in cur.fetchall() if not row[2] and row[3] == "c"]
+        indexes = []
+        for index in names:
+            cur.execute("SELECT sql FROM sqlite_master WHERE type = 'index' AND name = ?", (index,))
+            indexes.append((index, cur.fetchone()[0]))
+            cur.execute("DROP INDEX %s" % index)
+        try:
+            while True:
+                chunk = list(itertools.islice(rows, batch))
+                if not chunk:
+                    break
+                cur.executemany(query, chunk)
+                con.commit()
+                count += len(chunk)
+        finally:
+            con.rollback()
+            for index, sql in indexes:
+                cur.execute(sql)
+            con.commit()
+    finally:
+        connection.close()
+    return count
+
+
+def export_table(db_path, name, stream, file_format):
+    '''
+    Writes the rows of a table to a file in the order of their ids. Rows are
+    read from the cursor one at a time.
+
+    :return: the number of rows written.
+    :rtype: int
+
+    '''
+    table, columns = TABLES[name]
+    connection = connect(db_path)
+    # Text is written as it is stored, UTF-8
+    connection.con.text_factory = str
+    try:
+        cur = connection.con.cursor()
+        cur.execute("SELECT %s FROM %s ORDER BY rowid" % (", ".join(columns), table))
+        return write_rows(stream, file_format, columns, cur)
+    finally:
+        connection.close()
+
+
+def check_foreign_keys(db_path):
+    '''
+    Checks the references of the rows, which are not checked while
+    importing.
+
+    :return: the number of rows referring to a missing user or room.
+    :rtype: int
+
+    '''
+    connection = connect(db_path)
+    try:
+        # One row per missing reference, as (table, rowid, parent, key)
+        return len(set(row[:2] for row in connection.con.execute("PRAGMA foreign_key_check")))
+    finally:
+        connection.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m reservation.dataio",
+                                     description="Bulk import and export of the Tellus database.")
+    commands = parser.add_subparsers(dest="command")
+    create = commands.add_parser("create", help="create a database from the schema and data dumps")
+    create.add_argument("database")
+    create.add_argument("--force", action="store_true", help="remove the database file if it exists")
+    create.add_argument("--schema", default=SCHEMA_FILE)
+    create.add_argument("--data", default=DATA_FILE)
+    create.add_argument("--empty", action="store_true", help="do not insert the data dump")
+    for command, text in (("import", "insert the rows of a file into a table"),
+                          ("export", "write the rows of a table to a file")):
+        subparser = commands.add_parser(command, help=text)
+        subparser.add_argument("database")
+        subparser.add_argument("table", choices=TABLE_ORDER)
+        subparser.add_argument("file")
+        subparser.add_argument("--format", choices=sorted(set(FORMATS.values())))
+        if command == "import":
+            subparser.add_argument("--batch", type=int, default=DEFAULT_BATCH,
+                                   help="rows per transaction, default %d" % DEFAULT_BATCH)
+    args = parser.parse_args(argv)
+    # Messages go to the standard error, the standard output may be a file
+    log = sys.stderr
+
+    if args.command == "create":
+        if os.path.exists(args.database):
+            if not args.force:
+                parser.error("%s exists, use --force to replace it" % args.database)
+            for suffix in ("", "-journal", "-wal", "-shm"):
+                if os.path.exists(args.database + suffix):
+                    os.remove(args.database + suffix)
+        create_database(args.database, args.schema, None if args.empty else args.data)
+        print >> log, "Database %s is created." % args.database
+        return 0
+
+    if not os.path.exists(args.database):
+        parser.error("%s does not exist" % args.database)
+    try:
+        file_format = get_format(args.file, args.format)
+    except ValueError, e:
+        parser.error(str(e))
+    start = time.time()
+    if args.command == "import":
+        stream = _open(args.file, "rb")
+        try:
+            count = import_table(args.database, args.table, stream, file_format, args.batch)
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+        missing = check_foreign_keys(args.database)
+        if missing:
+            print >> log, "Warning: %d rows refer to a missing user or room." % missing
+    else:
+        stream = _open(args.file, "wb")
+        try:
+            count = export_table(args.database, args.table, stream, file_format)
+        finally:
+            if stream is not sys.stdout:
+                stream.close()
+    elapsed = time.time() - start
+    print >> log, "%s %d %s in %.1f s (%.0f rows per s)" % (
+        "Imported" if args.command == "import" else "Exported", count, args.table,
+        elapsed, count / elapsed if elapsed else 0)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,305 @@
+'''
+Request metrics of the Tellus API.
+
+Counts the requests of every resource and method by status, and keeps a
+latency histogram of each resource and method and one of the time requests
+wait for a database connection. The metrics are rendered in the Prometheus
+text format by the */tellus/metrics* endpoint.
+
+Histograms have log-linear buckets like HdrHistogram: every power of two is
+split into :py:data:`SUB_BUCKETS` buckets, so a recorded value is known within
+1 / :py:data:`SUB_BUCKETS` of itself whatever its size. Recording a value is
+a few integer operations.
+'''
+import threading
+
+# Buckets per power of two, a power of two itself
+SUB_BUCKET_BITS = 3
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+# Largest value of a histogram in microseconds, about 19 hours. Larger values
+# are counted in the last bucket.
+MAX_VALUE = (1 << 36) - 1
+# Upper bounds in seconds of the cumulative buckets rendered for every
+# histogram, followed by +Inf. All of them are rendered, also when they are
+# empty, so the buckets of a histogram are the same in every scrape.
+BUCKET_BOUNDS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                 1.0, 2.5, 5.0, 10.0)
+# Quantiles reported for every histogram
+QUANTILES = (0.5, 0.95, 0.99)
+# Content type of the Prometheus text format
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+# Statistics of the Engine pool which only grow, see
+# reservation.database.ConnectionPool.stats
+POOL_COUNTERS = ("created", "closed", "recycled", "checkouts", "checkins", "waits", "timeouts")
+# Statistics of the booking lists cache which only grow, see
+# reservation.database.BookingListCache.stats
+CACHE_COUNTERS = ("hits", "misses", "evictions")
+
+
+def bucket_index(value):
+    '''
+    Returns the index of the bucket of a value.
+
+    :param int value: A value from 0 to :py:data:`MAX_VALUE`.
+
+    '''
+    if value < SUB_BUCKETS:
+        return value
+    shift = value.bit_length() - SUB_BUCKET_BITS - 1
+    # The top SUB_BUCKET_BITS + 1 bits of the value, from SUB_BUCKETS to
+    # 2 * SUB_BUCKETS - 1
+    return (shift + 1) * SUB_BUCKETS + (value >> shift) - SUB_BUCKETS
+
+
+def bucket_bound(index):
+    '''
+    Returns the smallest value which is larger than the values of a bucket.
+    '''
+    if index < SUB_BUCKETS:
+        return index + 1
+    shift = index // SUB_BUCKETS - 1
+    return (SUB_BUCKETS + index % SUB_BUCKETS + 1) << shift
+
+
+BUCKET_COUNT = bucket_index(MAX_VALUE) + 1
+
+
+class Histogram(object):
+    '''
+    Histogram of durations, kept in whole microseconds. It is not thread
+    safe, :py:class:`Metrics` updates its histograms under a lock.
+
+    '''
+    def __init__(self):
+        super(Histogram, self).__init__()
+        self.buckets = [0] * BUCKET_COUNT
+        self.count = 0
+        # Total of the values in seconds
+        self.sum = 0.0
+        self.max = 0
+
+    def record(self, seconds):
+        '''
+        Adds a duration.
+
+        :param float seconds: The duration in seconds.
+
+        '''
+        value = min(max(int(seconds * 1000000), 0), MAX_VALUE)
+        self.buckets[bucket_index(value)] += 1
+        self.count += 1
+        self.sum += seconds
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, share):
+        '''
+        Returns an upper bound of a quantile of the durations.
+
+        :param float share: The quantile, from 0 to 1.
+        :return: the duration in seconds, 0 if the histogram is empty.
+        :rtype: float
+
+        '''
+        if not self.count:
+            return 0.0
+        rank = max(1, int(share * self.count + 0.5))
+        seen = 0
+        for index, count in enumerate(self.buckets):
+            seen += count
+            if seen >= rank:
+                # The bound of the last bucket may be above the largest value
+                return min(bucket_bound(index) - 1, self.max) / 1000000.0
+        return self.max / 1000000.0
+
+    def cumulative(self, bounds=BUCKET_BOUNDS):
+        '''
+        Returns the number of durations up to every bound, as (bound in
+        seconds, count) pairs. A duration is counted when the whole bucket
+        which holds it is up to the bound, so durations less than
+        1 / :py:data:`SUB_BUCKETS` below a bound may be counted with the next
+        one.
+
+        :param bounds: The bounds in seconds, in increasing order.
+
+        '''
+        seen = 0
+        index = 0
+        counts = []
+        for bound in bounds:
+            # Largest value of a bucket is its bound - 1
+            limit = int(round(bound * 1000000)) + 1
+            while index < BUCKET_COUNT and bucket_bound(index) <= limit:
+                seen += self.buckets[index]
+                index += 1
+            counts.append((bound, seen))
+        return counts
+
+    def copy(self):
+        histogram = Histogram()
+        histogram.buckets = list(self.buckets)
+        histogram.count = self.count
+        histogram.sum = self.sum
+        histogram.max = self.max
+        return histogram
+
+
+class Metrics(object):
+    '''
+    Metrics of the requests served by the API. One instance is shared by all
+    threads.
+
+    '''
+    def __init__(self):
+        super(Metrics, self).__init__()
+        self._lock = threading.Lock()
+        # Number of requests by (resource, method, status)
+        self.requests = {}
+        # Number of requests which failed with a server error or an
+        # exception, by (resource, method)
+        self.errors = {}
+        # Latency histogram by (resource, method)
+        self.latency = {}
+        # Time waited for a database connection
+        self.connection_wait = Histogram()
+
+    def record_request(self, resource, method, status, seconds):
+        '''
+        Counts a request and adds its duration.
+
+        :param str resource: The name of the endpoint of the request.
+        :param str method: The HTTP method.
+        :param int status: The status code of the response, 500 if the
+            request failed with an exception.
+        :param float seconds: The time taken by the request.
+
+        '''
+        key = (resource, method)
+        with self._lock:
+            self.requests[key + (status,)] = self.requests.get(key + (status,), 0) + 1
+            if status >= 500:
+                self.errors[key] = self.errors.get(key, 0) + 1
+            histogram = self.latency.get(key)
+            if histogram is None:
+                histogram = self.latency[key] = Histogram()
+            histogram.record(seconds)
+
+    def record_connection_wait(self, seconds):
+        '''
+        Adds the time a request waited for its database connection.
+        '''
+        with self._lock:
+            self.connection_wait.record(seconds)
+
+    def snapshot(self):
+        '''
+        Returns a copy of the metrics, taken at once.
+
+        :return: a dictionary with the keys ``requests``, ``errors``,
+            ``latency`` and ``connection_wait``.
+        :rtype: dict
+
+        '''
+        with self._lock:
+            return {
+                "requests": dict(self.requests),
+                "errors": dict(self.errors),
+                "latency": dict((key, histogram.copy()) for key, histogram in self.latency.iteritems()),
+                "connection_wait": self.connection_wait.copy()
+            }
+
+    def reset(self):
+        '''
+        Forgets all metrics.
+        '''
+        with self._lock:
+            self.requests = {}
+            self.errors = {}
+            self.latency = {}
+            self.connection_wait = Histogram()
+
+    def render(self, pool_stats=None, cache_stats=None):
+        '''
+        Renders the metrics in the Prometheus text format.
+
+        :param dict pool_stats: The statistics of the Engine pool, see
+            :py:meth:`reservation.database.Engine.pool_stats`.
+        :param dict cache_stats: The statistics of the booking lists cache,
+            see :py:meth:`reservation.database.Engine.cache_stats`.
+        :rtype: str
+
+        '''
+        snapshot = self.snapshot()
+        lines = []
+
+        def labels(**values):
+            return ",".join('%s="%s"' % (name, escape(values[name])) for name in sorted(values))
+
+        lines.append("# HELP tellus_http_requests_total Requests served by resource, method and status.")
+        lines.append("# TYPE tellus_http_requests_total counter")
+        for (resource, method, status), count in sorted(snapshot["requests"].iteritems()):
+            lines.append("tellus_http_requests_total{%s} %d" % (
+                labels(resource=resource, method=method, status=status), count))
+
+        lines.append("# HELP tellus_http_request_errors_total Requests which failed with a server error.")
+        lines.append("# TYPE tellus_http_request_errors_total counter")
+        for (resource, method), count in sorted(snapshot["errors"].iteritems()):
+            lines.append("tellus_http_request_errors_total{%s} %d" % (
+                labels(resource=resource, method=method), count))
+
+        lines.append("# HELP tellus_http_request_duration_seconds Latency of the requests.")
+        lines.append("# TYPE tellus_http_request_duration_seconds histogram")
+        for (resource, method), histogram in sorted(snapshot["latency"].iteritems()):
+            render_histogram(lines, "tellus_http_request_duration_seconds",
+                             labels(resource=resource, method=method), histogram)
+        lines.append("# HELP tellus_http_request_duration_quantile_seconds Upper bound of quantiles of the latency.")
+        lines.append("# TYPE tellus_http_request_duration_quantile_seconds gauge")
+        for (resource, method), histogram in sorted(snapshot["latency"].iteritems()):
+            for share in QUANTILES:
+                lines.append("tellus_http_request_duration_quantile_seconds{%s} %.6f" % (
+                    labels(resource=resource, method=method, quantile=share), histogram.quantile(share)))
+
+        lines.append("# HELP tellus_db_connection_wait_seconds Time waited for a database connection.")
+        lines.append("# TYPE tellus_db_connection_wait_seconds histogram")
+        render_histogram(lines, "tellus_db_connection_wait_seconds", "", snapshot["connection_wait"])
+
+        if pool_stats is not None:
+            pools = [("main", pool_stats)]
+            if "readers" in pool_stats:
+                pools.append(("readers", pool_stats["readers"]))
+            for name in sorted(set(pool_stats) - set(["readers"])):
+                metric = "tellus_db_pool_%s" % name
+                if name in POOL_COUNTERS:
+                    metric += "_total"
+                lines.append("# TYPE %s %s" % (metric, "counter" if name in POOL_COUNTERS else "gauge"))
+                for pool, stats in pools:
+                    lines.append("%s{%s} %d" % (metric, labels(pool=pool), stats[name]))
+
+        if cache_stats is not None:
+            for name in sorted(cache_stats):
+                metric = "tellus_db_booking_cache_%s" % name
+                if name in CACHE_COUNTERS:
+                    metric += "_total"
+                lines.append("# TYPE %s %s" % (metric, "counter" if name in CACHE_COUNTERS else "gauge"))
+                lines.append("%s %d" % (metric, cache_stats[name]))
+        return "\n".join(lines) + "\n"
+
+
+def escape(value):
+    '''
+    Escapes a label value of the Prometheus text format.
+    '''
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def render_histogram(lines, name, labels, histogram):
+    '''
+    Adds the lines of a histogram to ``lines``, with a bucket for each of
+    :py:data:`BUCKET_BOUNDS` and +Inf.
+    '''
+    separator = "," if labels else ""
+    for bound, count in histogram.cumulative():
+        lines.append('%s_bucket{%s%sle="%.6f"} %d' % (name, labels, separator, bound, count))
+    lines.append('%s_bucket{%s%sle="+Inf"} %d' % (name, labels, separator, histogram.count))
+    lines.append("%s_sum%s %.6f" % (name, "{%s}" % labels if labels else "", histogram.sum))
+    lines.append("%s_count%s %d" % (name, "{%s}" % labels if labels else "", histogram.count))
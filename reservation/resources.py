@@ -1,10 +1,19 @@
 import json
-from time import strftime, gmtime
-
-from flask import Flask, request, Response, g, _request_ctx_stack, redirect, send_from_directory
+import json.encoder as json_encoder
+import base64
+import timeit
+import zlib
+from urllib import urlencode
+from datetime import datetime
+
+from flask import Flask, request, Response, g, _request_ctx_stack, redirect, send_from_directory, \
+    stream_with_context
 from flask_restful import Resource, Api
+from werkzeug.routing import parse_rule
+from werkzeug.urls import url_quote
 
 import database
+import metrics
 
 # Constants for hypermedia formats and profiles
 MASON = "application/vnd.mason+json"
@@ -21,6 +30,141 @@ APIARY_RELS_URL = "http://docs.tellusreservationapi.apiary.io/#reference/link-re
 
 LINK_RELATIONS_URL = "/tellus/link-relations/"
 
+# HTTP methods whose handlers only read the database
+READ_ONLY_METHODS = ("GET", "HEAD", "OPTIONS")
+
+# Placeholder of the items while the envelope of a streamed collection is
+# rendered
+ITEMS_PLACEHOLDER = "@items"
+# Separators of the JSON documents, (item separator, key separator). The
+# items of a streamed collection are joined with the item separator.
+JSON_SEPARATORS = (",", ":")
+
+# Page sizes of the booking lists. The limit query parameter is bounded by
+# MAX_PAGE_SIZE.
+DEFAULT_PAGE_SIZE = 100
+HISTORY_PAGE_SIZE = 30
+MAX_PAGE_SIZE = 1000
+# Largest number of bookings accepted by one POST to the bookings collection
+MAX_BULK_BOOKINGS = 10000
+# Cache-Control of the rooms. Caches may keep them for ROOMS_MAX_AGE seconds
+# (app config) and then must check their ETag.
+ROOMS_CACHE_CONTROL = "public, max-age=%d, must-revalidate"
+# Content codings of the compressed responses, in order of preference, with
+# the window bits of zlib which give their format.
+COMPRESSION_ENCODINGS = [("gzip", 16 + zlib.MAX_WBITS), ("deflate", zlib.MAX_WBITS)]
+# Media types of the responses which may be compressed
+COMPRESSIBLE_MIMETYPES = (MASON, JSON)
+
+# Schemas of the controls, built once and shared by every document. They must
+# not be modified.
+USER_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "username": {
+            "title": "Username",
+            "description": "Username of user",
+            "type": "string"
+        },
+        "isAdmin": {
+            "title": "Admin",
+            "description": "Account type to identify User or Admin",
+            "type": "boolean"
+        },
+        "email": {
+            "title": "E-mail",
+            "description": "E-mail of user",
+            "type": "string"
+        },
+        "familyName": {
+            "title": "Family Name",
+            "description": "Family name of the user",
+            "type": "string"
+        },
+        "givenName": {
+            "title": "Given Name",
+            "description": "Given name of the user",
+            "type": "string"
+        },
+        "telephone": {
+            "title": "Phone Number",
+            "description": "Phone Number of the user",
+            "type": "string"
+        }
+    },
+    "required": ["username"]
+}
+ROOM_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "resources": {
+            "title": "Resources",
+            "description": "Resources avaible in room",
+            "type": "string"
+        },
+        "photo": {
+            "title": "Photo",
+            "description": "Photo of the room",
+            "type": "string"
+        }
+    },
+    "required": ["roomname"]
+}
+BOOKING_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "username": {
+            "title": "User Name",
+            "description": "Username of the booking's owner",
+            "type": "string"
+        },
+        "bookingTime": {
+            "title": "Booking Time",
+            "description": "Date and time of the booking",
+            "type": "string"
+        },
+        "email": {
+            "title": "Email",
+            "description": "Email of the booking's owner",
+            "type": "string"
+        },
+        "familyName": {
+            "title": "Family Name",
+            "description": "Family Name of the booking's owner",
+            "type": "string"
+        },
+        "givenName": {
+            "title": "Given Name",
+            "description": "Given Name of the booking's owner",
+            "type": "string"
+        },
+        "telephone": {
+            "title": "Telephone",
+            "description": "Telephone number of the booking's owner",
+            "type": "string"
+        },
+        "name": {
+            "title": "Room name",
+            "description": "Room name which the booking take place",
+            "type": "string"
+        },
+    },
+    "required": ["username", "bookingTime", "name"]
+}
+BOOKINGS_SCHEMA = {
+    "type": "array",
+    "maxItems": MAX_BULK_BOOKINGS,
+    "items": BOOKING_SCHEMA
+}
+# The edit control of the bookings does not depend on the booking
+EDIT_BOOKING_CONTROL = {
+    "title": "Modify Booking",
+    "href": "/tellus/api/bookings/",
+    "encoding": "json",
+    "method": "PUT",
+    "schema": BOOKING_SCHEMA
+}
+
 # Define the application and the api
 # Set the debug is True as default but it must be set as False after testing.
 app = Flask(__name__, static_folder="static", static_url_path="/.")
@@ -29,10 +173,153 @@ app.debug = True
 # testing) provide the database path   app.config to modify the
 # database to be used (for instance for testing)
 app.config.update({"Engine": database.Engine()})
+# Collections are streamed to the client while they are read from the
+# database. Set it False to render the whole document before sending it.
+app.config.update({"STREAM_COLLECTIONS": True})
+# Seconds caches may serve the rooms without checking their ETag.
+app.config.update({"ROOMS_MAX_AGE": 0})
+# Responses are compressed with gzip or deflate, as the Accept-Encoding header
+# of the request allows, when COMPRESSION is set. Smaller bodies than
+# COMPRESSION_MIN_SIZE bytes are sent as they are. COMPRESSION_LEVEL is the
+# zlib level, from 1 (fastest) to 9 (smallest).
+app.config.update({"COMPRESSION": False})
+app.config.update({"COMPRESSION_MIN_SIZE": 1024})
+app.config.update({"COMPRESSION_LEVEL": 6})
+# Request counts and latencies served by /tellus/metrics. Set it None to
+# record nothing.
+app.config.update({"Metrics": metrics.Metrics()})
 # Start the RESTful API.
 api = Api(app)
 
 
+# SERIALIZATION
+def _ujson_encoder():
+    """
+    Returns the encode function of ujson. Slashes are not escaped and non
+    ASCII characters are, as the standard library does.
+    """
+
+    import ujson
+
+    def encode(obj):
+        return ujson.dumps(obj, ensure_ascii=True, escape_forward_slashes=False)
+    return encode
+
+
+def _simplejson_encoder():
+    """
+    Returns the encode function of simplejson, with compact separators.
+    """
+
+    import simplejson
+    return simplejson.JSONEncoder(separators=JSON_SEPARATORS, check_circular=False).encode
+
+
+def _stdlib_encoder():
+    """
+    Returns the encode function of the json module of the standard library,
+    with compact separators. The documents of the API have no cycles, so they
+    are not checked for. JSONEncoder.encode builds a new C encoder on every
+    call, which costs as much as encoding a booking item, so the C encoder is
+    built once when the speedups of the json module are there.
+    """
+
+    encoder = json.JSONEncoder(separators=JSON_SEPARATORS, check_circular=False)
+    if json_encoder.c_make_encoder is None or json_encoder.c_encode_basestring_ascii is None:
+        return encoder.encode
+    # Same arguments as JSONEncoder.iterencode gives
+    c_encode = json_encoder.c_make_encoder(None, encoder.default, json_encoder.c_encode_basestring_ascii,
+                                           None, JSON_SEPARATORS[1], JSON_SEPARATORS[0], False, False,
+                                           True)
+
+    def encode(obj):
+        return "".join(c_encode(obj, 0))
+    return encode
+
+
+# Encoders of the responses, in order of preference. An encoder whose module
+# is not installed is skipped.
+JSON_ENCODERS = [("ujson", _ujson_encoder),
+                 ("simplejson", _simplejson_encoder),
+                 ("json", _stdlib_encoder)]
+
+
+def select_json_encoder(names=None):
+    """
+    Returns the name and the encode function of the first encoder of
+    JSON_ENCODERS which is installed. All of them give compact documents which
+    decode to the same objects.
+
+    : param list names: The encoders which may be selected, all by default.
+    : rtype: tuple
+    : raises ValueError: if none of the encoders is installed.
+    """
+
+    for name, factory in JSON_ENCODERS:
+        if names is not None and name not in names:
+            continue
+        try:
+            return name, factory()
+        except ImportError:
+            continue
+    raise ValueError("No JSON encoder available: %s" % names)
+
+
+# The encoder of the responses, chosen when the module is loaded.
+# render_json(obj) returns the JSON document of obj as a str.
+JSON_ENCODER, render_json = select_json_encoder()
+
+
+# URL TEMPLATES
+class UrlTemplate(object):
+    """
+    The URL of a route, compiled once from its rule so that building a URL is
+    a string substitution instead of a call to url_for. The variables are
+    converted by the converters of the rule, so the URL is the same as the
+    one of url_for.
+
+    : param str endpoint: The endpoint of the route.
+    """
+
+    def __init__(self, endpoint):
+        super(UrlTemplate, self).__init__()
+        self.endpoint = endpoint
+        rule = list(app.url_map.iter_rules(endpoint))[0]
+        parts = []
+        # (name, to_url) of the variables, in order
+        self.variables = []
+        for converter, arguments, variable in parse_rule(rule.rule):
+            if converter is None:
+                # Static text, quoted as werkzeug quotes it
+                parts.append(url_quote(variable, app.url_map.charset, safe="/:|+").replace("%", "%%"))
+            else:
+                if arguments:
+                    raise ValueError("Converter arguments are not supported: %s" % rule.rule)
+                parts.append("%s")
+                to_url = app.url_map.converters[converter](app.url_map).to_url
+                self.variables.append((variable, to_url))
+        self.template = "".join(parts)
+
+    def expand(self, **values):
+        """
+        Returns the URL with the given values, relative to the root of the
+        application like the URLs of url_for.
+        """
+
+        ctx = _request_ctx_stack.top
+        root = ctx.request.script_root if ctx is not None else ""
+        return root + self.template % tuple(to_url(values[name]) for name, to_url in self.variables)
+
+
+def compile_url_templates():
+    """
+    Returns the :py:class:`UrlTemplate` of every resource of the API, by
+    endpoint. Called once the routes are defined.
+    """
+
+    return dict((endpoint, UrlTemplate(endpoint)) for endpoint in api.endpoints)
+
+
 ##### This class "MasonObject" is borrowed from course exercises. #####
 # Orginally it is developed by Ivan Sanchez and Mika Oja.
 #######################################################################
@@ -132,42 +419,7 @@ class ReservationObject(MasonObject):
             "href": "/tellus/api/users/",
             "encoding": "json",
             "method": "POST",
-            "schema": {
-                "type": "object",
-                "properties": {
-                    "username": {
-                        "title": "Username",
-                        "description": "Username of user",
-                        "type": "string"
-                    },
-                    "isAdmin": {
-                        "title": "Admin",
-                        "description": "Account type to identify User or Admin",
-                        "type": "boolean"
-                    },
-                    "email": {
-                        "title": "E-mail",
-                        "description": "E-mail of user",
-                        "type": "string"
-                    },
-                    "familyName": {
-                        "title": "Family Name",
-                        "description": "Family name of the user",
-                        "type": "string"
-                    },
-                    "givenName": {
-                        "title": "Given Name",
-                        "description": "Given name of the user",
-                        "type": "string"
-                    },
-                    "telephone": {
-                        "title": "Phone Number",
-                        "description": "Phone Number of the user",
-                        "type": "string"
-                    }
-                },
-                "required": ["username"]
-            }
+            "schema": USER_SCHEMA
         }
 
     def add_control_delete_user(self, username):
@@ -177,7 +429,7 @@ class ReservationObject(MasonObject):
 
         self["@controls"]["tellus:delete"] = {
             "title": "Delete this user",
-            "href": api.url_for(User, username=username),
+            "href": URL_TEMPLATES["user"].expand(username=username),
             "method": "DELETE"
         }
 
@@ -188,7 +440,7 @@ class ReservationObject(MasonObject):
 
         self["@controls"]["tellus:delete"] = {
             "title": "Delete booking",
-            "href": api.url_for(BookingOfRoom, name=name, booking_id=booking_id),
+            "href": URL_TEMPLATES["booking_of_room"].expand(name=name, booking_id=booking_id),
             "method": "DELETE"
         }
 
@@ -199,7 +451,7 @@ class ReservationObject(MasonObject):
 
         self["@controls"]["tellus:delete"] = {
             "title": "Delete booking",
-            "href": api.url_for(BookingOfUser, username=username, booking_id=booking_id),
+            "href": URL_TEMPLATES["booking_of_user"].expand(username=username, booking_id=booking_id),
             "method": "DELETE"
         }
 
@@ -211,26 +463,11 @@ class ReservationObject(MasonObject):
         : param str roomName: name of the room.
         """
         self["@controls"]["edit"] = {
-                    "title": "Modify Room",
-                    "href": api.url_for(Room, name=name),
-                    "encoding": "json",
-                    "method": "PUT",
-                    "schema": {
-                        "type": "object",
-                        "properties": {
-                            "resources": {
-                                "title": "Resources",
-                                "description": "Resources avaible in room",
-                                "type": "string"
-                            },
-                            "photo": {
-                                "title": "Photo",
-                                "description": "Photo of the room",
-                                "type": "string"
-                            }
-                        },
-                        "required": ["roomname"]
-                    }
+            "title": "Modify Room",
+            "href": URL_TEMPLATES["room"].expand(name=name),
+            "encoding": "json",
+            "method": "PUT",
+            "schema": ROOM_SCHEMA
         }
 
     def add_control_bookings_all(self):
@@ -239,7 +476,7 @@ class ReservationObject(MasonObject):
         """
 
         self["@controls"]["tellus:bookings-all"] = {
-            "href": api.url_for(Bookings),
+            "href": URL_TEMPLATES["bookings"].expand(),
             "title": "List all bookings"
         }
 
@@ -249,7 +486,7 @@ class ReservationObject(MasonObject):
         """
 
         self["@controls"]["tellus:bookings-room"] = {
-            "href": api.url_for(BookingsOfRoom, name=name),
+            "href": URL_TEMPLATES["bookings_of_room"].expand(name=name),
             "title": "List all bookings of Room"
         }
 
@@ -259,7 +496,7 @@ class ReservationObject(MasonObject):
         """
 
         self["@controls"]["tellus:books-room"] = {
-            "href": api.url_for(BookingsOfRoom, name=name),
+            "href": URL_TEMPLATES["bookings_of_room"].expand(name=name),
         }
 
     def add_control_bookings_user(self, username):
@@ -268,59 +505,34 @@ class ReservationObject(MasonObject):
         """
 
         self["@controls"]["tellus:bookings-user"] = {
-            "href": api.url_for(BookingsOfUser, username=username),
+            "href": URL_TEMPLATES["bookings_of_user"].expand(username=username),
             "title": "List all bookings of User"
         }
 
-    def add_control_edit_booking(self):
-        self["@controls"]["edit"] = {
-                    "title": "Modify Booking",
-                    "href": "/tellus/api/bookings/",
-                    "encoding": "json",
-                    "method": "PUT",
-                    "schema": {
-                        "type": "object",
-                        "properties": {
-                            "username": {
-                                "title": "User Name",
-                                "description": "Username of the booking's owner",
-                                "type": "string"
-                            },
-                            "bookingTime": {
-                                "title": "Booking Time",
-                                "description": "Date and time of the booking",
-                                "type": "string"
-                            },
-                            "email": {
-                                "title": "Email",
-                                "description": "Email of the booking's owner",
-                                "type": "string"
-                            },
-                            "familyName": {
-                                "title": "Family Name",
-                                "description": "Family Name of the booking's owner",
-                                "type": "string"
-                            },
-                            "givenName": {
-                                "title": "Given Name",
-                                "description": "Given Name of the booking's owner",
-                                "type": "string"
-                            },
-                            "telephone": {
-                                "title": "Telephone",
-                                "description": "Telephone number of the booking's owner",
-                                "type": "string"
-                            },
-                            "name": {
-                                "title": "Room name",
-                                "description": "Room name which the booking take place",
-                                "type": "string"
-                            },
-                        },
-                        "required": ["username", "bookingTime", "name"]
-                    }
+    def add_control_next(self, href, booking, limit):
+        """
+        This adds the next link of a paginated list to an object. Intended for
+        the document object.
+
+        : param str href: The URL of the list.
+        : param booking: The last booking of the current page.
+        : param int limit: The size of the page.
+        """
+
+        query = urlencode([("limit", limit), ("next", encode_cursor(booking))])
+        self["@controls"]["next"] = {
+            "href": href + "?" + query,
+            "title": "Next page"
         }
 
+    def add_control_edit_booking(self):
+        """
+        This adds the edit link of a booking to an object. The control is the
+        same for every booking, it is shared.
+        """
+
+        self["@controls"]["edit"] = EDIT_BOOKING_CONTROL
+
     def add_control_add_booking(self, name):
         """
         This adds the add-booking link to an object. Intended for the document object.
@@ -328,50 +540,23 @@ class ReservationObject(MasonObject):
 
         self["@controls"]["tellus:add-booking"] = {
             "title": "Create booking",
-            "href": api.url_for(BookingsOfRoom, name=name),
+            "href": URL_TEMPLATES["bookings_of_room"].expand(name=name),
             "encoding": "json",
             "method": "POST",
-            "schema": {
-                "type": "object",
-                "properties": {
-                    "username": {
-                        "title": "User Name",
-                        "description": "Username of the booking's owner",
-                        "type": "string"
-                    },
-                    "bookingTime": {
-                        "title": "Booking Time",
-                        "description": "Date and time of the booking",
-                        "type": "string"
-                    },
-                    "email": {
-                        "title": "Email",
-                        "description": "Email of the booking's owner",
-                        "type": "string"
-                    },
-                    "familyName": {
-                        "title": "Family Name",
-                        "description": "Family Name of the booking's owner",
-                        "type": "string"
-                    },
-                    "givenName": {
-                        "title": "Given Name",
-                        "description": "Given Name of the booking's owner",
-                        "type": "string"
-                    },
-                    "telephone": {
-                        "title": "Telephone",
-                        "description": "Telephone number of the booking's owner",
-                        "type": "string"
-                    },
-                    "name": {
-                        "title": "Room name",
-                        "description": "Room name which the booking take place",
-                        "type": "string"
-                    },
-                },
-                "required": ["username", "bookingTime", "name"]
-            }
+            "schema": BOOKING_SCHEMA
+        }
+
+    def add_control_add_bookings(self):
+        """
+        This adds the add-bookings link to an object. Intended for the document object.
+        """
+
+        self["@controls"]["tellus:add-bookings"] = {
+            "title": "Create bookings",
+            "href": URL_TEMPLATES["bookings"].expand(),
+            "encoding": "json",
+            "method": "POST",
+            "schema": BOOKINGS_SCHEMA
         }
 
     def add_control_history_bookings(self):
@@ -380,7 +565,7 @@ class ReservationObject(MasonObject):
         """
 
         self["@controls"]["tellus:history-bookings"] = {
-            "href": api.url_for(HistoryBookings),
+            "href": URL_TEMPLATES["history_bookings"].expand(),
             "title": "History Bookings"
         }
 
@@ -408,7 +593,7 @@ def create_error_response(status_code, title, message=None):
     envelope = MasonObject(resource_url=resource_url)
     envelope.add_error(title, message)
 
-    return Response(json.dumps(envelope), status_code, mimetype=MASON + ";" + ERROR_PROFILE)
+    return Response(render_json(envelope), status_code, mimetype=MASON + ";" + ERROR_PROFILE)
 
 
 @app.errorhandler(404)
@@ -431,29 +616,322 @@ def unknown_error(error):
 
 #### End of ERROR HANDLERS
 
+# PAGINATION
+def encode_cursor(booking):
+    """
+    Creates the opaque cursor of the next parameter from the last booking of a
+    page.
+
+    : param booking: A booking returned by the database API.
+    : rtype: str
+    """
+
+    return base64.urlsafe_b64encode(json.dumps(list(booking.key)))
+
+
+def decode_cursor(cursor):
+    """
+    Extracts the key (bookingStart, bookingID) of a cursor made by
+    :py:func:`encode_cursor`.
+
+    : param str cursor: The value of the next parameter.
+    : rtype: tuple
+    : raises ValueError: if the cursor is malformed.
+    """
+
+    try:
+        booking_start, booking_id = json.loads(base64.urlsafe_b64decode(str(cursor)))
+    except (TypeError, ValueError):
+        raise ValueError("Malformed cursor")
+    if not isinstance(booking_id, int) or not (booking_start is None or isinstance(booking_start, int)):
+        raise ValueError("Malformed cursor")
+    return booking_start, booking_id
+
+
+def get_page_parameters(default_limit=DEFAULT_PAGE_SIZE):
+    """
+    Extracts the limit and next query parameters of a booking list.
+
+    : param int default_limit: The page size if limit is not given.
+    : return: The page size and the start of the page for
+        :py:meth:`database.Connection.get_bookings`
+    : rtype: tuple
+    : raises ValueError: if a parameter is malformed.
+    """
+
+    parameters = request.args
+    limit = int(parameters.get("limit", default_limit))
+    if limit < 1:
+        raise ValueError("Limit must be positive")
+    start = None
+    if "next" in parameters:
+        start = decode_cursor(parameters["next"])
+    return min(limit, MAX_PAGE_SIZE), start
+
+
+def get_bookings_page(envelope, href, default_limit=DEFAULT_PAGE_SIZE,
+                      order="bookingTime", **filters):
+    """
+    Extracts one page of bookings from the database. The whole page and one
+    booking more are read before returning, so the next control is added to
+    the envelope before any part of it is rendered.
+
+    : param envelope: The document object of the response.
+    : param str href: The URL of the list.
+    : param int default_limit: The page size if limit is not given.
+    : param str order: The order of the bookings, bookingTime or -bookingTime
+    : param filters: The filters of :py:meth:`database.Connection.get_bookings`
+    : return: The bookings of the page.
+    : rtype: list
+    : raises ValueError: if a page parameter is malformed.
+    """
+
+    limit, start = get_page_parameters(default_limit)
+    # Fetch one booking more to know whether there is a next page
+    bookings_db = list(g.con.iter_bookings(order=order, start=start, limit=limit + 1,
+                                           **filters))
+    if len(bookings_db) > limit:
+        del bookings_db[limit:]
+        envelope.add_control_next(href, bookings_db[-1], limit)
+    return bookings_db
+
+
+# RENDERING
+def render_collection(envelope, items, mimetype):
+    """
+    Creates the response of a collection. If STREAM_COLLECTIONS is set in the
+    application config the items are serialized one at a time while the
+    response is sent, otherwise the whole document is rendered at once. Both
+    give the same body.
+
+    : param envelope: The document object of the response, without items.
+    : param items: An iterable of the items of the collection.
+    : param str mimetype: The media type of the response.
+    : rtype:: py: class:`flask.Response`
+    """
+
+    if not app.config.get("STREAM_COLLECTIONS"):
+        envelope["items"] = list(items)
+        return Response(render_json(envelope), 200, mimetype=mimetype)
+    return Response(stream_with_context(stream_envelope(envelope, items)), 200,
+                    mimetype=mimetype)
+
+
+def stream_envelope(envelope, items):
+    """
+    Generates the JSON document of a collection in chunks, the same text as
+    render_json of the envelope with the items. The envelope is rendered when
+    the first chunk is generated, so all controls (e.g. next) must be added
+    to it before the items are iterated.
+
+    : param envelope: The document object of the response, without items.
+    : param items: An iterable of the items of the collection.
+    """
+
+    placeholder = render_json(ITEMS_PLACEHOLDER)
+    envelope["items"] = [ITEMS_PLACEHOLDER]
+    head, tail = render_json(envelope).split(placeholder, 1)
+    yield head
+    separator = ""
+    for item in items:
+        yield separator + render_json(item)
+        separator = JSON_SEPARATORS[0]
+    yield tail
+
+
+def rooms_etag():
+    """
+    Returns the ETag of the rooms, taken from the version of the Rooms table
+    which Connection.modify_room increases. Read it before the rooms.
+    """
+
+    return g.con.versions.tag("rooms")
+
+
+def not_modified(etag):
+    """
+    Returns a 304 Not Modified response if the If-None-Match header of the
+    request matches etag, None otherwise.
+
+    : param str etag: The current ETag of the resource.
+    """
+
+    if not request.if_none_match.contains_weak(etag):
+        return None
+    return set_rooms_cache(Response(status=304), etag)
+
+
+def set_rooms_cache(response, etag):
+    """
+    Adds the ETag and the Cache-Control headers of the rooms to a response.
+    """
+
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = ROOMS_CACHE_CONTROL % app.config.get("ROOMS_MAX_AGE", 0)
+    return response
+
+
+def create_room_item(room):
+    """
+    Returns the representation of a room, as listed by RoomsList.
+
+    : param room: The room, as returned by Connection.get_room.
+    """
+
+    item = ReservationObject(name=room["roomname"], photo=room["picture"], resources=room["resources"])
+    item.add_control("self", href=URL_TEMPLATES["room"].expand(name=room["roomname"]))
+    item.add_control("profile", href=TELLUS_ROOM_PROFILE)
+    item.add_control("collection", href=URL_TEMPLATES["rooms_list"].expand())
+    item.add_control_edit_room(room["roomname"])
+    item.add_control_bookings_room(name=room["roomname"])
+    return item
+
+
 @app.before_request
 def connect_db():
     """
-    Creates a database connection before the request is proccessed.
+    Borrows a database connection from the Engine pool before the request is
+    proccessed. Read-only requests get a read-only connection, which does not
+    wait for writers when the Engine is in WAL mode.
 
     The connection is stored in the application context variable flask.g .
-    Hence it is accessible from the request object.
+    Hence it is accessible from the request object. The start of the request
+    and the time waited for the connection are kept for the metrics. If the
+    Engine has a query profiler, it records the statements of the request,
+    not those which open the connection.
     """
 
-    g.con = app.config["Engine"].connect()
+    g.request_start = timeit.default_timer()
+    g.con = app.config["Engine"].checkout(readonly=request.method in READ_ONLY_METHODS)
+    if app.config.get("Metrics") is not None:
+        app.config["Metrics"].record_connection_wait(timeit.default_timer() - g.request_start)
+    if app.config["Engine"].profiler is not None:
+        app.config["Engine"].profiler.start()
 
 
 # HOOKS
+@app.after_request
+def keep_status(response):
+    """
+    Keeps the status code of the response for the metrics, which are
+    recorded when the request is torn down.
+    """
+
+    g.status = response.status_code
+    return response
+
+
+@app.after_request
+def compress_response(response):
+    """
+    Compresses the body of a JSON response with the best content coding of
+    the Accept-Encoding header of the request, if COMPRESSION is set in the
+    application config. The responses which could be compressed vary on
+    Accept-Encoding, and the ETag of a compressed response is made weak, as
+    it is the ETag of the uncompressed body.
+
+    Streamed collections stay streamed: their first chunks are read until
+    COMPRESSION_MIN_SIZE bytes, and the rest is compressed while it is sent.
+    """
+
+    if not app.config.get("COMPRESSION"):
+        return response
+    if response.status_code == 304:
+        response.vary.add("Accept-Encoding")
+        return response
+    if response.mimetype not in COMPRESSIBLE_MIMETYPES or response.direct_passthrough \
+            or "Content-Encoding" in response.headers:
+        return response
+    response.vary.add("Accept-Encoding")
+    encoding = request.accept_encodings.best_match([name for name, _ in COMPRESSION_ENCODINGS])
+    if encoding is None:
+        return response
+    min_size = app.config.get("COMPRESSION_MIN_SIZE", 0)
+    compressor = zlib.compressobj(app.config.get("COMPRESSION_LEVEL", zlib.Z_DEFAULT_COMPRESSION),
+                                  zlib.DEFLATED, dict(COMPRESSION_ENCODINGS)[encoding])
+
+    if response.is_streamed:
+        chunks = iter(response.response)
+        head = []
+        size = 0
+        for chunk in chunks:
+            if isinstance(chunk, unicode):
+                chunk = chunk.encode(response.charset)
+            head.append(chunk)
+            size += len(chunk)
+            if size >= min_size:
+                break
+        else:
+            # The whole body was read and it is small
+            response.response = head
+            return response
+        response.response = compress_stream(head, chunks, compressor, response.charset)
+    else:
+        data = response.get_data()
+        if len(data) < min_size:
+            return response
+        response.set_data(compressor.compress(data) + compressor.flush())
+
+    response.headers["Content-Encoding"] = encoding
+    etag, weak = response.get_etag()
+    if etag is not None and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+def compress_stream(head, chunks, compressor, charset):
+    """
+    Generates the compressed body of a streamed response. zlib gives output
+    once it has enough input, so the chunks of several items are sent
+    together.
+
+    : param list head: The chunks already read from the response.
+    : param chunks: The iterator of the remaining chunks.
+    : param compressor: A zlib compression object.
+    : param str charset: The charset of the unicode chunks.
+    """
+
+    try:
+        for chunk in head:
+            data = compressor.compress(chunk)
+            if data:
+                yield data
+        for chunk in chunks:
+            if isinstance(chunk, unicode):
+                chunk = chunk.encode(charset)
+            data = compressor.compress(chunk)
+            if data:
+                yield data
+        yield compressor.flush()
+    finally:
+        # Tears the request down if the client goes away
+        if hasattr(chunks, "close"):
+            chunks.close()
+
+
 @app.teardown_request
 def close_connection(exc):
     """
-    Closes the database connection
+    Gives the database connection back to the Engine pool.
     Check if the connection is created. It migth be exception appear before
     the connection is created.
+
+    The query profiler of the Engine, if any, reports the statements of the
+    request first, while the connection is still open. Then the request is
+    recorded in the metrics. Streamed collections are torn down when the
+    whole document has been sent, so their time includes the streaming.
     """
 
+    profiler = app.config["Engine"].profiler
+    if profiler is not None and hasattr(g, "request_start"):
+        profiler.finish("%s %s" % (request.method, request.path))
     if hasattr(g, "con"):
-        g.con.close()
+        app.config["Engine"].checkin(g.con)
+    request_metrics = app.config.get("Metrics")
+    if request_metrics is not None and hasattr(g, "request_start"):
+        status = 500 if exc is not None else getattr(g, "status", 500)
+        request_metrics.record_request(request.endpoint or "unknown", request.method, status,
+                                       timeit.default_timer() - g.request_start)
 
 
 # Define the resources
@@ -526,9 +1004,7 @@ class User(Resource):
                                          "Must have isAdmin, username, password, email, firstname, lastname and contactNumber in response body.")
 
         # Conflict if user already exist, return 409
-        # filter in the list of Users.
-        find_username = filter(lambda x: "username" in x and x["username"] == username, g.con.get_users())
-        if find_username:
+        if g.con.get_user(username):
             return create_error_response(409, "Existing username",
                                             "User name: %s has been used." % username)
 
@@ -581,12 +1057,27 @@ class RoomsList(Resource):
             /profiles/room-profile
 
         Semantic descriptions used in items: roomname
+
+        RESPONSE HEADERS:
+         * ETag: Changes when a room is modified.
+         * Cache-Control: Caches must check the ETag.
+
+        RESPONSE STATUS CODE:
+         * Returns 200 with the rooms.
+         * Returns 304 without a body if the If-None-Match header matches
+           the ETag. The database is not read.
         
         NOTE:
          * The attribute picture is obtained from the column rooms.picture
          * The attribute resources is obtained from the column rooms.resources
         """
 
+        # The version is read before the rooms
+        etag = rooms_etag()
+        response = not_modified(etag)
+        if response is not None:
+            return response
+
         # Extract rooms from database
         rooms_db = g.con.get_rooms()
 
@@ -599,18 +1090,11 @@ class RoomsList(Resource):
         items = envelope["items"] = []
 
         for room in rooms_db:
-            item = ReservationObject(name=room["roomname"], photo=room["picture"], resources=room["resources"])
-
-            item.add_control("self", href=api.url_for(Room, name=room["roomname"]))
-            item.add_control("profile", href=TELLUS_ROOM_PROFILE)
-            item.add_control("collection", href=api.url_for(RoomsList))
-            item.add_control_edit_room(room["roomname"])
-            item.add_control_bookings_room(name=room["roomname"])
-            
-            items.append(item)
+            items.append(create_room_item(room))
 
             # RENDER
-        return Response(json.dumps(envelope), 200, mimetype=MASON + ";" + TELLUS_ROOM_PROFILE)
+        return set_rooms_cache(Response(render_json(envelope), 200, mimetype=MASON + ";" + TELLUS_ROOM_PROFILE),
+                               etag)
 
 
 class Room(Resource):
@@ -618,6 +1102,46 @@ class Room(Resource):
     Resource Room implementation
     """
 
+    def get(self, name):
+        """
+        Gets a Room.
+
+        INPUT PARAMETERS:
+        :param str name: The name of the room.
+
+        RESPONSE ENTITY BODY:
+        * Media type: Mason
+            https://github.com/JornWildt/Mason
+        * Profile: room-profile
+            http://docs.tellusreservationapi.apiary.io/#reference
+            /profiles/room-profile
+
+        RESPONSE HEADERS:
+         * ETag: Changes when a room is modified.
+         * Cache-Control: Caches must check the ETag.
+
+        RESPONSE STATUS CODE:
+         * Returns 200 with the room.
+         * Returns 304 without a body if the If-None-Match header matches
+           the ETag. The database is not read.
+         * Returns 404 if there is no room with this name
+        """
+
+        # The version is read before the room
+        etag = rooms_etag()
+        response = not_modified(etag)
+        if response is not None:
+            return response
+
+        room = g.con.get_room(name)
+        if not room:
+            return create_error_response(404, "Room does not exist",
+                                         "There is no a room with name %s" % name)
+        item = create_room_item(room)
+        item.add_namespace("tellus", LINK_RELATIONS_URL)
+        return set_rooms_cache(Response(render_json(item), 200, mimetype=MASON + ";" + TELLUS_ROOM_PROFILE),
+                               etag)
+
     def put(self, name):
         """
         Modifies specified Room.
@@ -640,8 +1164,7 @@ class Room(Resource):
         """
 
         # Check the room exists
-        room = filter(lambda x: "roomname" in x and x["roomname"] == name, g.con.get_rooms())
-        if not room:
+        if not g.con.get_room(name):
             return create_error_response(404, "Room does not exist",
                                          "There is no a room with name %s" % name)
 
@@ -681,9 +1204,15 @@ class Bookings(Resource):
 
     def get(self):
         """
-        Get list of all Bookings in Tellus API.
-        
-        It returns always status code 200.
+        Get list of all Bookings in Tellus API, one page at a time in order of
+        booking time.
+
+        INPUT parameters:
+          The query parameters are:
+          * limit: The maximum number of bookings to return. Default 100.
+          * next: The cursor of the next page, given in the next control.
+
+        It returns status code 200, or 400 if the page parameters are wrong.
 
         RESPONSE ENTITY BODY:
         * Media type: Mason
@@ -701,32 +1230,145 @@ class Bookings(Resource):
          * The attribute lastname is obtained from the column bookings.lastname
         """
 
-        # Extract bookings from database
-        bookings_db = g.con.get_bookings()
-
         # Create envelope for response
         envelope = ReservationObject()
         
         envelope.add_namespace("tellus", LINK_RELATIONS_URL)
         envelope.add_control("self", href=api.url_for(Bookings))
         envelope.add_control_history_bookings()
+        envelope.add_control_add_bookings()
 
-        # Add booking items
-        items = envelope["items"] = []
+        # Extract one page of bookings from database
+        try:
+            bookings_db = get_bookings_page(envelope, api.url_for(Bookings))
+        except ValueError:
+            return create_error_response(400, "Wrong page parameters",
+                                         "The limit or next parameter is incorrect")
+
+        # Add booking items, they are created while the response is rendered
+        def create_items():
+            for booking in bookings_db:
+                item = ReservationObject(   bookingID=booking["bookingID"],
+                                            name=booking["roomname"],
+                                            username=booking["username"],
+                                            bookingTime=booking["bookingTime"])
+
+                item.add_control("profile", href=TELLUS_BOOKING_PROFILE)
+                item.add_control_delete_booking_of_room(booking["roomname"], booking["bookingID"])
+            
+                yield item
 
-        for booking in bookings_db:
-            item = ReservationObject(   bookingID=booking["bookingID"],
-                                        name=booking["roomname"],
-                                        username=booking["username"],
-                                        bookingTime=booking["bookingTime"])
+        # RENDER
+        return render_collection(envelope, create_items(), MASON + ";" + TELLUS_BOOKING_PROFILE)
 
-            item.add_control("profile", href=TELLUS_BOOKING_PROFILE)
-            item.add_control_delete_booking_of_room(booking["roomname"], booking["bookingID"])
-            
+    def post(self):
+        """
+        Adds several bookings, of any rooms, at once. The bookings are checked
+        and added in one transaction. A booking which cannot be added does not
+        stop the others.
+
+        REQUEST ENTITY BODY:
+        * Media type: JSON:
+        * Profile: booking-profile
+            http://docs.tellusreservationapi.apiary.io/#reference
+            /profiles/booking-profile
+
+        The body should be a JSON array of at most MAX_BULK_BOOKINGS
+        documents that match the schema for booking, with the room in name.
+
+        RESPONSE ENTITY BODY:
+        * Media type: Mason
+            https://github.com/JornWildt/Mason
+
+        The items list the result of each booking, in the order of the
+        request, with its status:
+         * 201 if the booking has been added. The self control contains the
+           path of the booking.
+         * 400 if the booking is not well formed, one of its values is not a
+           string or the bookingTime is not in format YYYY-MM-DD HH:MM.
+         * 404 if the room or the user does not exist.
+         * 409 if the booking overlaps another booking of the room, in the
+           database or earlier in the request.
+
+        RESPONSE STATUS CODE:
+         * Returns 200 with the result of each booking.
+         * Returns 400 if the body is not an array or it is too long.
+         * Returns 415 if the format of the response is not json
+        """
+
+        if JSON != request.headers.get("Content-Type", ""):
+            return create_error_response(415, "UnsupportedMediaType",
+                                         "Use a JSON compatible format")
+        request_body = request.get_json(force=True)
+        # It throws a BadRequest exception, and hence a 400 code if the JSON is
+        # not wellformed
+        if not isinstance(request_body, list) or len(request_body) > MAX_BULK_BOOKINGS:
+            return create_error_response(400, "Wrong request format",
+                                         "Send an array of at most %d bookings." % MAX_BULK_BOOKINGS)
+
+        # Bookings for the database, and the error of the bookings which are
+        # not well formed
+        bookings = []
+        errors = {}
+        for number, booking in enumerate(request_body):
+            try:
+                booking_dict = {"roomname": booking["name"],
+                                "username": booking["username"],
+                                "bookingTime": booking["bookingTime"],
+                                "firstname": booking["givenName"],
+                                "lastname": booking["familyName"],
+                                "email": booking["email"],
+                                "contactnumber": booking["telephone"]}
+                # Every value is a string, arrays and objects cannot be
+                # compared nor stored
+                if [value for value in booking_dict.itervalues() if not isinstance(value, basestring)]:
+                    raise TypeError("The values of a booking must be strings")
+                database.to_minutes(booking["bookingTime"])
+            except (KeyError, TypeError, ValueError):
+                errors[number] = (400, "Wrong request format",
+                                  "The booking is not well formed, its values are not strings or the bookingTime is not in format YYYY-MM-DD HH:MM.")
+                # Without its keys the database leaves the booking out
+                booking_dict = {}
+            bookings.append(booking_dict)
+
+        # Add bookings
+        added = g.con.add_bookings(bookings)
+
+        # Rooms and users which exist, looked up for the bookings not added
+        found = {}
+
+        def exists(get, name):
+            if (get, name) not in found:
+                found[(get, name)] = get(name) is not None
+            return found[(get, name)]
+
+        # Create envelope for response
+        envelope = ReservationObject()
+        envelope.add_namespace("tellus", LINK_RELATIONS_URL)
+        envelope.add_control("self", href=api.url_for(Bookings))
+        items = envelope["items"] = []
+        for number, new_booking in enumerate(added):
+            if new_booking is not None:
+                item = ReservationObject(status=201, bookingID=new_booking[0], name=new_booking[1])
+                item.add_control("self", href=api.url_for(BookingOfRoom, name=new_booking[1],
+                                                          booking_id=new_booking[0]))
+            else:
+                booking = bookings[number]
+                if number in errors:
+                    status, title, message = errors[number]
+                elif not exists(g.con.get_room, booking["roomname"]) or \
+                        not exists(g.con.get_user, booking["username"]):
+                    status, title, message = (404, "Resource not found",
+                                              "The room or the user of the booking does not exist.")
+                else:
+                    status, title, message = (409, "Conflict booking",
+                                              "The new booking was conflicted with an existence booking")
+                item = ReservationObject(status=status)
+                item.add_error(title, message)
             items.append(item)
 
-            # RENDER
-        return Response(json.dumps(envelope), 200, mimetype=MASON + ";" + TELLUS_BOOKING_PROFILE)
+        # RENDER
+        return Response(render_json(envelope), 200, mimetype=MASON + ";" + TELLUS_BOOKING_PROFILE)
 
 
 class BookingsOfRoom(Resource):
@@ -736,10 +1378,14 @@ class BookingsOfRoom(Resource):
 
     def get(self, name):
         """
-        Get all list of bookings for specified room.
+        Get all list of bookings for specified room, one page at a time in
+        order of booking time.
 
         INPUT parameters:
           :param str name: the name of the room.
+          The query parameters are:
+          * limit: The maximum number of bookings to return. Default 100.
+          * next: The cursor of the next page, given in the next control.
 
         RESPONSE ENTITY BODY:
         * Media type: Mason
@@ -758,13 +1404,9 @@ class BookingsOfRoom(Resource):
         """
 
         # Check the room exists
-        room = filter(lambda x: "roomname" in x and x["roomname"] == name, g.con.get_rooms())
-        if not room:
+        if not g.con.get_room(name):
             return create_error_response(404, "Room does not exist",
                                   "There is no a room with name %s" % name)
-        # Extract bookings from database
-        bookings_db = g.con.get_bookings(name)
-
         # Create envelope for response
         envelope = ReservationObject()
         envelope.add_namespace("tellus", LINK_RELATIONS_URL)
@@ -773,23 +1415,31 @@ class BookingsOfRoom(Resource):
         envelope.add_control_bookings_all()
         envelope.add_control_add_booking(name=name)
 
-        # Add booking items
-        items = envelope["items"] = []
-
-        for booking in bookings_db:
-            item = ReservationObject(name=booking["roomname"],
-                                     username=booking["username"],
-                                     bookingTime=booking["bookingTime"])
-            item.add_control("profile", href=TELLUS_BOOKING_PROFILE)
-            item.add_control("collection",
-                             href=api.url_for(BookingsOfRoom, name=name))
-            item.add_control_delete_booking_of_room(name=booking["roomname"],
-                                                    booking_id=booking["bookingID"])
-            item.add_control_edit_booking()
-            items.append(item)
+        # Extract one page of bookings from database
+        try:
+            bookings_db = get_bookings_page(envelope, api.url_for(BookingsOfRoom, name=name),
+                                            roomname=name)
+        except ValueError:
+            return create_error_response(400, "Wrong page parameters",
+                                         "The limit or next parameter is incorrect")
+
+        # Add booking items, they are created while the response is rendered
+        collection = api.url_for(BookingsOfRoom, name=name)
+
+        def create_items():
+            for booking in bookings_db:
+                item = ReservationObject(name=booking["roomname"],
+                                         username=booking["username"],
+                                         bookingTime=booking["bookingTime"])
+                item.add_control("profile", href=TELLUS_BOOKING_PROFILE)
+                item.add_control("collection", href=collection)
+                item.add_control_delete_booking_of_room(name=booking["roomname"],
+                                                        booking_id=booking["bookingID"])
+                item.add_control_edit_booking()
+                yield item
 
-            # RENDER
-        return Response(json.dumps(envelope), 200, mimetype=MASON + ";" + TELLUS_BOOKING_PROFILE)
+        # RENDER
+        return render_collection(envelope, create_items(), MASON + ";" + TELLUS_BOOKING_PROFILE)
 
     def post(self, name):
         """
@@ -812,11 +1462,10 @@ class BookingsOfRoom(Resource):
         RESPONSE STATUS CODE:
          * Returns 201 if the booking has been added correctly.
            The Location header contains the path of the booking
-         * Returns 400 if the booking is not well formed or the entity body is
-           empty.
-         * Returns 409 if the booking conflicts with another booking.
+         * Returns 400 if the booking is not well formed, the bookingTime is
+           not in format YYYY-MM-DD HH:MM or the entity body is empty.
+         * Returns 409 if the booking overlaps another booking of the room.
          * Returns 415 if the format of the response is not json
-         * Returns 500 if the booking could not be added to database.
         """
 
         if JSON != request.headers.get("Content-Type", ""):
@@ -840,18 +1489,23 @@ class BookingsOfRoom(Resource):
             return create_error_response(400, "Wrong request format",
                                          "There is something wrong with the booking format.")
 
-        # Check if there is conflict
-        bookings_db = g.con.get_bookings(name)
-        for booking in bookings_db:
-            if booking['bookingTime'] == booking_dict['bookingTime']:
-                return create_error_response(409, "Conflict booking",
-                                             "The new booking was conflicted with an existence booking")
+        # Check if there is conflict, a booking of the room overlapping the new
+        # one. The in-memory index finds it and the database confirms it by its
+        # primary key, the database checks again when the booking is added.
+        try:
+            conflicts = g.con.get_overlapping_bookings(name, booking_dict['bookingTime'])
+        except (TypeError, ValueError):
+            return create_error_response(400, "Wrong request format",
+                                         "The bookingTime must be in format YYYY-MM-DD HH:MM.")
+        if conflicts:
+            return create_error_response(409, "Conflict booking",
+                                         "The new booking was conflicted with an existence booking")
 
-        # Add booking
+        # Add booking, it is not added if another request booked the room first
         new_booking = g.con.add_booking(name, booking_dict['username'], booking_dict['bookingTime'], booking_dict)
         if not new_booking:
-            return create_error_response(500, "Internal error",
-                                         "Booking cannot be added.")
+            return create_error_response(409, "Conflict booking",
+                                         "The new booking was conflicted with an existence booking")
         # Create the Location header.
         url = api.url_for(BookingOfRoom, name=name, booking_id=new_booking[0])
 
@@ -867,10 +1521,14 @@ class BookingsOfUser(Resource):
 
     def get(self, username):
         """
-        Get all list of bookings for specified user.
+        Get all list of bookings for specified user, one page at a time in
+        order of booking time.
 
         INPUT parameters:
           :param str username: the username of the user.
+          The query parameters are:
+          * limit: The maximum number of bookings to return. Default 100.
+          * next: The cursor of the next page, given in the next control.
 
         RESPONSE ENTITY BODY:
         * Media type: Mason
@@ -889,14 +1547,10 @@ class BookingsOfUser(Resource):
         """
 
         # Check the user exists
-        find_username = filter(lambda x: "username" in x and x["username"] == username, g.con.get_users())
-        if not find_username:
+        if not g.con.get_user(username):
             return create_error_response(404, "User does not exist",
                                           "There is no a user with username %s" % username)
 
-        # Extract bookings from database
-        bookings_db = filter(lambda x: "username" in x and x["username"] == username, g.con.get_bookings())
-
         # Create envelope for response
         envelope = ReservationObject()
         envelope.add_namespace("tellus", LINK_RELATIONS_URL)
@@ -904,22 +1558,31 @@ class BookingsOfUser(Resource):
         envelope.add_control("self", href=api.url_for(BookingsOfUser, username=username))
         envelope.add_control_bookings_all()
 
-        # Add booking items
-        items = envelope["items"] = []
-
-        for booking in bookings_db:
-            item = ReservationObject(name=booking["roomname"],
-                                     username=booking["username"],
-                                     bookingTime=booking["bookingTime"])
-            item.add_control("profile", href=TELLUS_BOOKING_PROFILE)
-            item.add_control("collection",
-                             href=api.url_for(BookingsOfUser, username=username))
-            item.add_control_delete_booking_of_user(username=booking["username"],
-                                                    booking_id=booking["bookingID"])
-            items.append(item)
+        # Extract one page of bookings from database
+        try:
+            bookings_db = get_bookings_page(envelope,
+                                            api.url_for(BookingsOfUser, username=username),
+                                            username=username)
+        except ValueError:
+            return create_error_response(400, "Wrong page parameters",
+                                         "The limit or next parameter is incorrect")
+
+        # Add booking items, they are created while the response is rendered
+        collection = api.url_for(BookingsOfUser, username=username)
+
+        def create_items():
+            for booking in bookings_db:
+                item = ReservationObject(name=booking["roomname"],
+                                         username=booking["username"],
+                                         bookingTime=booking["bookingTime"])
+                item.add_control("profile", href=TELLUS_BOOKING_PROFILE)
+                item.add_control("collection", href=collection)
+                item.add_control_delete_booking_of_user(username=booking["username"],
+                                                        booking_id=booking["bookingID"])
+                yield item
 
         # RENDER
-        return Response(json.dumps(envelope), 200, mimetype=MASON + ";" + TELLUS_BOOKING_PROFILE)
+        return render_collection(envelope, create_items(), MASON + ";" + TELLUS_BOOKING_PROFILE)
 
 
 class BookingOfRoom(Resource):
@@ -943,19 +1606,21 @@ class BookingOfRoom(Resource):
 
         RESPONSE STATUS CODE:
          * Returns 204 if the booking was successfully modified
-         * Returns 400 if the input format for modify is wrong or empty.
+         * Returns 400 if the input format for modify is wrong or empty, or
+           the bookingTime is not in format YYYY-MM-DD HH:MM.
          * Returns 404 if there is no booking with booking_id in that room name
+         * Returns 409 if the new time overlaps another booking of the room,
+           or the booking was deleted meanwhile.
          * Returns 415 if the input format is not JSON (unsupport media type)
-         * Returns 500 if failed to modify the booking in database
         """
 
         #CHECK THAT BOOKING EXISTS
-        # filter in the list of booking by room name.
-        find_booking_id = filter(lambda x: "bookingID" in x and x["bookingID"] == int(booking_id), g.con.get_bookings(name))
+        # look up the booking in the room.
+        find_booking_id = g.con.get_booking(int(booking_id), roomname=name)
         # if the booking ID not found, return 404, no existence booking
         if not find_booking_id:
             return create_error_response(404, "Booking not found",
-                                         "There is no Booking with Booking ID: %(bookingID)s in Room: %(roomName)s | find_booking_id = %(v3)s" % {"bookingID":booking_id, "roomName":name, "v3":find_booking_id})
+                                         "There is no Booking with Booking ID: %(bookingID)s in Room: %(roomName)s" % {"bookingID":booking_id, "roomName":name})
         
         # Access the headers content-type
         if JSON != request.headers.get("Content-Type",""):
@@ -981,13 +1646,18 @@ class BookingOfRoom(Resource):
         except KeyError:
             return create_error_response(400, "Wrong request format",
                                          "Must have username, bookingTime, firstname, lastname, email, contactNumber in response body.")
+        try:
+            database.to_minutes(_bookingtime)
+        except (TypeError, ValueError):
+            return create_error_response(400, "Wrong request format",
+                                         "The bookingTime must be in format YYYY-MM-DD HH:MM.")
         else:
-            # Modify the booking in the database
+            # Modify the booking in the database, it is not modified if the
+            # room is already booked at the new time
             mod = g.con.modify_booking(int(booking_id), name, _username, _bookingtime, request_body)
             if not mod:
-                return create_error_response(500, "Internal error",
-                                         "Booking information for %(v1)s cannot be updated in database |mod = %(v2)s" % {"v1":booking_id, "v2":mod}
-                                        )
+                return create_error_response(409, "Conflict booking",
+                                             "The modified booking was conflicted with an existence booking")
             return "", 204
 
     def delete(self, name, booking_id):
@@ -1029,12 +1699,11 @@ class BookingOfUser(Resource):
          * Returns 204 if the Booking was successfully deleted
          * Returns 404 if the Booking did not exist.
         """
-        bookings_db = filter(lambda x: "bookingID" in x and x["bookingID"] == int(booking_id), g.con.get_bookings())
-        if not bookings_db:
+        booking = g.con.get_booking(int(booking_id), username=username)
+        if not booking:
             # Send 404 error message
             return create_error_response(404, "Unknown Booking",
                                          "There is no Booking with Booking ID: %s" % booking_id)
-        booking = bookings_db[0]
         # PERFORM DELETE OPERATIONS
         if g.con.delete_booking(int(booking_id), booking["roomname"], booking["username"], booking["bookingTime"]):
             return "", 204
@@ -1051,11 +1720,13 @@ class HistoryBookings(Resource):
 
     def get(self):
         """
-        Get all list of past bookings.
+        Get all list of past bookings, one page at a time starting from the
+        latest.
 
         INPUT parameters:
           The query parameters are:
-          * limit: The maximum number of bookings to return.
+          * limit: The maximum number of bookings to return. Default 30.
+          * next: The cursor of the next page, given in the next control.
 
         RESPONSE ENTITY BODY:
         * Media type: Mason
@@ -1064,37 +1735,35 @@ class HistoryBookings(Resource):
             http://docs.tellusreservationapi.apiary.io/#reference
             /profiles/booking-profile
         """
-        # Extract query parameters
-        parameters = request.args
-        limit = int(parameters.get('limit', 30))
-
-        # Extract bookings from database
-        bookings_db = filter(
-            lambda x: "bookingTime" in x
-                      and x["bookingTime"] < strftime("%Y-%m-%d %H:%M", gmtime()),
-            g.con.get_bookings())
-        bookings_db = bookings_db[:limit]
-
         # Create envelope for response
         envelope = ReservationObject()
         envelope.add_namespace("tellus", LINK_RELATIONS_URL)
 
         envelope.add_control("self", href=api.url_for(HistoryBookings))
 
-        # Add booking items
-        items = envelope["items"] = []
-
-        for booking in bookings_db:
-            item = ReservationObject(name=booking["roomname"],
-                                     username=booking["username"],
-                                     bookingTime=booking["bookingTime"])
-            item.add_control("profile", href=TELLUS_BOOKING_PROFILE)
-            item.add_control_delete_booking_of_room(name=booking["roomname"],
-                                                    booking_id=booking["bookingID"])
-            items.append(item)
+        # Extract one page of past bookings from database, latest first
+        try:
+            bookings_db = get_bookings_page(envelope, api.url_for(HistoryBookings),
+                                            default_limit=HISTORY_PAGE_SIZE,
+                                            order="-bookingTime",
+                                            before=datetime.utcnow())
+        except ValueError:
+            return create_error_response(400, "Wrong page parameters",
+                                         "The limit or next parameter is incorrect")
+
+        # Add booking items, they are created while the response is rendered
+        def create_items():
+            for booking in bookings_db:
+                item = ReservationObject(name=booking["roomname"],
+                                         username=booking["username"],
+                                         bookingTime=booking["bookingTime"])
+                item.add_control("profile", href=TELLUS_BOOKING_PROFILE)
+                item.add_control_delete_booking_of_room(name=booking["roomname"],
+                                                        booking_id=booking["bookingID"])
+                yield item
 
         # RENDER
-        return Response(json.dumps(envelope), 200, mimetype=MASON + ";" + TELLUS_BOOKING_PROFILE)
+        return render_collection(envelope, create_items(), MASON + ";" + TELLUS_BOOKING_PROFILE)
 
 # Define the routes
 api.add_resource(User, "/tellus/api/users/<username>/",
@@ -1115,6 +1784,8 @@ api.add_resource(BookingOfUser, "/tellus/api/users/<username>/bookings/<booking_
                  endpoint="booking_of_user")
 api.add_resource(HistoryBookings, "/tellus/api/bookings/history/",
                  endpoint="history_bookings")
+# Compiled URLs of the resources, used by the controls of the documents
+URL_TEMPLATES = compile_url_templates()
 
 
 # Redirect profile
@@ -1128,6 +1799,24 @@ def redirect_to_rels(rel_name):
     return redirect(APIARY_RELS_URL + rel_name)
 
 
+@app.route("/tellus/metrics")
+def get_metrics():
+    """
+    Returns the request metrics and the statistics of the database pool and
+    of the booking lists cache in the Prometheus text format.
+
+    RESPONSE STATUS CODE:
+     * Returns 200 with the metrics.
+     * Returns 404 if the metrics are not recorded.
+    """
+
+    if app.config.get("Metrics") is None:
+        return create_error_response(404, "Metrics not found", "The metrics are not recorded")
+    engine = app.config["Engine"]
+    return Response(app.config["Metrics"].render(engine.pool_stats(), engine.cache_stats()),
+                    content_type=metrics.CONTENT_TYPE)
+
+
 # Start the application
 # DATABASE SHOULD HAVE BEEN POPULATED PREVIOUSLY
 if __name__ == "__main__":
@@ -14,7 +14,7 @@ TEST_FOLDER="tests"
 declare -a test_files=("tests_database_api_users" "tests_database_api_rooms" "tests_database_api_bookings"
 "tests_resource_api_room" "tests_resource_api_bookings_of_room" "tests_resource_api_booking_of_user"
 "tests_resource_api_bookings_of_user" "tests_resource_api_history_bookings" "func_tests_database_api_users"
-"func_tests_database_api_rooms" "func_tests_database_api_bookings")
+"func_tests_database_api_rooms" "func_tests_database_api_bookings" "tests_database_api_pool" "tests_database_api_profile" "tests_database_api_wal" "tests_database_api_indexes" "tests_resource_api_streaming" "tests_database_api_intervals" "tests_database_api_concurrency" "tests_resource_api_bookings" "tests_dataio" "tests_resource_api_metrics" "tests_database_api_profiler" "tests_database_api_replica" "tests_database_api_booking_cache" "tests_resource_api_url_templates" "tests_resource_api_json" "tests_resource_api_compression")
 
 function create_test_db {
     ## Check database folder exists
@@ -13,7 +13,7 @@ DB_TEST_FILE_NAME="test_tellus.db"
 TEST_FOLDER="tests"
 declare -a test_files=("tests_resource_api_room" "tests_resource_api_bookings_of_room" "tests_resource_api_booking_of_user"
 "tests_resource_api_bookings_of_user" "tests_resource_api_history_bookings" "func_tests_database_api_users"
-"func_tests_database_api_rooms" "func_tests_database_api_bookings")
+"func_tests_database_api_rooms" "func_tests_database_api_bookings" "tests_resource_api_streaming" "tests_resource_api_bookings" "tests_resource_api_metrics" "tests_resource_api_url_templates" "tests_resource_api_json" "tests_resource_api_compression")
 
 function create_test_db {
     ## Check database folder exists
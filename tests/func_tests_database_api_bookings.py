@@ -9,8 +9,8 @@ PUT /rooms/{name}/bookings/{booking_id} (Bookings of Room)
     return code 204 successfully modified Room info
                 400 wrong request format
                 404 room not found
+                409 the room is already booked at the new time
                 415 unsupported Media Type
-                500 Database error
 
 DELETE /rooms/{name}/bookings/{booking_id} (Bookings of Room)
     return code 204 successfully delete Booking
@@ -190,6 +190,23 @@ class BookingsTestCase(unittest.TestCase):
         if find_booking:
             print "***Successfully modify booking_id %s" % self.modify_booking_1["bookingID"]
 
+    def test_modify_booking_of_room_conflict(self):
+        """
+        Test that a booking cannot be moved onto another booking of the room
+        """
+        print "("+self.test_modify_booking_of_room_conflict.__name__+")", self.test_modify_booking_of_room_conflict.__doc__
+        url = resources.api.url_for(resources.BookingOfRoom, booking_id=4, name="Aspire")
+        booking = {"bookingID": "4", "roomname": "Aspire", "username": "lam", "firstname": "Lam",
+                   "lastname": "Huynh", "email": "lam.huynh@ee.oulu.fi", "contactnumber": "0411322922"}
+        # The start of booking 5, and a start during booking 5
+        for booking_time in ("2017-09-05 10:00", "2017-09-05 10:30", "2017-09-05 09:30"):
+            booking["bookingTime"] = booking_time
+            resp = self.client.put(url, headers={"Content-Type": JSON}, data=json.dumps(booking))
+            self.assertEquals(resp.status_code, 409)
+        con = resources.app.config["Engine"].connect()
+        self.assertEquals(con.get_booking(4)["bookingTime"], "2017-03-16 12:00")
+        con.close()
+
     def test_modify_booking_of_room_wrong_format(self):
         """
         Test that it returns error when is missing a mandatory data
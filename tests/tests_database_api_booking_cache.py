@@ -0,0 +1,150 @@
+'''
+Database interface testing for the cache of the booking lists of the rooms.
+'''
+import unittest
+from reservation import database
+
+#Path to the database file, different from the deployment db
+#Please run setup script first to make sure test database is OK.
+DB_PATH = "database/test_tellus.db"
+
+ROOMNAME = 'Aspire'
+BOOKINGS_OF_ROOM = 3
+OTHER_ROOMNAME = 'Chill'
+NEW_USER = 'cacheuser'
+BOOKING = {'firstname': 'Cache',
+           'lastname': 'User',
+           'email': 'cache@example.com',
+           'contactnumber': '0400000000'}
+BOOKING_TIME = '2017-10-02 10:00'
+
+
+class BookingCacheDBAPITestCase(unittest.TestCase):
+    '''
+    Test cases for the booking lists kept by the Engine.
+    '''
+    #INITIATION METHODS
+    def setUp(self):
+        '''
+        Creates an Engine whose statements are recorded.
+        '''
+        self.profiler = database.QueryProfiler()
+        self.engine = database.Engine(DB_PATH, profiler=self.profiler)
+        self.connection = self.engine.connect()
+
+    def tearDown(self):
+        '''
+        Close underlying connection.
+        '''
+        self.connection.close()
+        self.engine.dispose()
+
+    def _count_statements(self, function):
+        '''
+        Returns the number of statements run by function.
+        '''
+        self.profiler.start()
+        function()
+        return len(self.profiler.finish())
+
+    def test_hits_and_misses(self):
+        '''
+        Test that a list is read once and then found without SQL
+        '''
+        print '('+self.test_hits_and_misses.__name__+')', \
+              self.test_hits_and_misses.__doc__
+        self.assertEquals(self._count_statements(lambda: self.connection.get_bookings(ROOMNAME)), 1)
+        bookings = self.connection.get_bookings(ROOMNAME)
+        self.assertEquals(len(bookings), BOOKINGS_OF_ROOM)
+        self.assertEquals(self._count_statements(lambda: self.connection.get_bookings(ROOMNAME)), 0)
+        # Other parameters are other lists
+        page = self.connection.get_bookings(ROOMNAME, order='bookingTime', limit=2)
+        self.assertEquals(len(page), 2)
+        self.assertEquals(list(self.connection.iter_bookings(ROOMNAME, order='bookingTime', limit=2)), page)
+        # Lists of other filters are not kept
+        self.connection.get_bookings(ROOMNAME, username='lam')
+        self.assertEquals(self._count_statements(lambda: self.connection.get_bookings(ROOMNAME, username='lam')), 1)
+        # The returned list is a copy
+        bookings.pop()
+        self.assertEquals(len(self.connection.get_bookings(ROOMNAME)), BOOKINGS_OF_ROOM)
+        stats = self.engine.cache_stats()
+        self.assertEquals(stats['size'], 2)
+        self.assertEquals(stats['hits'], 4)
+        self.assertEquals(stats['misses'], 2)
+        self.assertEquals(stats['evictions'], 0)
+
+    def test_writes_change_version(self):
+        '''
+        Test that added, modified and deleted bookings are seen
+        '''
+        print '('+self.test_writes_change_version.__name__+')', \
+              self.test_writes_change_version.__doc__
+        other = self.engine.connect()
+        self.assertEquals(len(other.get_bookings(ROOMNAME)), BOOKINGS_OF_ROOM)
+        other_list = other.get_bookings(OTHER_ROOMNAME)
+        booking = self.connection.add_booking(ROOMNAME, 'lam', BOOKING_TIME, BOOKING)
+        self.assertEquals(len(other.get_bookings(ROOMNAME)), BOOKINGS_OF_ROOM + 1)
+        # Lists of other rooms are still kept
+        self.assertEquals(self._count_statements(lambda: other.get_bookings(OTHER_ROOMNAME)), 0)
+        self.assertEquals(other.get_bookings(OTHER_ROOMNAME), other_list)
+        booking_dict = dict(BOOKING, bookingID=booking[0], roomname=ROOMNAME, username='lam',
+                            bookingTime='2017-10-03 10:00')
+        self.connection.modify_booking(booking[0], ROOMNAME, 'lam', '2017-10-03 10:00', booking_dict)
+        self.assertEquals(other.get_bookings(ROOMNAME)[-1]['bookingTime'], '2017-10-03 10:00')
+        self.assertTrue(self.connection.delete_booking(booking[0], ROOMNAME))
+        self.assertEquals(len(other.get_bookings(ROOMNAME)), BOOKINGS_OF_ROOM)
+        results = self.connection.add_bookings([dict(BOOKING, roomname=ROOMNAME, username='lam',
+                                                     bookingTime=BOOKING_TIME)])
+        self.assertEquals(len(other.get_bookings(ROOMNAME)), BOOKINGS_OF_ROOM + 1)
+        # Without the room every list is read again
+        self.assertTrue(self.connection.delete_booking(results[0][0]))
+        self.assertEquals(len(other.get_bookings(ROOMNAME)), BOOKINGS_OF_ROOM)
+        self.assertEquals(self._count_statements(lambda: other.get_bookings(OTHER_ROOMNAME)), 1)
+        other.close()
+
+    def test_delete_user_cascade(self):
+        '''
+        Test that bookings deleted with their user are not found
+        '''
+        print '('+self.test_delete_user_cascade.__name__+')', \
+              self.test_delete_user_cascade.__doc__
+        self.connection.add_user(NEW_USER, {})
+        self.connection.add_booking(OTHER_ROOMNAME, NEW_USER, BOOKING_TIME, BOOKING)
+        self.connection.add_booking(ROOMNAME, NEW_USER, BOOKING_TIME, BOOKING)
+        self.assertEquals(len(self.connection.get_bookings(ROOMNAME)), BOOKINGS_OF_ROOM + 1)
+        self.assertEquals(len(self.connection.get_bookings(OTHER_ROOMNAME)), 2)
+        self.assertTrue(self.connection.delete_user(NEW_USER))
+        self.assertEquals(len(self.connection.get_bookings(ROOMNAME)), BOOKINGS_OF_ROOM)
+        self.assertEquals(len(self.connection.get_bookings(OTHER_ROOMNAME)), 1)
+
+    def test_eviction(self):
+        '''
+        Test that the least recently used list is evicted
+        '''
+        print '('+self.test_eviction.__name__+')', \
+              self.test_eviction.__doc__
+        engine = database.Engine(DB_PATH, booking_cache_size=2, profiler=self.profiler)
+        connection = engine.connect()
+        connection.get_bookings('Stage')
+        connection.get_bookings(ROOMNAME)
+        # Stage is used again, Aspire is the least recently used
+        connection.get_bookings('Stage')
+        connection.get_bookings(OTHER_ROOMNAME)
+        self.assertEquals(self._count_statements(lambda: connection.get_bookings('Stage')), 0)
+        self.assertEquals(self._count_statements(lambda: connection.get_bookings(ROOMNAME)), 1)
+        self.assertEquals(engine.cache_stats(), {'size': 2, 'max_size': 2, 'hits': 2,
+                                                 'misses': 4, 'evictions': 2})
+        connection.close()
+        engine.dispose()
+        # Disabled cache
+        engine = database.Engine(DB_PATH, booking_cache_size=0, profiler=self.profiler)
+        connection = engine.connect()
+        connection.get_bookings(ROOMNAME)
+        self.assertEquals(self._count_statements(lambda: connection.get_bookings(ROOMNAME)), 1)
+        self.assertEquals(engine.cache_stats()['size'], 0)
+        connection.close()
+        engine.dispose()
+
+if __name__ == '__main__':
+    print 'Start running tests'
+    unittest.main()
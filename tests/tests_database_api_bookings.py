@@ -22,7 +22,7 @@ The booking has a data model represented by the following User dictionary:
     * ``contactnumber``: Contact number of user.
 
 '''
-import unittest, sqlite3
+import unittest, sqlite3, datetime
 from reservation import database
 
 #Path to the database file, different from the deployment db
@@ -135,6 +135,27 @@ class BookingsDBAPITestCase(unittest.TestCase):
             # Assert
             self.assertEquals(len(users), INITIAL_SIZE_BOOKING)
 
+    def test_get_booking(self):
+        '''
+        Test that get_booking extracts booking 2, also scoped by room and user
+        '''
+        print '(' + self.test_get_booking.__name__ + ')', self.test_get_booking.__doc__
+        booking = self.connection.get_booking(BOOKING2['bookingID'])
+        self.assertDictContainsSubset(booking, BOOKING2)
+        booking = self.connection.get_booking(BOOKING2['bookingID'], roomname=ROOMNAME2,
+                                              username=BOOKING2['username'])
+        self.assertDictContainsSubset(booking, BOOKING2)
+
+    def test_get_booking_wrong_scope(self):
+        '''
+        Test get_booking with a non existing booking and with a wrong room or user
+        '''
+        print '(' + self.test_get_booking_wrong_scope.__name__ + ')', \
+            self.test_get_booking_wrong_scope.__doc__
+        self.assertIsNone(self.connection.get_booking(NON_EXIST_BOOKING['bookingID']))
+        self.assertIsNone(self.connection.get_booking(BOOKING2['bookingID'], roomname=ROOMNAME1))
+        self.assertIsNone(self.connection.get_booking(BOOKING2['bookingID'], username=NEW_BOOKING_USERNAME))
+
     def test_get_bookings(self):
         '''
         Test that get_bookings work correctly without roomname
@@ -167,6 +188,61 @@ class BookingsDBAPITestCase(unittest.TestCase):
         # Check that data is correct
         self.assertDictContainsSubset(bookings[0], BOOKING2)
 
+    def test_get_bookings_of_user(self):
+        '''
+        Test get_bookings with username "lam", ordered by bookingTime
+        '''
+        print '(' + self.test_get_bookings_of_user.__name__ + ')', \
+            self.test_get_bookings_of_user.__doc__
+        bookings = self.connection.get_bookings(username=NEW_BOOKING_USERNAME, order='bookingTime')
+        self.assertTrue(bookings)
+        # Bookings without a start come first, as None in sorted keys
+        keys = [booking.key for booking in bookings]
+        self.assertListEqual(keys, sorted(keys))
+        for booking in bookings:
+            self.assertEquals(booking['username'], NEW_BOOKING_USERNAME)
+
+    def test_get_bookings_time_range(self):
+        '''
+        Test get_bookings between 2017-03-01 and 2017-04-01.
+        Check that it includes information for BOOKING2
+        '''
+        print '(' + self.test_get_bookings_time_range.__name__ + ')', \
+            self.test_get_bookings_time_range.__doc__
+        bookings = self.connection.get_bookings(before='2017-04-01 00:00', after='2017-03-01 00:00')
+        self.assertTrue(bookings)
+        for booking in bookings:
+            self.assertTrue('2017-03-01 00:00' <= booking['bookingTime'] < '2017-04-01 00:00')
+        self.assertIn(BOOKING2['bookingID'], [booking['bookingID'] for booking in bookings])
+        self.assertRaises(KeyError, self.connection.get_bookings, order='roomname')
+
+    def test_get_bookings_pages(self):
+        '''
+        Test get_bookings page by page with a limit of 2.
+        Check that the pages together are all bookings in order of bookingTime
+        '''
+        print '(' + self.test_get_bookings_pages.__name__ + ')', \
+            self.test_get_bookings_pages.__doc__
+        expected = self.connection.get_bookings(order='bookingTime')
+        pages = []
+        start = None
+        while True:
+            page = self.connection.get_bookings(order='bookingTime', start=start, limit=2)
+            self.assertLessEqual(len(page), 2)
+            if not page:
+                break
+            pages.extend(page)
+            start = page[-1].key
+        self.assertEquals(pages, expected)
+        # Descending pages start before the given booking
+        booking2 = self.connection.get_booking(BOOKING2['bookingID'])
+        page = self.connection.get_bookings(order='-bookingTime', limit=2, start=booking2.key)
+        for booking in page:
+            # Bookings without a start come last
+            if booking.start is not None:
+                self.assertLess(booking.start, booking2.start)
+        self.assertRaises(ValueError, self.connection.get_bookings, start=booking2.key)
+
     def test_get_bookings_wrong_roomname(self):
         '''
         Test get_bookings with wrong roomname "Vodka"
@@ -256,6 +332,103 @@ class BookingsDBAPITestCase(unittest.TestCase):
         booking = self.connection.add_booking(ROOMNAME1, BOOKING1['username'], BOOKING1['bookingTime'], BOOKING1)
         self.assertIsNone(booking)
 
+    def test_add_booking_datetime(self):
+        '''
+        Test that a booking added with a datetime is found with datetimes
+        '''
+        print '(' + self.test_add_booking_datetime.__name__ + ')', \
+            self.test_add_booking_datetime.__doc__
+        booking_time = datetime.datetime(2017, 6, 1, 14, 30)
+        booking = self.connection.add_booking(ROOMNAME2, NEW_BOOKING_USERNAME, booking_time, NEW_BOOKING)
+        self.assertIsNotNone(booking)
+        try:
+            # Same time as text is the same booking
+            self.assertIsNone(self.connection.add_booking(ROOMNAME2, NEW_BOOKING_USERNAME,
+                                                          '2017-06-01 14:30', NEW_BOOKING))
+            found = self.connection.get_bookings(ROOMNAME2, after=booking_time,
+                                                 before=booking_time + datetime.timedelta(minutes=1))
+            self.assertEquals(len(found), 1)
+            self.assertEquals(found[0]['bookingID'], booking[0])
+            self.assertEquals(found[0]['bookingTime'], '2017-06-01 14:30')
+            self.assertEquals(found[0].start, booking_time)
+            self.assertEquals(found[0].key, (database.to_minutes(booking_time), booking[0]))
+            self.assertRaises(ValueError, self.connection.get_bookings, before='2017-13-01 00:00')
+        finally:
+            self.assertTrue(self.connection.delete_booking(booking[0]))
+
+    def test_get_bookings_pages_without_start(self):
+        '''
+        Test that bookings whose time is malformed are paginated once, first
+        '''
+        print '(' + self.test_get_bookings_pages_without_start.__name__ + ')', \
+            self.test_get_bookings_pages_without_start.__doc__
+        added = [self.connection.add_booking(ROOMNAME2, NEW_BOOKING_USERNAME, booking_time, NEW_BOOKING)[0]
+                 for booking_time in ('someday', 'later')]
+        try:
+            expected = self.connection.get_bookings(ROOMNAME2, order='bookingTime')
+            self.assertIsNone(expected[0].start)
+            self.assertIsNone(expected[1].start)
+            for order in ('bookingTime', '-bookingTime'):
+                pages = []
+                start = None
+                while True:
+                    page = self.connection.get_bookings(ROOMNAME2, order=order, start=start, limit=1)
+                    if not page:
+                        break
+                    pages.extend(page)
+                    start = page[-1].key
+                if order == '-bookingTime':
+                    pages.reverse()
+                self.assertEquals(pages, expected)
+            # Bookings without a start are never in a time range
+            for booking in self.connection.get_bookings(ROOMNAME2, after='1970-01-01 00:00'):
+                self.assertNotIn(booking['bookingID'], added)
+        finally:
+            for booking_id in added:
+                self.assertTrue(self.connection.delete_booking(booking_id))
+
+    def test_add_bookings(self):
+        '''
+        Test that several bookings are added at once and the others refused
+        '''
+        print '(' + self.test_add_bookings.__name__ + ')', \
+            self.test_add_bookings.__doc__
+        first = dict(NEW_BOOKING, roomname=ROOMNAME2, bookingTime='2030-02-01 10:00')
+        bookings = [first,
+                    # Overlaps the first one
+                    dict(first, bookingTime='2030-02-01 10:30'),
+                    # Same time in another room
+                    dict(first, roomname=ROOMNAME1),
+                    # Overlaps a booking of the database
+                    dict(BOOKING1, bookingTime='2017-03-01 12:59'),
+                    dict(first, roomname=WRONG_ROOMNAME),
+                    dict(first, username='nobody', bookingTime='2030-02-01 12:00'),
+                    {'roomname': ROOMNAME2},
+                    # Right after the first one
+                    dict(first, bookingTime=datetime.datetime(2030, 2, 1, 11, 0))]
+        results = self.connection.add_bookings(bookings)
+        self.assertEquals(len(results), len(bookings))
+        added = [number for number, result in enumerate(results) if result is not None]
+        self.assertEquals(added, [0, 2, 7])
+        self.assertEquals([results[number][0] for number in added],
+                          range(INITIAL_SIZE_BOOKING + 1, INITIAL_SIZE_BOOKING + 4))
+        self.assertTupleEqual(results[7], (INITIAL_SIZE_BOOKING + 3, ROOMNAME2, first['username'],
+                                           bookings[7]['bookingTime']))
+        try:
+            for number in added:
+                booking = self.connection.get_booking(results[number][0])
+                self.assertEquals(booking['roomname'], bookings[number]['roomname'])
+                self.assertEquals(booking['bookingTime'],
+                                  database.format_booking_time(bookings[number]['bookingTime']))
+                self.assertEquals(booking['email'], first['email'])
+            # The new bookings conflict with later ones
+            self.assertIsNone(self.connection.add_booking(ROOMNAME1, NEW_BOOKING_USERNAME,
+                                                          '2030-02-01 10:15', NEW_BOOKING))
+            self.assertEquals(self.connection.add_bookings([]), [])
+        finally:
+            for number in added:
+                self.assertTrue(self.connection.delete_booking(results[number][0]))
+
     def test_add_booking_empty_dict(self):
         '''
         Test that I cannot add booking with empty dict
@@ -295,6 +468,27 @@ class BookingsDBAPITestCase(unittest.TestCase):
                 global INITIAL_SIZE_BOOKING
                 INITIAL_SIZE_BOOKING += 1
 
+    def test_modify_booking_conflict(self):
+        '''
+        Test that I cannot move a booking onto another booking of the room
+        '''
+        print '(' + self.test_modify_booking_conflict.__name__ + ')', \
+            self.test_modify_booking_conflict.__doc__
+        booking_dict = dict(MODIFY_BOOKING, bookingID=4)
+        # The start of booking 5, and starts during booking 5
+        for booking_time in ('2017-09-05 10:00', '2017-09-05 10:30', '2017-09-05 09:30'):
+            booking_dict['bookingTime'] = booking_time
+            booking = self.connection.modify_booking(4, 'Aspire', 'lam', booking_time, booking_dict)
+            self.assertIsNone(booking)
+        self.assertEquals(self.connection.get_booking(4)['bookingTime'], '2017-03-16 12:00')
+        self.assertEquals(self.connection.get_overlapping_bookings('Aspire', '2017-03-16 12:00'), [4])
+        # A booking may overlap its own old time
+        booking_dict['bookingTime'] = '2017-03-16 12:30'
+        self.assertIsNotNone(self.connection.modify_booking(4, 'Aspire', 'lam', '2017-03-16 12:30', booking_dict))
+        booking_dict['bookingTime'] = '2017-03-16 12:00'
+        self.assertIsNotNone(self.connection.modify_booking(4, 'Aspire', 'lam', '2017-03-16 12:00', booking_dict))
+        self.assertEquals(self.connection.get_booking(4)['bookingTime'], '2017-03-16 12:00')
+
     def test_modify_nonexisting_booking(self):
         '''
         Test that I cannot modify a non existing booking
@@ -0,0 +1,132 @@
+'''
+Stress testing of concurrent booking inserts of the database API. Every
+thread uses its own connection, as separate workers of the API would.
+'''
+import unittest, datetime, random, threading
+from reservation import database
+
+#Path to the database file, different from the deployment db
+#Please run setup script first to make sure test database is OK.
+DB_PATH = "database/test_tellus.db"
+
+ROOMNAME = 'Stage'
+USERNAMES = ['lam', 'onur', 'para']
+# Days without bookings in the data dump
+FIRST_TIME = datetime.datetime(2030, 1, 1, 8, 0)
+SAME_TIME = datetime.datetime(2030, 1, 2, 8, 0)
+BOOKING = {'firstname': 'Lam',
+           'lastname': 'Huynh',
+           'email': 'lam.huynh@ee.oulu.fi',
+           'contactnumber': '0411322922'}
+THREADS = 8
+ATTEMPTS = 40
+# Bookings start every 15 minutes, so most of them overlap
+STEP = 15
+SLOTS = 32
+
+
+class ConcurrencyDBAPITestCase(unittest.TestCase):
+    '''
+    Test cases for bookings added at the same time by several connections.
+    '''
+    #INITIATION METHODS
+    def setUp(self):
+        '''
+        Creates an Engine for each thread.
+        '''
+        # Each Engine stands for a process, the booking lists are read from
+        # the database every time
+        self.engines = [database.Engine(DB_PATH, booking_cache_size=0) for _ in xrange(THREADS)]
+        self.connection = self.engines[0].connect()
+
+    def tearDown(self):
+        '''
+        Close underlying connections.
+        '''
+        self.connection.close()
+        for engine in self.engines:
+            engine.dispose()
+
+    def _run_threads(self, attempt):
+        '''
+        Runs ``attempt(connection, thread_number, results)`` in every thread,
+        all of them released at the same time, and returns the results.
+        '''
+        results = []
+        errors = []
+        start = threading.Event()
+
+        def run(engine, number):
+            connection = engine.checkout()
+            try:
+                start.wait()
+                attempt(connection, number, results)
+            except Exception, e:
+                errors.append(e)
+            finally:
+                engine.checkin(connection)
+
+        threads = [threading.Thread(target=run, args=(engine, number))
+                   for number, engine in enumerate(self.engines)]
+        for thread in threads:
+            thread.start()
+        start.set()
+        for thread in threads:
+            thread.join()
+        self.assertEquals(errors, [])
+        return results
+
+    def _assert_no_overlap(self):
+        '''
+        Checks that no two bookings of the room are closer than a booking
+        duration and returns the ids of the bookings.
+        '''
+        bookings = self.connection.get_bookings(ROOMNAME, order='bookingTime')
+        starts = [booking.key[0] for booking in bookings]
+        for previous, following in zip(starts, starts[1:]):
+            self.assertGreaterEqual(following - previous, database.BOOKING_DURATION)
+        return set(booking['bookingID'] for booking in bookings)
+
+    def test_concurrent_same_booking(self):
+        '''
+        Test that only one of the connections booking the same slot succeeds
+        '''
+        print '('+self.test_concurrent_same_booking.__name__+')', \
+              self.test_concurrent_same_booking.__doc__
+        before = self._assert_no_overlap()
+
+        def attempt(connection, number, results):
+            results.append(connection.add_booking(ROOMNAME, USERNAMES[number % len(USERNAMES)],
+                                                  SAME_TIME, BOOKING))
+
+        results = self._run_threads(attempt)
+        added = [result for result in results if result is not None]
+        self.assertEquals(len(results), THREADS)
+        self.assertEquals(len(added), 1)
+        self.assertEquals(self._assert_no_overlap() - before, set([added[0][0]]))
+
+    def test_concurrent_overlapping_bookings(self):
+        '''
+        Test that bookings added at a high rate never overlap
+        '''
+        print '('+self.test_concurrent_overlapping_bookings.__name__+')', \
+              self.test_concurrent_overlapping_bookings.__doc__
+        before = self._assert_no_overlap()
+
+        def attempt(connection, number, results):
+            times = random.Random(number)
+            for _ in xrange(ATTEMPTS):
+                booking_time = FIRST_TIME + datetime.timedelta(minutes=STEP * times.randrange(SLOTS))
+                results.append(connection.add_booking(ROOMNAME, USERNAMES[number % len(USERNAMES)],
+                                                      booking_time, BOOKING))
+
+        results = self._run_threads(attempt)
+        added = set(result[0] for result in results if result is not None)
+        self.assertEquals(len(results), THREADS * ATTEMPTS)
+        self.assertTrue(added)
+        # Every added booking, and only those, is in the database
+        self.assertEquals(self._assert_no_overlap() - before, added)
+
+if __name__ == '__main__':
+    print 'Start running tests'
+    unittest.main()
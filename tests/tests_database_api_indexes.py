@@ -0,0 +1,253 @@
+'''
+Database interface testing for the indexes of the Tellus database.
+
+Every statement with a WHERE clause executed by a Connection method must be
+answered with an index (a SEARCH in the query plan), never with a full table
+scan (a SCAN). Pages of bookings must be read in index order, without sorting.
+'''
+import unittest, sqlite3
+from reservation import database
+
+#Path to the database file, different from the deployment db
+#Please run setup script first to make sure test database is OK.
+DB_PATH = "database/test_tellus.db"
+ENGINE = database.Engine(DB_PATH)
+
+BOOKING = {'firstname': 'Lam',
+           'lastname': 'Huynh',
+           'email': 'lam.huynh@ee.oulu.fi',
+           'contactnumber': '0411322922'}
+MODIFY_BOOKING = {'bookingID': 4,
+                  'roomname': 'Aspire',
+                  'username': 'lam',
+                  'bookingTime': '2017-03-16 13:00',
+                  'firstname': 'Lam',
+                  'lastname': 'Huynh',
+                  'email': 'lam.huynh@ee.oulu.fi',
+                  'contactnumber': '0411322922'}
+ROOM = {'picture': 'chill.jpg', 'resources': 'TV, Bean Bags'}
+# Lookups done by SQLite for ON DELETE CASCADE of Users and Rooms
+CASCADE_QUERIES = [('SELECT * FROM Bookings WHERE username = ?', ('lam',)),
+                   ('SELECT * FROM Bookings WHERE roomName = ?', ('Chill',))]
+INDEXES = ['idx_bookings_room_start', 'idx_bookings_user_start', 'idx_bookings_start']
+
+
+class RecordingCursor(object):
+    '''
+    Cursor wrapper which records the executed statements.
+    '''
+    def __init__(self, cursor, statements):
+        self._cursor = cursor
+        self._statements = statements
+
+    def execute(self, sql, parameters=()):
+        self._statements.append((sql, tuple(parameters)))
+        return self._cursor.execute(sql, parameters)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class RecordingConnection(object):
+    '''
+    sqlite3 connection wrapper which records the executed statements.
+    '''
+    def __init__(self, con):
+        self._con = con
+        self.statements = []
+
+    def cursor(self):
+        return RecordingCursor(self._con.cursor(), self.statements)
+
+    def __getattr__(self, name):
+        return getattr(self._con, name)
+
+    def __setattr__(self, name, value):
+        # Settings such as isolation_level belong to the connection
+        if name in ('_con', 'statements'):
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self._con, name, value)
+
+
+class IndexesDBAPITestCase(unittest.TestCase):
+    '''
+    Test cases for the query plans of the database API.
+    '''
+    #INITIATION METHODS
+    def setUp(self):
+        '''
+        Creates a Connection whose statements are recorded.
+        '''
+        self.connection = ENGINE.connect()
+        self.con = self.connection.con
+        self.recorder = RecordingConnection(self.con)
+        self.connection.con = self.recorder
+
+    def tearDown(self):
+        '''
+        Close underlying connection.
+        '''
+        self.connection.con = self.con
+        self.connection.close()
+
+    def _query_plan(self, sql, parameters):
+        '''
+        Returns the details of the query plan of a statement. A new
+        connection is used, EXPLAIN statements cached by an old one do not
+        notice schema changes.
+        '''
+        con = sqlite3.connect(DB_PATH)
+        try:
+            cur = con.cursor()
+            cur.execute('EXPLAIN QUERY PLAN ' + sql, parameters)
+            return [row[-1] for row in cur.fetchall()]
+        finally:
+            con.close()
+
+    def _assert_uses_index(self, sql, parameters):
+        '''
+        Checks that the query plan searches an index and never scans a table.
+        '''
+        details = self._query_plan(sql, parameters)
+        self.assertTrue([detail for detail in details if 'SEARCH' in detail], sql)
+        for detail in details:
+            # The row of values of an INSERT ... SELECT is not a table
+            if detail == 'SCAN CONSTANT ROW':
+                continue
+            self.assertNotIn('SCAN', detail, '%s: %s' % (sql, detail))
+
+    def test_indexes_created(self):
+        '''
+        Checks that the indexes of Bookings exist and the schema is up to date
+        '''
+        print '('+self.test_indexes_created.__name__+')', \
+              self.test_indexes_created.__doc__
+        cur = self.con.cursor()
+        cur.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'Bookings'")
+        names = [row[0] for row in cur.fetchall()]
+        for index in INDEXES:
+            self.assertIn(index, names)
+        cur.execute('PRAGMA user_version')
+        self.assertEquals(cur.fetchone()[0], database.SCHEMA_VERSION)
+
+    def test_connection_queries_use_index(self):
+        '''
+        Checks the query plan of every filtered statement run by Connection
+        '''
+        print '('+self.test_connection_queries_use_index.__name__+')', \
+              self.test_connection_queries_use_index.__doc__
+        self.connection.get_bookings('Aspire')
+        self.connection.get_bookings(username='lam', order='bookingTime')
+        self.connection.get_bookings(before='2017-04-01 00:00', after='2017-03-01 00:00')
+        self.connection.get_user('lam')
+        self.connection.get_room('Chill')
+        self.connection.get_booking(2, roomname='Chill', username='para')
+        self.connection.add_user('lam', {})
+        self.connection.modify_room('Chill', ROOM)
+        booking = self.connection.add_booking('Chill', 'lam', '2017-05-05 10:00', BOOKING)
+        self.connection.modify_booking(4, 'Aspire', 'lam', '2017-03-16 13:00', MODIFY_BOOKING)
+        self.connection.delete_booking(booking[0], 'Chill', 'lam', '2017-05-05 10:00')
+        self.connection.delete_user('nobody')
+        filtered = [(sql, parameters) for sql, parameters in self.recorder.statements
+                    if 'WHERE' in sql.upper()]
+        self.assertGreaterEqual(len(filtered), 13)
+        for sql, parameters in filtered + CASCADE_QUERIES:
+            self._assert_uses_index(sql, parameters)
+
+    def test_pages_use_index(self):
+        '''
+        Checks that pages of bookings are read from an index without sorting
+        '''
+        print '('+self.test_pages_use_index.__name__+')', \
+              self.test_pages_use_index.__doc__
+        # Key of the booking 1, 2017-03-01 12:00
+        start = (24806160, 1)
+        self.connection.get_bookings(order='bookingTime', limit=10)
+        self.connection.get_bookings(order='bookingTime', start=start, limit=10)
+        self.connection.get_bookings('Stage', order='bookingTime', start=start, limit=10)
+        self.connection.get_bookings(username='onur', order='bookingTime', start=start, limit=10)
+        self.connection.get_bookings(before='2017-04-01 00:00', order='-bookingTime',
+                                     start=start, limit=10)
+        self.assertEquals(len(self.recorder.statements), 5)
+        for sql, parameters in self.recorder.statements:
+            details = self._query_plan(sql, parameters)
+            self.assertIn('USING INDEX', ' '.join(details), sql)
+            for detail in details:
+                self.assertNotIn('TEMP B-TREE', detail, '%s: %s' % (sql, detail))
+
+    def test_migration(self):
+        '''
+        Checks that the migration creates the indexes and the starts in an old database
+        '''
+        print '('+self.test_migration.__name__+')', \
+              self.test_migration.__doc__
+        cur = self.con.cursor()
+        for index in INDEXES:
+            cur.execute('DROP INDEX ' + index)
+        cur.execute('UPDATE Bookings SET bookingStart = NULL')
+        cur.execute('PRAGMA user_version = 0')
+        self.con.commit()
+        self.assertIn('SCAN', ' '.join(self._query_plan(*CASCADE_QUERIES[0])))
+        self.assertEquals(ENGINE.migrate(), [migration[0] for migration in database.MIGRATIONS])
+        self._assert_uses_index(*CASCADE_QUERIES[0])
+        # Start of the booking 1, 2017-03-01 12:00
+        cur.execute('SELECT bookingStart FROM Bookings WHERE bookingID = 1')
+        self.assertEquals(cur.fetchone()[0], 24806160)
+        cur.execute('SELECT COUNT(*) FROM Bookings WHERE bookingStart IS NULL')
+        self.assertEquals(cur.fetchone()[0], 0)
+        # Nothing left to apply
+        self.assertEquals(ENGINE.migrate(), [])
+
+    def test_migration_duplicate_bookings(self):
+        '''
+        Checks that the unique starts migration reports the bookings of a room at the same time
+        '''
+        print '('+self.test_migration_duplicate_bookings.__name__+')', \
+              self.test_migration_duplicate_bookings.__doc__
+        cur = self.con.cursor()
+        # Schema of version 3, where two users could book a room at the same time
+        cur.execute('DROP INDEX idx_bookings_room_start')
+        cur.execute('CREATE INDEX idx_bookings_room_start ON Bookings (roomName, bookingStart)')
+        for booking_id, username in ((100, 'lam'), (101, 'para')):
+            cur.execute("INSERT INTO Bookings (bookingID, roomName, username, bookingTime, bookingStart) "
+                        "VALUES (?, 'Aspire', ?, '2018-01-01 10:00', 25246680)", (booking_id, username))
+        cur.execute('PRAGMA user_version = 3')
+        self.con.commit()
+        with self.assertRaises(sqlite3.IntegrityError) as context:
+            ENGINE.migrate()
+        self.assertIn('Aspire at 2018-01-01 10:00: bookings 100, 101', str(context.exception))
+        # The failed migration is rolled back
+        cur.execute('PRAGMA user_version')
+        self.assertEquals(cur.fetchone()[0], 3)
+        cur.execute('DELETE FROM Bookings WHERE bookingID IN (100, 101)')
+        self.con.commit()
+        self.assertEquals(ENGINE.migrate(), [4])
+
+    def test_schema_version_checked(self):
+        '''
+        Checks that an Engine refuses an old database unless it migrates it
+        '''
+        print '('+self.test_schema_version_checked.__name__+')', \
+              self.test_schema_version_checked.__doc__
+        cur = self.con.cursor()
+        cur.execute('PRAGMA user_version = %d' % (database.SCHEMA_VERSION - 1))
+        self.con.commit()
+        with self.assertRaises(ValueError):
+            database.Engine(DB_PATH)
+        database.Engine(DB_PATH, auto_migrate=True)
+        cur.execute('PRAGMA user_version')
+        self.assertEquals(cur.fetchone()[0], database.SCHEMA_VERSION)
+        # A newer schema is never migrated
+        cur.execute('PRAGMA user_version = %d' % (database.SCHEMA_VERSION + 1))
+        self.con.commit()
+        try:
+            with self.assertRaises(ValueError):
+                database.Engine(DB_PATH, auto_migrate=True)
+        finally:
+            cur.execute('PRAGMA user_version = %d' % database.SCHEMA_VERSION)
+            self.con.commit()
+
+if __name__ == '__main__':
+    print 'Start running tests'
+    unittest.main()
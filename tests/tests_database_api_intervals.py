@@ -0,0 +1,141 @@
+'''
+Database interface testing for the in-memory index of the booked intervals of
+the rooms.
+'''
+import unittest, datetime
+from reservation import database
+
+#Path to the database file, different from the deployment db
+#Please run setup script first to make sure test database is OK.
+DB_PATH = "database/test_tellus.db"
+
+ROOMNAME = 'Aspire'
+USERNAME = 'lam'
+# Booking 4 of the data dump, Aspire 2017-03-16 12:00
+BOOKING_ID = 4
+BOOKING_TIME = datetime.datetime(2017, 3, 16, 12, 0)
+BOOKING = {'firstname': 'Lam',
+           'lastname': 'Huynh',
+           'email': 'lam.huynh@ee.oulu.fi',
+           'contactnumber': '0411322922'}
+
+
+class IntervalsDBAPITestCase(unittest.TestCase):
+    '''
+    Test cases for the booked intervals of the database API.
+    '''
+    #INITIATION METHODS
+    def setUp(self):
+        '''
+        Creates an Engine, so every test starts with an empty index.
+        '''
+        self.engine = database.Engine(DB_PATH)
+        self.connection = self.engine.connect()
+
+    def tearDown(self):
+        '''
+        Close underlying connection.
+        '''
+        self.connection.close()
+        self.engine.dispose()
+
+    def _overlapping(self, booking_time):
+        '''
+        Returns the bookings of the room which overlap a booking at
+        booking_time.
+        '''
+        return self.connection.get_overlapping_bookings(ROOMNAME, booking_time)
+
+    def test_overlapping_bookings(self):
+        '''
+        Test that bookings closer than a booking duration overlap
+        '''
+        print '('+self.test_overlapping_bookings.__name__+')', \
+              self.test_overlapping_bookings.__doc__
+        duration = datetime.timedelta(minutes=database.BOOKING_DURATION)
+        minute = datetime.timedelta(minutes=1)
+        self.assertEquals(self._overlapping(BOOKING_TIME), [BOOKING_ID])
+        self.assertEquals(self._overlapping('2017-03-16 12:00'), [BOOKING_ID])
+        self.assertEquals(self._overlapping(BOOKING_TIME - duration + minute), [BOOKING_ID])
+        self.assertEquals(self._overlapping(BOOKING_TIME + duration - minute), [BOOKING_ID])
+        self.assertEquals(self._overlapping(BOOKING_TIME - duration), [])
+        self.assertEquals(self._overlapping(BOOKING_TIME + duration), [])
+        # Other rooms are not affected
+        self.assertEquals(self.connection.get_overlapping_bookings('Stage', BOOKING_TIME), [])
+        self.assertRaises(ValueError, self._overlapping, '2017-03-16')
+
+    def test_index_is_updated(self):
+        '''
+        Test that added, modified and deleted bookings are seen by the index
+        '''
+        print '('+self.test_index_is_updated.__name__+')', \
+              self.test_index_is_updated.__doc__
+        booking_time = datetime.datetime(2017, 8, 1, 9, 0)
+        later = booking_time + datetime.timedelta(hours=3)
+        # Load the room first
+        self.assertEquals(self._overlapping(booking_time), [])
+        booking = self.connection.add_booking(ROOMNAME, USERNAME, booking_time, BOOKING)
+        self.assertIsNotNone(booking)
+        booking_id = booking[0]
+        # Seen by another connection of the Engine
+        other = self.engine.checkout()
+        self.assertEquals(other.get_overlapping_bookings(ROOMNAME, booking_time), [booking_id])
+        self.engine.checkin(other)
+
+        modify = dict(BOOKING, bookingID=booking_id, roomname=ROOMNAME,
+                      username=USERNAME, bookingTime=later)
+        self.assertIsNotNone(self.connection.modify_booking(booking_id, ROOMNAME, USERNAME,
+                                                            later, modify))
+        self.assertEquals(self._overlapping(booking_time), [])
+        self.assertEquals(self._overlapping(later), [booking_id])
+
+        self.assertTrue(self.connection.delete_booking(booking_id))
+        self.assertEquals(self._overlapping(later), [])
+
+    def test_index_loaded_lazily(self):
+        '''
+        Test that a room is read from the database only when it is queried
+        '''
+        print '('+self.test_index_loaded_lazily.__name__+')', \
+              self.test_index_loaded_lazily.__doc__
+        intervals = self.engine.intervals
+        self.assertNotIn(ROOMNAME, intervals._rooms)
+        self._overlapping(BOOKING_TIME)
+        self.assertIn(ROOMNAME, intervals._rooms)
+        self.assertNotIn('Stage', intervals._rooms)
+        # Cascaded deletes of a user make the index read the rooms again
+        self.connection.add_user('intervaluser', {})
+        self.assertTrue(self.connection.delete_user('intervaluser'))
+        self.assertNotIn(ROOMNAME, intervals._rooms)
+        self.assertEquals(self._overlapping(BOOKING_TIME), [BOOKING_ID])
+
+    def test_stale_index(self):
+        '''
+        Test that bookings deleted or moved by another Engine are not reported
+        '''
+        print '('+self.test_stale_index.__name__+')', \
+              self.test_stale_index.__doc__
+        booking_time = datetime.datetime(2017, 8, 2, 9, 0)
+        booking = self.connection.add_booking(ROOMNAME, USERNAME, booking_time, BOOKING)
+        moved = self.connection.add_booking(ROOMNAME, USERNAME, booking_time + datetime.timedelta(days=1), BOOKING)
+        self.assertEquals(self._overlapping(booking_time), [booking[0]])
+        # Another process changes the bookings
+        engine = database.Engine(DB_PATH)
+        other = engine.connect()
+        self.assertTrue(other.delete_booking(booking[0]))
+        later = booking_time + datetime.timedelta(days=2)
+        self.assertIsNotNone(other.modify_booking(moved[0], ROOMNAME, USERNAME, later,
+                                                  dict(BOOKING, bookingID=moved[0], roomname=ROOMNAME,
+                                                       username=USERNAME, bookingTime=later)))
+        other.close()
+        engine.dispose()
+        self.assertEquals(self._overlapping(booking_time), [])
+        self.assertEquals(self._overlapping(moved[3]), [])
+        # Dropped from the index
+        self.assertNotIn(booking[0], self.engine.intervals._bookings)
+        self.assertNotIn(moved[0], self.engine.intervals._bookings)
+        self.assertTrue(self.connection.delete_booking(moved[0]))
+
+if __name__ == '__main__':
+    print 'Start running tests'
+    unittest.main()
@@ -0,0 +1,122 @@
+'''
+Database interface testing for the connection pool of the Engine.
+'''
+import unittest, sqlite3, threading, time
+from reservation import database
+
+#Path to the database file, different from the deployment db
+#Please run setup script first to make sure test database is OK.
+DB_PATH = "database/test_tellus.db"
+
+NEW_USER = "pooluser"
+
+
+class PoolDBAPITestCase(unittest.TestCase):
+    '''
+    Test cases for the connection pool of the database API.
+    '''
+    #INITIATION METHODS
+    def setUp(self):
+        '''
+        Creates an Engine with a small pool.
+        '''
+        self.engine = database.Engine(DB_PATH, pool_size=2, pool_timeout=0.1)
+
+    def tearDown(self):
+        '''
+        Close pooled connections.
+        '''
+        self.engine.dispose()
+
+    def test_checkout_reuses_connection(self):
+        '''
+        Test that a connection given back is handed out again
+        '''
+        print '('+self.test_checkout_reuses_connection.__name__+')', \
+              self.test_checkout_reuses_connection.__doc__
+        con1 = self.engine.checkout()
+        self.engine.checkin(con1)
+        con2 = self.engine.checkout()
+        self.assertIs(con1, con2)
+        self.engine.checkin(con2)
+        stats = self.engine.pool_stats()
+        self.assertEquals(stats['created'], 1)
+        self.assertEquals(stats['checkouts'], 2)
+        self.assertEquals(stats['checkins'], 2)
+        self.assertEquals(stats['idle'], 1)
+        self.assertEquals(stats['in_use'], 0)
+
+    def test_checkout_exhausted_pool(self):
+        '''
+        Test that checkout fails when all connections are in use
+        '''
+        print '('+self.test_checkout_exhausted_pool.__name__+')', \
+              self.test_checkout_exhausted_pool.__doc__
+        con1 = self.engine.checkout()
+        con2 = self.engine.checkout()
+        self.assertIsNot(con1, con2)
+        self.assertRaises(sqlite3.OperationalError, self.engine.checkout)
+        stats = self.engine.pool_stats()
+        self.assertEquals(stats['in_use'], 2)
+        self.assertEquals(stats['timeouts'], 1)
+        self.engine.checkin(con1)
+        self.engine.checkin(con2)
+
+    def test_checkout_waits_for_checkin(self):
+        '''
+        Test that checkout waits until another thread gives back a connection
+        '''
+        print '('+self.test_checkout_waits_for_checkin.__name__+')', \
+              self.test_checkout_waits_for_checkin.__doc__
+        engine = database.Engine(DB_PATH, pool_size=1, pool_timeout=5)
+        con1 = engine.checkout()
+        timer = threading.Timer(0.05, engine.checkin, (con1,))
+        timer.start()
+        con2 = engine.checkout()
+        timer.join()
+        self.assertIs(con1, con2)
+        # Connection is usable from this thread
+        self.assertTrue(con2.get_rooms())
+        engine.checkin(con2)
+        self.assertGreaterEqual(engine.pool_stats()['waits'], 1)
+        engine.dispose()
+
+    def test_idle_connection_recycled(self):
+        '''
+        Test that connections idle for too long are replaced
+        '''
+        print '('+self.test_idle_connection_recycled.__name__+')', \
+              self.test_idle_connection_recycled.__doc__
+        engine = database.Engine(DB_PATH, pool_recycle=0)
+        con1 = engine.checkout()
+        engine.checkin(con1)
+        # Any idle time is more than 0 seconds
+        time.sleep(0.01)
+        con2 = engine.checkout()
+        self.assertIsNot(con1, con2)
+        self.assertIsNone(con1.con)
+        engine.checkin(con2)
+        stats = engine.pool_stats()
+        self.assertEquals(stats['recycled'], 1)
+        self.assertEquals(stats['created'], 2)
+        engine.dispose()
+
+    def test_checkin_commits(self):
+        '''
+        Test that changes made with a borrowed connection are commited
+        '''
+        print '('+self.test_checkin_commits.__name__+')', \
+              self.test_checkin_commits.__doc__
+        con = self.engine.checkout()
+        con.con.execute("INSERT INTO Users(isAdmin, username) VALUES(0, ?)", (NEW_USER,))
+        self.engine.checkin(con)
+        # Check with a connection outside of the pool
+        connection = self.engine.connect()
+        users = [user for user in connection.get_users() if user['username'] == NEW_USER]
+        self.assertEquals(len(users), 1)
+        self.assertTrue(connection.delete_user(NEW_USER))
+        connection.close()
+
+if __name__ == '__main__':
+    print 'Start running tests'
+    unittest.main()
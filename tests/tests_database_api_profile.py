@@ -0,0 +1,78 @@
+'''
+Database interface testing for the connection tuning profiles of the Engine.
+'''
+import unittest
+from reservation import database
+
+#Path to the database file, different from the deployment db
+#Please run setup script first to make sure test database is OK.
+DB_PATH = "database/test_tellus.db"
+
+# Values returned by SQLite for the settings of the fast profile
+FAST_SETTINGS = {'synchronous': 1,
+                 'cache_size': -16000,
+                 'temp_store': 2,
+                 'busy_timeout': 5000,
+                 'foreign_keys': True}
+CUSTOM_PROFILE = {'cache_size': 500,
+                  'foreign_keys': False}
+
+
+class ProfileDBAPITestCase(unittest.TestCase):
+    '''
+    Test cases for the tuning profiles of the database API.
+    '''
+
+    def test_default_profile(self):
+        '''
+        Test that the default profile activates foreign keys once for all queries
+        '''
+        print '('+self.test_default_profile.__name__+')', \
+              self.test_default_profile.__doc__
+        connection = database.Engine(DB_PATH).connect()
+        self.assertTrue(connection.check_foreign_keys_status())
+        # Queries do not need to activate them again
+        connection.get_bookings()
+        connection.get_rooms()
+        self.assertTrue(connection.check_foreign_keys_status())
+        settings = connection.get_settings()
+        self.assertEquals(settings['synchronous'], 2)
+        self.assertEquals(settings['busy_timeout'], 5000)
+        connection.close()
+
+    def test_fast_profile(self):
+        '''
+        Test that the fast profile is applied to pooled connections
+        '''
+        print '('+self.test_fast_profile.__name__+')', \
+              self.test_fast_profile.__doc__
+        engine = database.Engine(DB_PATH, profile='fast')
+        settings = engine.get_settings()
+        self.assertEquals(settings['profile'], 'fast')
+        self.assertDictContainsSubset(FAST_SETTINGS, settings)
+        engine.dispose()
+
+    def test_custom_profile(self):
+        '''
+        Test that a dictionary can be given as profile
+        '''
+        print '('+self.test_custom_profile.__name__+')', \
+              self.test_custom_profile.__doc__
+        engine = database.Engine(DB_PATH, profile=CUSTOM_PROFILE)
+        settings = engine.get_settings()
+        self.assertEquals(settings['profile'], 'custom')
+        self.assertEquals(settings['cache_size'], 500)
+        self.assertFalse(settings['foreign_keys'])
+        engine.dispose()
+
+    def test_unknown_profile(self):
+        '''
+        Test that an unknown profile name is refused
+        '''
+        print '('+self.test_unknown_profile.__name__+')', \
+              self.test_unknown_profile.__doc__
+        self.assertRaises(KeyError, database.Engine, DB_PATH, profile='turbo')
+
+if __name__ == '__main__':
+    print 'Start running tests'
+    unittest.main()
@@ -0,0 +1,108 @@
+'''
+Database interface testing for the query profiler of the connections.
+'''
+import unittest, logging
+from reservation import database
+
+#Path to the database file, different from the deployment db
+#Please run setup script first to make sure test database is OK.
+DB_PATH = "database/test_tellus.db"
+
+ROOMNAME = 'Aspire'
+BOOKINGS_OF_ROOM = 3
+
+
+class RecordingHandler(logging.Handler):
+    '''
+    Logging handler which keeps the messages.
+    '''
+    def __init__(self):
+        logging.Handler.__init__(self)
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+class ProfilerDBAPITestCase(unittest.TestCase):
+    '''
+    Test cases for the statements recorded by the query profiler.
+    '''
+    #INITIATION METHODS
+    def setUp(self):
+        '''
+        Creates an Engine with a profiler which logs to a recording handler.
+        '''
+        self.handler = RecordingHandler()
+        self.logger = logging.getLogger("tests.profiler")
+        self.logger.propagate = False
+        self.logger.addHandler(self.handler)
+        self.profiler = database.QueryProfiler(max_statements=3, max_repeats=1, logger=self.logger)
+        self.engine = database.Engine(DB_PATH, profiler=self.profiler)
+        self.connection = self.engine.connect()
+
+    def tearDown(self):
+        '''
+        Close underlying connection.
+        '''
+        self.connection.close()
+        self.engine.dispose()
+        self.logger.removeHandler(self.handler)
+
+    def test_record_statements(self):
+        '''
+        Test that statements are recorded with their parameters and time
+        '''
+        print '('+self.test_record_statements.__name__+')', \
+              self.test_record_statements.__doc__
+        # Not recorded outside of a unit of work
+        self.connection.get_rooms()
+        self.assertEquals(self.profiler.finish(), [])
+        self.profiler.start()
+        self.assertEquals(len(self.connection.get_bookings(ROOMNAME)), BOOKINGS_OF_ROOM)
+        self.assertEquals(self.connection.con.execute('SELECT COUNT(*) FROM Rooms').fetchone()[0], 3)
+        statements = self.profiler.finish("test")
+        self.assertEquals(len(statements), 2)
+        self.assertIn('FROM Bookings', statements[0].sql)
+        self.assertEquals(list(statements[0].parameters), [ROOMNAME])
+        self.assertEquals(statements[1].parameters, ())
+        for statement in statements:
+            self.assertTrue(statement.seconds > 0)
+        self.assertEquals(self.handler.messages, [])
+
+    def test_slow_query(self):
+        '''
+        Test that slow queries are logged with their query plan
+        '''
+        print '('+self.test_slow_query.__name__+')', \
+              self.test_slow_query.__doc__
+        self.profiler.slow_query = 0
+        self.profiler.start()
+        self.connection.get_booking(1)
+        self.profiler.finish("test")
+        self.assertEquals(len(self.handler.messages), 1)
+        message = self.handler.messages[0]
+        self.assertTrue(message.startswith('test: slow query'))
+        self.assertIn('QUERY PLAN SEARCH Bookings', message)
+
+    def test_repeated_statements(self):
+        '''
+        Test that too many, repeated and looped statements are logged
+        '''
+        print '('+self.test_repeated_statements.__name__+')', \
+              self.test_repeated_statements.__doc__
+        self.profiler.start()
+        self.connection.get_booking(1)
+        self.connection.get_booking(1)
+        self.connection.get_booking(2)
+        self.connection.get_bookings(ROOMNAME)
+        self.assertEquals(len(self.profiler.finish("GET /bookings/")), 4)
+        messages = sorted(self.handler.messages)
+        self.assertEquals(len(messages), 3)
+        self.assertTrue(messages[0].startswith('GET /bookings/: ran 4 statements'))
+        self.assertTrue(messages[1].startswith('GET /bookings/: ran the same query 3 times'))
+        self.assertTrue(messages[2].startswith('GET /bookings/: ran the same statement 2 times'))
+
+if __name__ == '__main__':
+    print 'Start running tests'
+    unittest.main()
@@ -0,0 +1,183 @@
+'''
+Database interface testing for the replica of the Users and Rooms tables.
+'''
+import unittest, threading
+from reservation import database
+
+#Path to the database file, different from the deployment db
+#Please run setup script first to make sure test database is OK.
+DB_PATH = "database/test_tellus.db"
+
+NEW_USER = "replicauser"
+NEW_USER_DICT = {'isAdmin': 1, 'firstname': 'Rep', 'lastname': 'Lica',
+                 'email': 'rep@example.com', 'contactNumber': 1234}
+ROOMNAME = 'Chill'
+THREADS = 4
+USERS_PER_THREAD = 10
+
+
+class ChangingCursor(object):
+    '''
+    Cursor wrapper which makes a change before executing a statement.
+    '''
+    def __init__(self, cursor, change):
+        self._cursor = cursor
+        self._change = change
+
+    def execute(self, sql, parameters=()):
+        self._change()
+        return self._cursor.execute(sql, parameters)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class ChangingConnection(object):
+    '''
+    Stand-in of a Connection whose statements are run after a change.
+    '''
+    def __init__(self, con, change):
+        self.con = self
+        self._con = con
+        self._change = change
+
+    def cursor(self):
+        return ChangingCursor(self._con.cursor(), self._change)
+
+
+class ReplicaDBAPITestCase(unittest.TestCase):
+    '''
+    Test cases for the lookups and updates of the replica.
+    '''
+    #INITIATION METHODS
+    def setUp(self):
+        '''
+        Creates an Engine whose statements are recorded.
+        '''
+        self.profiler = database.QueryProfiler()
+        self.engine = database.Engine(DB_PATH, profiler=self.profiler)
+        self.connection = self.engine.connect()
+
+    def tearDown(self):
+        '''
+        Close underlying connection.
+        '''
+        self.connection.close()
+        self.engine.dispose()
+
+    def _sql_users(self):
+        '''
+        Reads Users with SQL, in order of userID.
+        '''
+        cur = self.connection.con.execute('SELECT ' + database.UserRecord.COLUMNS +
+                                          ' FROM Users ORDER BY userID')
+        return [database.UserRecord(tuple(row)) for row in cur.fetchall()]
+
+    def test_lookups_without_sql(self):
+        '''
+        Test that the tables are read once and lookups run no SQL
+        '''
+        print '('+self.test_lookups_without_sql.__name__+')', \
+              self.test_lookups_without_sql.__doc__
+        self.profiler.start()
+        self.assertEquals(self.connection.get_user('lam')['username'], 'lam')
+        self.assertEquals(self.connection.get_room(ROOMNAME)['roomname'], ROOMNAME)
+        self.assertEquals(len(self.profiler.finish()), 2)
+        # Other connections of the Engine share the replica
+        other = self.engine.connect()
+        self.profiler.start()
+        self.assertEquals(self.connection.get_user(u'para')['firstname'], 'Paramartha')
+        self.assertIsNone(self.connection.get_user('nobody'))
+        self.assertIsNone(self.connection.get_room('Nowhere'))
+        self.assertEquals(len(self.connection.get_users()), 3)
+        self.assertEquals(len(self.connection.get_rooms()), 3)
+        self.assertTrue(other.get_room('Stage'))
+        self.assertEquals(self.profiler.finish(), [])
+        other.close()
+        self.assertEquals(self.connection.get_users(), self._sql_users())
+
+    def test_changes_are_replicated(self):
+        '''
+        Test that added and deleted users and modified rooms are seen
+        '''
+        print '('+self.test_changes_are_replicated.__name__+')', \
+              self.test_changes_are_replicated.__doc__
+        other = self.engine.connect()
+        room = other.get_room(ROOMNAME)
+        self.assertIsNone(other.get_user(NEW_USER))
+        self.assertEquals(self.connection.add_user(NEW_USER, NEW_USER_DICT), NEW_USER)
+        user = other.get_user(NEW_USER)
+        # Values as SQLite stored them
+        self.assertEquals(user['contactnumber'], u'1234')
+        self.assertEquals(user['isAdmin'], '1')
+        self.assertEquals(other.get_users(), self._sql_users())
+        self.assertTrue(self.connection.delete_user(NEW_USER))
+        self.assertIsNone(other.get_user(NEW_USER))
+        self.assertEquals(other.get_users(), self._sql_users())
+        resources = room['resources'] + ', Replica'
+        self.assertEquals(self.connection.modify_room(ROOMNAME, {'picture': room['picture'],
+                                                                 'resources': resources}), ROOMNAME)
+        self.assertEquals(other.get_room(ROOMNAME)['resources'], resources)
+        self.assertEquals([item['roomname'] for item in other.get_rooms()],
+                          ['Stage', 'Aspire', 'Chill'])
+        self.connection.modify_room(ROOMNAME, {'picture': room['picture'],
+                                               'resources': room['resources']})
+        other.close()
+
+    def test_load_during_change(self):
+        '''
+        Test that a table read before a change is not kept
+        '''
+        print '('+self.test_load_during_change.__name__+')', \
+              self.test_load_during_change.__doc__
+        replica = self.connection.replica
+        # The table changes while it is read
+        changing = ChangingConnection(self.connection.con, lambda: replica.remove('Users', 'nobody'))
+        self.assertTrue(replica.get(changing, 'Users', 'lam'))
+        self.profiler.start()
+        self.assertTrue(self.connection.get_user('lam'))
+        # Read again, then kept
+        self.assertEquals(len(self.profiler.finish()), 1)
+        self.profiler.start()
+        self.assertTrue(self.connection.get_user('para'))
+        self.assertEquals(self.profiler.finish(), [])
+
+    def test_threads(self):
+        '''
+        Test that concurrent changes leave the replica equal to the table
+        '''
+        print '('+self.test_threads.__name__+')', \
+              self.test_threads.__doc__
+        # Loaded before the threads start
+        self.connection.get_users()
+        errors = []
+
+        def work(number):
+            connection = self.engine.connect()
+            try:
+                for index in xrange(USERS_PER_THREAD):
+                    username = '%s%d_%d' % (NEW_USER, number, index)
+                    connection.add_user(username, {})
+                    if not connection.get_user(username):
+                        errors.append(username)
+                    if index % 2:
+                        connection.delete_user(username)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=work, args=(number,)) for number in xrange(THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEquals(errors, [])
+        self.assertEquals(self.connection.get_users(), self._sql_users())
+        self.assertEquals(len(self.connection.get_users()), 3 + THREADS * USERS_PER_THREAD / 2)
+        for user in self.connection.get_users():
+            if user['username'].startswith(NEW_USER):
+                self.assertTrue(self.connection.delete_user(user['username']))
+        self.assertEquals(len(self.connection.get_users()), 3)
+
+if __name__ == '__main__':
+    print 'Start running tests'
+    unittest.main()
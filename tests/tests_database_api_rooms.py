@@ -91,31 +91,36 @@ class RoomsDBAPITestCase(unittest.TestCase):
             #Assert
             self.assertEquals(len(rooms), INITIAL_ROOMS_SIZE)
 
-    # Test _create_room_object method.
-    # test_create_room_object function makes use of codes from Forum exercise
-    def test_create_room_object(self):
+    # Test RoomRecord.
+    # test_create_room_record function makes use of codes from Forum exercise
+    def test_create_room_record(self):
         '''
-        Check that the method _create_room_object works properly and 
+        Check that the RoomRecord row factory works properly and 
         return adequate values for the first database row. 
         NOTE: Do not use Connection instance but call directly SQL.
         '''
-        print '('+self.test_create_room_object.__name__+')', \
-              self.test_create_room_object.__doc__
+        print '('+self.test_create_room_record.__name__+')', \
+              self.test_create_room_record.__doc__
         #Create the SQL Statement
-        query = 'SELECT * FROM Rooms'
+        query = 'SELECT ' + database.RoomRecord.COLUMNS + ' FROM Rooms'
         #Get the sqlite3 con from the Connection instance
         con = self.connection.con
         with con:
             #Cursor and row initialization
-            con.row_factory = sqlite3.Row
             cur = con.cursor()
+            cur.row_factory = database.RoomRecord.row_factory
             #Execute main SQL Statement
             cur.execute(query)
             #Extract the 1 row
-            row = cur.fetchone()
-        #Test the method _create_room_object
-        room = self.connection._create_room_object(row)
+            room = cur.fetchone()
+        #Test the record
+        self.assertIsInstance(room, database.RoomRecord)
+        self.assertEquals(len(room), 4)
         self.assertDictContainsSubset(room, ROOM1)
+        self.assertEquals(room, ROOM1)
+        self.assertEquals(room.copy(), ROOM1)
+        self.assertNotIn('roomID', room)
+        self.assertRaises(KeyError, lambda: room['roomID'])
 
     #TESTS FOR Rooms
     def test_get_rooms(self):
@@ -135,15 +140,35 @@ class RoomsDBAPITestCase(unittest.TestCase):
             elif room['roomname'] == ROOM_NAME_3:
                 self.assertDictContainsSubset(room, ROOM3)
 
+    def test_get_room(self):
+        '''
+        Test that get_room extracts the room "Chill"
+        '''
+        print '('+self.test_get_room.__name__+')', \
+              self.test_get_room.__doc__
+        room = self.connection.get_room(ROOM_NAME_3)
+        self.assertDictContainsSubset(room, ROOM3)
+
+    def test_get_room_with_no_existing_roomname(self):
+        '''
+        Test get_room with the non-existing room "Parempaa"
+        '''
+        print '('+self.test_get_room_with_no_existing_roomname.__name__+')', \
+              self.test_get_room_with_no_existing_roomname.__doc__
+        self.assertIsNone(self.connection.get_room(ROOM_WRONG_ROOMNAME))
+
     def test_modify_room(self):
         '''
         Test that Room #2 Aspire is modifed successful
         '''
         print '('+self.test_modify_room.__name__+')', \
               self.test_modify_room.__doc__
+        version = self.connection.versions.get('rooms')
         #Get the modified Room
         resp = self.connection.modify_room(ROOM_NAME_2, MODIFY_ROOM2)
         self.assertEquals(resp, ROOM_NAME_2)
+        #Check that the version of the rooms is increased
+        self.assertEquals(self.connection.versions.get('rooms'), version + 1)
         
         #Check that the room has been really modified
         rooms = self.connection.get_rooms()
@@ -164,9 +189,11 @@ class RoomsDBAPITestCase(unittest.TestCase):
         '''
         print '('+self.test_modify_room_with_no_existing_roomname.__name__+')', \
               self.test_modify_room_with_no_existing_roomname.__doc__
+        version = self.connection.versions.get('rooms')
         #Test with existing Room1
         resp = self.connection.modify_room(ROOM_WRONG_ROOMNAME, ROOM1)
         self.assertIsNone(resp)
+        self.assertEquals(self.connection.versions.get('rooms'), version)
 
 
 if __name__ == '__main__':
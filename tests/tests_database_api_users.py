@@ -115,6 +115,23 @@ class UserDBAPITestCase(unittest.TestCase):
             if user["username"] == GET_USERS_USERNAME:
                 self.assertDictContainsSubset(user, USER2)
     
+    def test_get_user(self):
+        '''
+        Test that get_user extracts the user "lam"
+        '''
+        print '('+self.test_get_user.__name__+')', \
+              self.test_get_user.__doc__
+        user = self.connection.get_user(GET_USERS_USERNAME)
+        self.assertDictContainsSubset(user, USER2)
+
+    def test_get_user_noexistingusername(self):
+        '''
+        Test get_user with the non-existing user "CrazyBoy95"
+        '''
+        print '('+self.test_get_user_noexistingusername.__name__+')', \
+              self.test_get_user_noexistingusername.__doc__
+        self.assertIsNone(self.connection.get_user(NOT_EXISTING_USER))
+
     def test_add_user(self):
         '''
         Test that I can add new user
@@ -0,0 +1,110 @@
+'''
+Database interface testing for the write-ahead log mode of the Engine.
+'''
+import unittest, sqlite3
+from reservation import database
+
+#Path to the database file, different from the deployment db
+#Please run setup script first to make sure test database is OK.
+DB_PATH = "database/test_tellus.db"
+
+NEW_USER = "waluser"
+INITIAL_SIZE_USER = 3
+
+
+class WalDBAPITestCase(unittest.TestCase):
+    '''
+    Test cases for the reader/writer split of the database API.
+    '''
+    #INITIATION METHODS
+    def setUp(self):
+        '''
+        Creates an Engine in WAL mode.
+        '''
+        self.engine = database.Engine(DB_PATH, wal=True, pool_timeout=0.1)
+
+    def tearDown(self):
+        '''
+        Close pooled connections, the last one removes the log.
+        '''
+        self.engine.dispose()
+
+    def test_wal_mode(self):
+        '''
+        Test that the database file is switched to WAL
+        '''
+        print '('+self.test_wal_mode.__name__+')', \
+              self.test_wal_mode.__doc__
+        settings = self.engine.get_settings()
+        self.assertEquals(settings['journal_mode'], 'wal')
+        self.assertEquals(settings['profile'], 'wal')
+        reader = self.engine.checkout(readonly=True)
+        self.assertEquals(reader.get_settings()['journal_mode'], 'wal')
+        self.engine.checkin(reader)
+
+    def test_reader_cannot_write(self):
+        '''
+        Test that read-only connections refuse writes
+        '''
+        print '('+self.test_reader_cannot_write.__name__+')', \
+              self.test_reader_cannot_write.__doc__
+        reader = self.engine.checkout(readonly=True)
+        self.assertTrue(reader.readonly)
+        self.assertRaises(sqlite3.OperationalError, reader.delete_user, NEW_USER)
+        self.engine.checkin(reader)
+
+    def test_single_writer(self):
+        '''
+        Test that there is only one writer connection
+        '''
+        print '('+self.test_single_writer.__name__+')', \
+              self.test_single_writer.__doc__
+        writer = self.engine.checkout()
+        self.assertFalse(writer.readonly)
+        self.assertRaises(sqlite3.OperationalError, self.engine.checkout)
+        # Readers are still available
+        reader = self.engine.checkout(readonly=True)
+        self.engine.checkin(reader)
+        self.engine.checkin(writer)
+        stats = self.engine.pool_stats()
+        self.assertEquals(stats['max_size'], 1)
+        self.assertEquals(stats['readers']['checkouts'], 1)
+
+    def test_reader_does_not_wait_for_writer(self):
+        '''
+        Test that a reader sees a consistent snapshot while the writer commits
+        '''
+        print '('+self.test_reader_does_not_wait_for_writer.__name__+')', \
+              self.test_reader_does_not_wait_for_writer.__doc__
+        reader = self.engine.checkout(readonly=True)
+        # Count with SQL, get_users() reads the replica of the Engine
+        count = 'SELECT COUNT(*) FROM Users'
+        # Open a read transaction
+        reader.con.execute("BEGIN")
+        self.assertEquals(reader.con.execute(count).fetchone()[0], INITIAL_SIZE_USER)
+        writer = self.engine.checkout()
+        self.assertEquals(writer.add_user(NEW_USER, {}), NEW_USER)
+        self.engine.checkin(writer)
+        # Snapshot of the read transaction does not change
+        self.assertEquals(reader.con.execute(count).fetchone()[0], INITIAL_SIZE_USER)
+        reader.con.commit()
+        self.assertEquals(reader.con.execute(count).fetchone()[0], INITIAL_SIZE_USER + 1)
+        self.assertEquals(len(reader.get_users()), INITIAL_SIZE_USER + 1)
+        self.engine.checkin(reader)
+        writer = self.engine.checkout()
+        self.assertTrue(writer.delete_user(NEW_USER))
+        self.engine.checkin(writer)
+
+    def test_checkpoint(self):
+        '''
+        Test that checkpoints can be run on demand
+        '''
+        print '('+self.test_checkpoint.__name__+')', \
+              self.test_checkpoint.__doc__
+        busy, log, checkpointed = self.engine.checkpoint("truncate")
+        self.assertEquals(busy, 0)
+        self.assertRaises(ValueError, self.engine.checkpoint, "later")
+
+if __name__ == '__main__':
+    print 'Start running tests'
+    unittest.main()
@@ -0,0 +1,117 @@
+'''
+Testing of the bulk import and export of the database.
+'''
+import unittest, os, sqlite3, tempfile
+from StringIO import StringIO
+from reservation import dataio, database
+
+#Path to the database file, different from the deployment db
+#Please run setup script first to make sure test database is OK.
+DB_PATH = "database/test_tellus.db"
+
+BOOKINGS_CSV = '''bookingID,roomName,username,bookingTime,email
+10,Stage,lam,2017-05-01 10:00,
+11,Chill,para,2017-05-01 at noon,para@example.com
+'''
+
+
+class DataIOTestCase(unittest.TestCase):
+    '''
+    Test cases for the import and export of users, rooms and bookings.
+    '''
+    #INITIATION METHODS
+    def setUp(self):
+        '''
+        Creates an empty database with the schema.
+        '''
+        fd, self.path = tempfile.mkstemp(prefix="tellus_test_", suffix=".db")
+        os.close(fd)
+        dataio.create_database(self.path, data=None)
+
+    def tearDown(self):
+        '''
+        Removes the database.
+        '''
+        os.remove(self.path)
+
+    def _rows(self, path, table):
+        '''
+        Returns all rows of a table.
+        '''
+        con = sqlite3.connect(path)
+        try:
+            return con.execute("SELECT * FROM %s ORDER BY rowid" % table).fetchall()
+        finally:
+            con.close()
+
+    def _indexes(self, path):
+        '''
+        Returns the names of the indexes of Bookings.
+        '''
+        con = sqlite3.connect(path)
+        try:
+            return sorted(row[0] for row in con.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'Bookings'"))
+        finally:
+            con.close()
+
+    def test_export_import(self):
+        '''
+        Test that exported tables are imported back identical
+        '''
+        print '('+self.test_export_import.__name__+')', \
+              self.test_export_import.__doc__
+        for file_format in ('csv', 'ndjson'):
+            os.remove(self.path)
+            dataio.create_database(self.path, data=None)
+            for name in dataio.TABLE_ORDER:
+                stream = StringIO()
+                count = dataio.export_table(DB_PATH, name, stream, file_format)
+                table = dataio.TABLES[name][0]
+                self.assertEquals(count, len(self._rows(DB_PATH, table)))
+                stream.seek(0)
+                self.assertEquals(dataio.import_table(self.path, name, stream, file_format, batch=2), count)
+                # bookingStart is computed again
+                self.assertEquals(self._rows(self.path, table), self._rows(DB_PATH, table))
+            self.assertEquals(self._indexes(self.path), self._indexes(DB_PATH))
+            self.assertEquals(dataio.check_foreign_keys(self.path), 0)
+
+    def test_import_csv_values(self):
+        '''
+        Test that empty values are NULL and wrong times have no start
+        '''
+        print '('+self.test_import_csv_values.__name__+')', \
+              self.test_import_csv_values.__doc__
+        self.assertEquals(dataio.import_table(self.path, 'bookings', StringIO(BOOKINGS_CSV), 'csv'), 2)
+        rows = self._rows(self.path, 'Bookings')
+        self.assertEquals(rows[0], (10, 'Stage', 'lam', '2017-05-01 10:00', None, None, None, None,
+                                    database.to_minutes('2017-05-01 10:00')))
+        self.assertEquals(rows[1][:4], (11, 'Chill', 'para', '2017-05-01 at noon'))
+        self.assertEquals(rows[1][6], 'para@example.com')
+        self.assertIsNone(rows[1][8])
+        # Rooms and users are not checked while importing
+        self.assertEquals(dataio.check_foreign_keys(self.path), 2)
+        self.assertEquals(self._indexes(self.path), self._indexes(DB_PATH))
+
+    def test_import_wrong_file(self):
+        '''
+        Test that unknown columns and repeated bookings are refused
+        '''
+        print '('+self.test_import_wrong_file.__name__+')', \
+              self.test_import_wrong_file.__doc__
+        self.assertRaises(ValueError, dataio.import_table, self.path, 'rooms',
+                          StringIO('roomName,colour\nRed,red\n'), 'csv')
+        self.assertRaises(ValueError, dataio.import_table, self.path, 'rooms',
+                          StringIO('{"roomName": "Red", "resouces": "TV"}\n'), 'ndjson')
+        self.assertEquals(self._rows(self.path, 'Rooms'), [])
+        self.assertRaises(ValueError, dataio.get_format, 'bookings.txt')
+        self.assertEquals(dataio.get_format('bookings.txt', 'ndjson'), 'ndjson')
+        repeated = BOOKINGS_CSV + '12,Stage,onur,2017-05-01 10:00,\n'
+        self.assertRaises(sqlite3.IntegrityError, dataio.import_table, self.path, 'bookings',
+                          StringIO(repeated), 'csv')
+        # The indexes are created again after a failure
+        self.assertEquals(self._indexes(self.path), self._indexes(DB_PATH))
+
+if __name__ == '__main__':
+    print 'Start running tests'
+    unittest.main()
@@ -0,0 +1,169 @@
+import unittest
+import json
+
+import reservation.resources as resources
+import reservation.database as database
+
+#Path to the database file, different from the deployment db
+#Please run setup script first to make sure test database is OK.
+DB_PATH = "database/test_tellus.db"
+ENGINE = database.Engine(DB_PATH)
+
+MASONJSON = "application/vnd.mason+json"
+JSON = "application/json"
+
+# Tell Flask that I am running it in testing mode.
+resources.app.config["TESTING"] = True
+# Necessary for correct translation in url_for
+resources.app.config["SERVER_NAME"] = "localhost:5000"
+
+# Database Engine utilized in our testing
+resources.app.config.update({"Engine": ENGINE})
+
+NEW_BOOKING_REQUEST = {
+    "name": "Stage",
+    "username": "lam",
+    "bookingTime": "2030-03-01 10:00",
+    "email": "lam.huynh@ee.oulu.fi",
+    "familyName": "Huynh",
+    "givenName": "Lam",
+    "telephone": "0411322922"
+}
+BULK_BOOKINGS_REQUEST = [
+    NEW_BOOKING_REQUEST,
+    # Overlaps the booking before
+    dict(NEW_BOOKING_REQUEST, bookingTime="2030-03-01 10:30"),
+    # Same time in another room
+    dict(NEW_BOOKING_REQUEST, name="Chill"),
+    # Overlaps the booking 1 of the database
+    dict(NEW_BOOKING_REQUEST, bookingTime="2017-03-01 12:00"),
+    dict(NEW_BOOKING_REQUEST, name="room"),
+    dict(NEW_BOOKING_REQUEST, bookingTime="2030-03-01 at noon"),
+    {"name": "Stage"},
+    "Stage"
+]
+BULK_BOOKINGS_STATUS = [201, 409, 201, 409, 404, 400, 400, 400]
+# Bookings whose values are not strings, each followed by a valid booking
+NOT_STRING_BOOKINGS_REQUEST = [
+    dict(NEW_BOOKING_REQUEST, bookingTime="2030-04-01 10:00", email=["x"]),
+    dict(NEW_BOOKING_REQUEST, bookingTime="2030-04-01 12:00"),
+    dict(NEW_BOOKING_REQUEST, bookingTime="2030-04-01 14:00", name={"name": "Stage"}),
+    dict(NEW_BOOKING_REQUEST, bookingTime="2030-04-01 16:00", name="Chill"),
+    dict(NEW_BOOKING_REQUEST, bookingTime="2030-04-01 18:00", username=["lam"]),
+    dict(NEW_BOOKING_REQUEST, bookingTime="2030-04-01 20:00", telephone=411322922),
+    dict(NEW_BOOKING_REQUEST, bookingTime="2030-04-01 22:00")
+]
+NOT_STRING_BOOKINGS_STATUS = [400, 201, 400, 201, 400, 400, 201]
+
+
+class BookingsTestCase(unittest.TestCase):
+    # INITIATION AND TEARDOWN METHODS
+    @classmethod
+    def setUpClass(cls):
+        """
+        Setup Class
+        """
+        print "Testing ", cls.__name__
+
+    @classmethod
+    def tearDownClass(cls):
+        """TearDown Class"""
+        print "Testing ENDED for ", cls.__name__
+
+    def setUp(self):
+        """
+        Creates a client to use the API.
+        """
+
+        # Activate app_context for using url_for
+        self.app_context = resources.app.app_context()
+        self.app_context.push()
+        self.connection = ENGINE.connect()
+        # Create a test client
+        self.client = resources.app.test_client()
+        self.url = resources.api.url_for(resources.Bookings)
+
+    def tearDown(self):
+        """
+        Remove all records from database
+        """
+        self.connection.close()
+        self.app_context.pop()
+
+    def _post(self, body, content_type=JSON):
+        """
+        Posts body to the bookings collection.
+        """
+        return self.client.post(self.url, data=json.dumps(body),
+                                headers={"Content-Type": content_type})
+
+    def test_add_bookings_control(self):
+        """
+        Checks that the bookings collection links to the bulk creation
+        """
+        print "(" + self.test_add_bookings_control.__name__ + ")", self.test_add_bookings_control.__doc__
+        resp = self.client.get(self.url)
+        self.assertEquals(resp.status_code, 200)
+        control = json.loads(resp.data)["@controls"]["tellus:add-bookings"]
+        self.assertTrue(self.url.endswith(control["href"]))
+        self.assertEquals(control["method"], "POST")
+        self.assertEquals(control["schema"]["type"], "array")
+        self.assertIn("bookingTime", control["schema"]["items"]["properties"])
+
+    def test_add_bookings(self):
+        """
+        Checks the result of each booking posted at once
+        """
+        print "(" + self.test_add_bookings.__name__ + ")", self.test_add_bookings.__doc__
+        resp = self._post(BULK_BOOKINGS_REQUEST)
+        self.assertEquals(resp.status_code, 200)
+        items = json.loads(resp.data)["items"]
+        self.assertEquals([item["status"] for item in items], BULK_BOOKINGS_STATUS)
+        for item, booking in zip(items, BULK_BOOKINGS_REQUEST):
+            if item["status"] == 201:
+                # The booking is in the database
+                booking_db = self.connection.get_booking(item["bookingID"])
+                self.assertEquals(booking_db["roomname"], booking["name"])
+                self.assertEquals(booking_db["bookingTime"], booking["bookingTime"])
+                url = resources.api.url_for(resources.BookingOfRoom, name=booking["name"],
+                                            booking_id=item["bookingID"])
+                self.assertTrue(url.endswith(item["@controls"]["self"]["href"]))
+            else:
+                self.assertIn("@error", item)
+        # Posting them again adds nothing
+        items = json.loads(self._post(BULK_BOOKINGS_REQUEST).data)["items"]
+        self.assertEquals([item["status"] for item in items],
+                          [409 if status == 201 else status for status in BULK_BOOKINGS_STATUS])
+
+    def test_add_bookings_not_strings(self):
+        """
+        Checks that bookings with values which are not strings are rejected
+        one by one
+        """
+        print "(" + self.test_add_bookings_not_strings.__name__ + ")", self.test_add_bookings_not_strings.__doc__
+        resp = self._post(NOT_STRING_BOOKINGS_REQUEST)
+        self.assertEquals(resp.status_code, 200)
+        items = json.loads(resp.data)["items"]
+        self.assertEquals([item["status"] for item in items], NOT_STRING_BOOKINGS_STATUS)
+        for item, booking in zip(items, NOT_STRING_BOOKINGS_REQUEST):
+            if item["status"] == 201:
+                self.assertEquals(self.connection.get_booking(item["bookingID"])["bookingTime"],
+                                  booking["bookingTime"])
+            else:
+                self.assertIn("@error", item)
+
+    def test_add_bookings_wrong_body(self):
+        """
+        Checks that the body must be a JSON array of bookings
+        """
+        print "(" + self.test_add_bookings_wrong_body.__name__ + ")", self.test_add_bookings_wrong_body.__doc__
+        self.assertEquals(self._post(NEW_BOOKING_REQUEST).status_code, 400)
+        self.assertEquals(self._post([NEW_BOOKING_REQUEST] * (resources.MAX_BULK_BOOKINGS + 1)).status_code, 400)
+        self.assertEquals(self._post([NEW_BOOKING_REQUEST], "text/html").status_code, 415)
+        resp = self._post([])
+        self.assertEquals(resp.status_code, 200)
+        self.assertEquals(json.loads(resp.data)["items"], [])
+
+if __name__ == "__main__":
+    print "Start running tests"
+    unittest.main()
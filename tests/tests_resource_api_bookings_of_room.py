@@ -1,5 +1,6 @@
 import unittest
 import json
+import threading
 
 import reservation.resources as resources
 import reservation.database as database
@@ -21,6 +22,8 @@ resources.app.config["SERVER_NAME"] = "localhost:5000"
 resources.app.config.update({"Engine": ENGINE})
 
 ROOM_NAME = "Stage"
+# Room with several bookings
+PAGED_ROOM_NAME = "Aspire"
 WRONG_ROOM_NAME = "room"
 NEW_BOOKING_REQUEST = {
     "username": "lam",
@@ -38,6 +41,25 @@ CONFLICT_BOOKING_REQUEST = {
     "givenName": "Lam",
     "telephone": "0411322922"
 }
+CONCURRENT_BOOKING_REQUEST = {
+    "username": "lam",
+    "bookingTime": "2030-01-01 10:00",
+    "email": "lam.huynh@ee.oulu.fi",
+    "familyName": "Huynh",
+    "givenName": "Lam",
+    "telephone": "0411322922"
+}
+# Number of clients posting the same booking at once
+CONCURRENT_CLIENTS = 8
+STALE_BOOKING_REQUEST = dict(CONCURRENT_BOOKING_REQUEST, bookingTime="2029-01-01 10:00")
+WRONG_TIME_BOOKING_REQUEST = {
+    "username": "lam",
+    "bookingTime": "2017-03-01 at noon",
+    "email": "lam.huynh@ee.oulu.fi",
+    "familyName": "Huynh",
+    "givenName": "Lam",
+    "telephone": "0411322922"
+}
 WRONG_BOOKING_REQUEST = {
     "mail": "lam.huynh@ee.oulu.fi",
     "family": "Huynh",
@@ -150,6 +172,32 @@ class BookingsOfRoomTestCase(unittest.TestCase):
             self.assertIn("href", item["@controls"]["edit"])
             self.assertIn("encoding", item["@controls"]["edit"])
 
+    def test_get_bookings_of_room_pages(self):
+        """
+        Checks that following the next controls with limit of 1 returns every booking of room once
+        """
+        print "(" + self.test_get_bookings_of_room_pages.__name__ + ")", self.test_get_bookings_of_room_pages.__doc__
+        paged_url = resources.api.url_for(resources.BookingsOfRoom, name=PAGED_ROOM_NAME)
+        resp = self.client.get(paged_url)
+        self.assertEquals(resp.status_code, 200)
+        expected = json.loads(resp.data)["items"]
+        self.assertGreater(len(expected), 1)
+
+        items = []
+        url = paged_url + "?limit=1"
+        while url:
+            resp = self.client.get(url)
+            self.assertEquals(resp.status_code, 200)
+            data = json.loads(resp.data)
+            self.assertLessEqual(len(data["items"]), 1)
+            items.extend(data["items"])
+            url = data["@controls"].get("next", {}).get("href")
+        self.assertEqual(items, expected)
+
+        # Bookings are in order of booking time
+        times = [item["bookingTime"] for item in items]
+        self.assertEqual(times, sorted(times))
+
     def test_get_nonexisting_bookings_of_room(self):
         """
         Try to get nonexisting bookings with wrong roomname.
@@ -182,6 +230,54 @@ class BookingsOfRoomTestCase(unittest.TestCase):
                                 headers={"Content-Type": JSON})
         self.assertEquals(resp.status_code, 409)
 
+    def test_add_concurrent_bookings(self):
+        """
+        Checks that only one of the same bookings posted at once is added
+        """
+        print "("+self.test_add_concurrent_bookings.__name__+")", self.test_add_concurrent_bookings.__doc__
+        statuses = []
+        start = threading.Event()
+
+        def post():
+            client = resources.app.test_client()
+            start.wait()
+            resp = client.post(self.url,
+                               data=json.dumps(CONCURRENT_BOOKING_REQUEST),
+                               headers={"Content-Type": JSON})
+            statuses.append(resp.status_code)
+
+        threads = [threading.Thread(target=post) for _ in xrange(CONCURRENT_CLIENTS)]
+        for thread in threads:
+            thread.start()
+        start.set()
+        for thread in threads:
+            thread.join()
+        self.assertEquals(sorted(statuses), [201] + [409] * (CONCURRENT_CLIENTS - 1))
+        bookings = self.connection.get_bookings(ROOM_NAME, after=CONCURRENT_BOOKING_REQUEST["bookingTime"])
+        self.assertEquals(len(bookings), 1)
+
+    def test_add_booking_deleted_elsewhere(self):
+        """
+        Checks that a booking deleted through another Engine does not conflict
+        """
+        print "("+self.test_add_booking_deleted_elsewhere.__name__+")", self.test_add_booking_deleted_elsewhere.__doc__
+        resp = self.client.post(self.url, data=json.dumps(STALE_BOOKING_REQUEST),
+                                headers={"Content-Type": JSON})
+        self.assertEquals(resp.status_code, 201)
+        booking_id = int(resp.headers["Location"].rstrip("/").rsplit("/", 1)[1])
+        # Another process deletes it, the index of ENGINE still has it
+        engine = database.Engine(DB_PATH)
+        connection = engine.connect()
+        self.assertTrue(connection.delete_booking(booking_id))
+        connection.close()
+        engine.dispose()
+        resp = self.client.post(self.url, data=json.dumps(STALE_BOOKING_REQUEST),
+                                headers={"Content-Type": JSON})
+        self.assertEquals(resp.status_code, 201)
+        resp = self.client.post(self.url, data=json.dumps(STALE_BOOKING_REQUEST),
+                                headers={"Content-Type": JSON})
+        self.assertEquals(resp.status_code, 409)
+
     def test_add_wrong_type(self):
         """
         Checks that returns the correct status code if the Content-Type is wrong
@@ -202,6 +298,16 @@ class BookingsOfRoomTestCase(unittest.TestCase):
                                headers={"Content-Type": JSON})
         self.assertEquals(resp.status_code, 400)
 
+    def test_add_booking_wrong_time(self):
+        """
+        Try to add a booking with a malformed bookingTime
+        """
+        print "("+self.test_add_booking_wrong_time.__name__+")", self.test_add_booking_wrong_time.__doc__
+        resp = self.client.post(self.url,
+                               data=json.dumps(WRONG_TIME_BOOKING_REQUEST),
+                               headers={"Content-Type": JSON})
+        self.assertEquals(resp.status_code, 400)
+
 if __name__ == "__main__":
     print "Start running tests"
     unittest.main()
\ No newline at end of file
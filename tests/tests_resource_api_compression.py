@@ -0,0 +1,150 @@
+import unittest
+import json
+import zlib
+
+import reservation.resources as resources
+import reservation.database as database
+
+#Path to the database file, different from the deployment db
+#Please run setup script first to make sure test database is OK.
+DB_PATH = "database/test_tellus.db"
+ENGINE = database.Engine(DB_PATH)
+
+# Tell Flask that I am running it in testing mode.
+resources.app.config["TESTING"] = True
+# Necessary for correct translation in url_for
+resources.app.config["SERVER_NAME"] = "localhost:5000"
+
+# Database Engine utilized in our testing
+resources.app.config.update({"Engine": ENGINE})
+
+ROOM_NAME = "Aspire"
+URLS = ["/tellus/api/bookings/", "/tellus/api/bookings/history/",
+        "/tellus/api/rooms/%s/bookings/" % ROOM_NAME, "/tellus/api/rooms/"]
+# Small enough for every document of the test database
+MIN_SIZE = 200
+# Window bits of zlib by content coding
+WBITS = {"gzip": 16 + zlib.MAX_WBITS, "deflate": zlib.MAX_WBITS}
+
+
+class CompressionTestCase(unittest.TestCase):
+    # INITIATION AND TEARDOWN METHODS
+    @classmethod
+    def setUpClass(cls):
+        """
+        Setup Class
+        """
+        print "Testing ", cls.__name__
+
+    @classmethod
+    def tearDownClass(cls):
+        """TearDown Class"""
+        print "Testing ENDED for ", cls.__name__
+
+    def setUp(self):
+        """
+        Creates a client to use the API and turns compression on.
+        """
+        self.client = resources.app.test_client()
+        resources.app.config["COMPRESSION"] = True
+        resources.app.config["COMPRESSION_MIN_SIZE"] = MIN_SIZE
+
+    def tearDown(self):
+        """
+        Puts the default compression and streaming back.
+        """
+        resources.app.config["COMPRESSION"] = False
+        resources.app.config["COMPRESSION_MIN_SIZE"] = 1024
+        resources.app.config["STREAM_COLLECTIONS"] = True
+
+    def _get(self, url, accept_encoding=None, **headers):
+        """
+        Returns the response of a GET request with the given Accept-Encoding.
+        """
+        if accept_encoding is not None:
+            headers["Accept-Encoding"] = accept_encoding
+        return self.client.get(url, headers=headers)
+
+    def test_disabled(self):
+        """
+        Checks that nothing is compressed without COMPRESSION
+        """
+        print "(" + self.test_disabled.__name__ + ")", self.test_disabled.__doc__
+        resources.app.config["COMPRESSION"] = False
+        for url in URLS:
+            resp = self._get(url, "gzip, deflate")
+            self.assertEquals(resp.status_code, 200)
+            self.assertNotIn("Content-Encoding", resp.headers)
+            self.assertNotIn("Vary", resp.headers)
+            json.loads(resp.data)
+
+    def test_compressed_bodies(self):
+        """
+        Checks that gzip and deflate bodies are the uncompressed documents
+        """
+        print "(" + self.test_compressed_bodies.__name__ + ")", self.test_compressed_bodies.__doc__
+        for stream in (True, False):
+            resources.app.config["STREAM_COLLECTIONS"] = stream
+            for url in URLS:
+                identity = self._get(url)
+                self.assertNotIn("Content-Encoding", identity.headers)
+                self.assertIn("Accept-Encoding", identity.headers["Vary"])
+                for encoding in ("gzip", "deflate"):
+                    resp = self._get(url, encoding)
+                    self.assertEquals(resp.status_code, 200)
+                    self.assertEquals(resp.headers["Content-Encoding"], encoding)
+                    self.assertIn("Accept-Encoding", resp.headers["Vary"])
+                    if stream and "bookings" in url:
+                        # Collections are still streamed
+                        self.assertNotIn("Content-Length", resp.headers)
+                    else:
+                        self.assertEquals(int(resp.headers["Content-Length"]), len(resp.data))
+                    self.assertEquals(zlib.decompress(resp.data, WBITS[encoding]), identity.data, url)
+
+    def test_negotiation(self):
+        """
+        Checks the choice of the content coding and the minimum size
+        """
+        print "(" + self.test_negotiation.__name__ + ")", self.test_negotiation.__doc__
+        url = URLS[0]
+        self.assertEquals(self._get(url, "gzip, deflate").headers["Content-Encoding"], "gzip")
+        self.assertEquals(self._get(url, "gzip;q=0.5, deflate").headers["Content-Encoding"], "deflate")
+        self.assertEquals(self._get(url, "*").headers["Content-Encoding"], "gzip")
+        for accept_encoding in ("identity", "gzip;q=0", "br"):
+            self.assertNotIn("Content-Encoding", self._get(url, accept_encoding).headers)
+        # Small errors are not compressed
+        resp = self._get("/tellus/api/rooms/Nowhere/", "gzip")
+        self.assertEquals(resp.status_code, 404)
+        self.assertNotIn("Content-Encoding", resp.headers)
+        json.loads(resp.data)
+        # Nor small documents, streamed or not
+        resources.app.config["COMPRESSION_MIN_SIZE"] = 1000000
+        for stream in (True, False):
+            resources.app.config["STREAM_COLLECTIONS"] = stream
+            resp = self._get(url, "gzip")
+            self.assertNotIn("Content-Encoding", resp.headers)
+            self.assertIn("Accept-Encoding", resp.headers["Vary"])
+            self.assertIn("items", json.loads(resp.data))
+
+    def test_etag(self):
+        """
+        Checks that the ETag of a compressed room is weak and still matches
+        """
+        print "(" + self.test_etag.__name__ + ")", self.test_etag.__doc__
+        for url in ("/tellus/api/rooms/", "/tellus/api/rooms/%s/" % ROOM_NAME):
+            resources.app.config["COMPRESSION_MIN_SIZE"] = 0
+            identity = self._get(url)
+            etag = identity.headers["ETag"]
+            self.assertFalse(etag.startswith("W/"))
+            resp = self._get(url, "gzip")
+            self.assertEquals(resp.headers["Content-Encoding"], "gzip")
+            self.assertEquals(resp.headers["ETag"], "W/" + etag)
+            for if_none_match in (etag, resp.headers["ETag"]):
+                resp = self._get(url, "gzip", **{"If-None-Match": if_none_match})
+                self.assertEquals(resp.status_code, 304)
+                self.assertEquals(resp.data, "")
+                self.assertIn("Accept-Encoding", resp.headers["Vary"])
+
+if __name__ == "__main__":
+    print "Start running tests"
+    unittest.main()
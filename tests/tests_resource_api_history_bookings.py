@@ -116,6 +116,39 @@ class HistoryBookingsTestCase(unittest.TestCase):
             self.assertIn("method", item["@controls"]["tellus:delete"])
             self.assertEqual(item["@controls"]["tellus:delete"]["method"], "DELETE")
 
+    def test_get_history_bookings_next_page(self):
+        """
+        Checks that the next control of history bookings leads to the older bookings
+        """
+        print "(" + self.test_get_history_bookings_next_page.__name__ + ")", self.test_get_history_bookings_next_page.__doc__
+        resp = self.client.get(self.url_w_limit)
+        self.assertEquals(resp.status_code, 200)
+        data = json.loads(resp.data)
+        self.assertIn("next", data["@controls"])
+        first_page = data["items"]
+
+        resp = self.client.get(data["@controls"]["next"]["href"])
+        self.assertEquals(resp.status_code, 200)
+        data = json.loads(resp.data)
+        second_page = data["items"]
+        self.assertTrue(second_page)
+        self.assertLessEqual(len(second_page), LIMIT)
+
+        # Latest bookings come first and no booking is repeated
+        times = [item["bookingTime"] for item in first_page + second_page]
+        self.assertEqual(times, sorted(times, reverse=True))
+        deletes = [item["@controls"]["tellus:delete"]["href"] for item in first_page + second_page]
+        self.assertEqual(len(deletes), len(set(deletes)))
+
+    def test_get_history_bookings_wrong_page(self):
+        """
+        Checks that malformed limit and next parameters return 400
+        """
+        print "(" + self.test_get_history_bookings_wrong_page.__name__ + ")", self.test_get_history_bookings_wrong_page.__doc__
+        for query in ("?limit=0", "?limit=two", "?next=notacursor"):
+            resp = self.client.get(self.url + query)
+            self.assertEquals(resp.status_code, 400)
+
 if __name__ == "__main__":
     print "Start running tests"
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,141 @@
+import unittest
+import json
+
+import reservation.resources as resources
+import reservation.database as database
+
+#Path to the database file, different from the deployment db
+#Please run setup script first to make sure test database is OK.
+DB_PATH = "database/test_tellus.db"
+ENGINE = database.Engine(DB_PATH)
+
+# Tell Flask that I am running it in testing mode.
+resources.app.config["TESTING"] = True
+# Necessary for correct translation in url_for
+resources.app.config["SERVER_NAME"] = "localhost:5000"
+
+# Database Engine utilized in our testing
+resources.app.config.update({"Engine": ENGINE})
+
+ROOM_NAME = "Aspire"
+URLS = ["/tellus/api/bookings/", "/tellus/api/rooms/%s/bookings/" % ROOM_NAME,
+        "/tellus/api/rooms/", "/tellus/api/rooms/%s/" % ROOM_NAME, "/tellus/api/rooms/Nowhere/"]
+
+
+def create_document():
+    """
+    Returns a Mason document with the values the encoders may write
+    differently.
+    """
+
+    document = resources.ReservationObject(name=u"Sauna \xe4\xf6", username="caf\xc3\xa9",
+                                           bookingID=12, count=0, isAdmin=True, picture=None,
+                                           text="quote \" backslash \\ tab \t </script>")
+    document.add_namespace("tellus", resources.LINK_RELATIONS_URL)
+    document.add_control("self", href="/tellus/api/bookings/?limit=2&next=a%2Fb")
+    document.add_control_add_bookings()
+    document["items"] = [resources.ReservationObject(bookingID=i, names=["a", u"\u20ac"])
+                         for i in range(3)]
+    return document
+
+
+class JsonEncoderTestCase(unittest.TestCase):
+    # INITIATION AND TEARDOWN METHODS
+    @classmethod
+    def setUpClass(cls):
+        """
+        Setup Class
+        """
+        print "Testing ", cls.__name__
+
+    @classmethod
+    def tearDownClass(cls):
+        """TearDown Class"""
+        print "Testing ENDED for ", cls.__name__
+
+    def setUp(self):
+        """
+        Creates a client to use the API.
+        """
+        self.client = resources.app.test_client()
+        self.render_json = resources.render_json
+
+    def tearDown(self):
+        """
+        Puts the selected encoder and streaming back.
+        """
+        resources.render_json = self.render_json
+        resources.app.config["STREAM_COLLECTIONS"] = True
+
+    def _available_encoders(self):
+        """
+        Returns the encoders of JSON_ENCODERS which are installed, by name.
+        """
+        encoders = {}
+        for name, _ in resources.JSON_ENCODERS:
+            try:
+                encoders[name] = resources.select_json_encoder([name])[1]
+            except ValueError:
+                pass
+        return encoders
+
+    def test_select_encoder(self):
+        """
+        Checks that the first installed encoder is selected
+        """
+        print "(" + self.test_select_encoder.__name__ + ")", self.test_select_encoder.__doc__
+        encoders = self._available_encoders()
+        # The standard library is always there
+        self.assertIn("json", encoders)
+        first = [name for name, _ in resources.JSON_ENCODERS if name in encoders][0]
+        self.assertEquals(resources.JSON_ENCODER, first)
+        self.assertEquals(resources.select_json_encoder()[0], first)
+        self.assertEquals(resources.select_json_encoder(["nosuchjson", "json"])[0], "json")
+        with self.assertRaises(ValueError):
+            resources.select_json_encoder(["nosuchjson"])
+
+    def test_same_document(self):
+        """
+        Checks that every encoder gives a compact document of the same objects
+        """
+        print "(" + self.test_same_document.__name__ + ")", self.test_same_document.__doc__
+        document = create_document()
+        expected = json.loads(json.dumps(document))
+        encoders = self._available_encoders()
+        # The standard library without its C speedups
+        c_make_encoder = resources.json_encoder.c_make_encoder
+        resources.json_encoder.c_make_encoder = None
+        try:
+            encoders["json without speedups"] = resources.select_json_encoder(["json"])[1]
+        finally:
+            resources.json_encoder.c_make_encoder = c_make_encoder
+        for name, encode in encoders.items():
+            text = encode(document)
+            self.assertIsInstance(text, str, name)
+            self.assertEquals(json.loads(text), expected, name)
+            self.assertNotIn(", ", text, name)
+            self.assertNotIn("\\/", text, name)
+            self.assertEquals(len(text), len(json.dumps(document, separators=resources.JSON_SEPARATORS)), name)
+
+    def test_responses(self):
+        """
+        Checks that the responses of every encoder are the same and streamed
+        collections are the same as rendered ones
+        """
+        print "(" + self.test_responses.__name__ + ")", self.test_responses.__doc__
+        bodies = {}
+        for name, encode in self._available_encoders().items():
+            resources.render_json = encode
+            for stream in (True, False):
+                resources.app.config["STREAM_COLLECTIONS"] = stream
+                for url in URLS:
+                    resp = self.client.get(url)
+                    data = json.loads(resp.data)
+                    self.assertEquals(bodies.setdefault(url, data), data, url)
+                    # Compact separators
+                    self.assertNotIn("\": ", resp.data)
+        self.assertEquals(len(bodies[URLS[1]]["items"]), 3)
+
+if __name__ == "__main__":
+    print "Start running tests"
+    unittest.main()
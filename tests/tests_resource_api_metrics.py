@@ -0,0 +1,145 @@
+import unittest
+import json
+
+import reservation.resources as resources
+import reservation.database as database
+import reservation.metrics as metrics
+
+#Path to the database file, different from the deployment db
+#Please run setup script first to make sure test database is OK.
+DB_PATH = "database/test_tellus.db"
+ENGINE = database.Engine(DB_PATH)
+
+JSON = "application/json"
+
+# Tell Flask that I am running it in testing mode.
+resources.app.config["TESTING"] = True
+# Necessary for correct translation in url_for
+resources.app.config["SERVER_NAME"] = "localhost:5000"
+
+# Database Engine utilized in our testing
+resources.app.config.update({"Engine": ENGINE})
+
+METRICS_URL = "/tellus/metrics"
+
+
+class HistogramTestCase(unittest.TestCase):
+    """
+    Test cases of the latency histograms.
+    """
+
+    def test_buckets(self):
+        """
+        Checks that every value is in a bucket at most 1/8 of its size wide
+        """
+        print "(" + self.test_buckets.__name__ + ")", self.test_buckets.__doc__
+        values = range(0, 5000) + [2 ** bits + offset for bits in xrange(13, 37) for offset in (-1, 0, 1)]
+        for value in values:
+            if value > metrics.MAX_VALUE:
+                continue
+            index = metrics.bucket_index(value)
+            lower = metrics.bucket_bound(index - 1) if index else 0
+            self.assertTrue(lower <= value < metrics.bucket_bound(index))
+            self.assertTrue(metrics.bucket_bound(index) - lower <= max(1, value / metrics.SUB_BUCKETS))
+        self.assertEquals(metrics.bucket_index(metrics.MAX_VALUE), metrics.BUCKET_COUNT - 1)
+
+    def test_quantiles(self):
+        """
+        Checks the quantiles, sum and count of a histogram
+        """
+        print "(" + self.test_quantiles.__name__ + ")", self.test_quantiles.__doc__
+        histogram = metrics.Histogram()
+        self.assertEquals(histogram.quantile(0.5), 0.0)
+        # 1 to 1000 milliseconds
+        for value in xrange(1, 1001):
+            histogram.record(value / 1000.0)
+        self.assertEquals(histogram.count, 1000)
+        self.assertAlmostEquals(histogram.sum, 500.5)
+        for share in metrics.QUANTILES:
+            expected = share
+            self.assertTrue(expected <= histogram.quantile(share) <= expected * (1 + 1.0 / metrics.SUB_BUCKETS))
+        self.assertEquals(histogram.quantile(1), 1.0)
+        self.assertEquals(histogram.cumulative()[-1][1], 1000)
+        # Every bound is listed, also when it is empty
+        self.assertEquals([bound for bound, _ in metrics.Histogram().cumulative()],
+                          list(metrics.BUCKET_BOUNDS))
+        for bound, count in histogram.cumulative():
+            self.assertTrue(int(bound * (1 - 1.0 / metrics.SUB_BUCKETS) * 1000) <= count <= int(bound * 1000))
+
+
+class MetricsTestCase(unittest.TestCase):
+    # INITIATION AND TEARDOWN METHODS
+    @classmethod
+    def setUpClass(cls):
+        """
+        Setup Class
+        """
+        print "Testing ", cls.__name__
+
+    @classmethod
+    def tearDownClass(cls):
+        """TearDown Class"""
+        print "Testing ENDED for ", cls.__name__
+
+    def setUp(self):
+        """
+        Creates a client to use the API and empty metrics.
+        """
+        self.metrics = metrics.Metrics()
+        resources.app.config.update({"Metrics": self.metrics})
+        self.client = resources.app.test_client()
+
+    def tearDown(self):
+        """
+        Records the metrics again in a new instance.
+        """
+        resources.app.config.update({"Metrics": metrics.Metrics()})
+
+    def test_request_metrics(self):
+        """
+        Checks that requests are counted by resource, method and status
+        """
+        print "(" + self.test_request_metrics.__name__ + ")", self.test_request_metrics.__doc__
+        self.assertEquals(self.client.get("/tellus/api/rooms/").status_code, 200)
+        self.assertEquals(self.client.get("/tellus/api/rooms/").status_code, 200)
+        # Streamed collection, recorded when the stream ends
+        self.client.get("/tellus/api/bookings/").get_data()
+        self.assertEquals(self.client.put("/tellus/api/rooms/Room/", data=json.dumps({}),
+                                          headers={"Content-Type": JSON}).status_code, 404)
+        snapshot = self.metrics.snapshot()
+        self.assertEquals(snapshot["requests"], {("rooms_list", "GET", 200): 2,
+                                                 ("bookings", "GET", 200): 1,
+                                                 ("room", "PUT", 404): 1})
+        self.assertEquals(snapshot["errors"], {})
+        self.assertEquals(snapshot["latency"][("rooms_list", "GET")].count, 2)
+        self.assertEquals(snapshot["connection_wait"].count, 4)
+
+    def test_metrics_endpoint(self):
+        """
+        Checks the text of the metrics endpoint
+        """
+        print "(" + self.test_metrics_endpoint.__name__ + ")", self.test_metrics_endpoint.__doc__
+        self.client.get("/tellus/api/rooms/")
+        resp = self.client.get(METRICS_URL)
+        self.assertEquals(resp.status_code, 200)
+        self.assertEquals(resp.headers["Content-Type"], metrics.CONTENT_TYPE)
+        lines = resp.data.splitlines()
+        self.assertIn('tellus_http_requests_total{method="GET",resource="rooms_list",status="200"} 1', lines)
+        self.assertIn('tellus_http_request_duration_seconds_bucket{method="GET",resource="rooms_list",le="+Inf"} 1',
+                      lines)
+        self.assertIn('tellus_http_request_duration_seconds_count{method="GET",resource="rooms_list"} 1', lines)
+        # The same buckets in every scrape
+        buckets = [line for line in lines
+                   if line.startswith('tellus_http_request_duration_seconds_bucket{method="GET",resource="rooms_list"')]
+        self.assertEquals(len(buckets), len(metrics.BUCKET_BOUNDS) + 1)
+        self.assertIn('tellus_db_connection_wait_seconds_count 2', lines)
+        self.assertIn('tellus_db_pool_checkouts_total{pool="main"} %d' % ENGINE.pool_stats()["checkouts"], lines)
+        self.assertIn('tellus_db_booking_cache_hits_total %d' % ENGINE.cache_stats()["hits"], lines)
+        self.assertIn('tellus_db_booking_cache_max_size %d' % database.DEFAULT_BOOKING_CACHE_SIZE, lines)
+        # Metrics can be turned off
+        resources.app.config.update({"Metrics": None})
+        self.assertEquals(self.client.get(METRICS_URL).status_code, 404)
+
+if __name__ == "__main__":
+    print "Start running tests"
+    unittest.main()
@@ -92,6 +92,49 @@ class RoomTestCase(unittest.TestCase):
         self.assertEquals(room["picture"], ROOM_REQUEST["photo"])
         self.assertEquals(room["resources"], ROOM_REQUEST["resources"])
 
+    def test_get_room(self):
+        """
+        Checks that a room is returned with its ETag, and 304 while it is not modified
+        """
+        print "(" + self.test_get_room.__name__ + ")", self.test_get_room.__doc__
+        resp = self.client.get(self.url)
+        self.assertEquals(resp.status_code, 200)
+        room = json.loads(resp.data)
+        self.assertEquals(room["name"], ROOM_NAME)
+        self.assertTrue(self.url.endswith(room["@controls"]["self"]["href"]))
+        self.assertIn("edit", room["@controls"])
+        etag = resp.headers["ETag"]
+        self.assertEquals(resp.headers["Cache-Control"], "public, max-age=0, must-revalidate")
+        # Not modified, without a body
+        resp = self.client.get(self.url, headers={"If-None-Match": etag})
+        self.assertEquals(resp.status_code, 304)
+        self.assertEquals(resp.data, "")
+        self.assertEquals(resp.headers["ETag"], etag)
+        self.assertEquals(self.client.get(self.wrong_url).status_code, 404)
+
+    def test_rooms_etag(self):
+        """
+        Checks that the ETag of the rooms changes when a room is modified
+        """
+        print "(" + self.test_rooms_etag.__name__ + ")", self.test_rooms_etag.__doc__
+        rooms_url = resources.api.url_for(resources.RoomsList)
+        resp = self.client.get(rooms_url)
+        self.assertEquals(resp.status_code, 200)
+        etag = resp.headers["ETag"]
+        self.assertEquals(self.client.get(rooms_url, headers={"If-None-Match": etag}).status_code, 304)
+        self.assertEquals(self.client.get(rooms_url, headers={"If-None-Match": '"other", ' + etag}).status_code, 304)
+        self.assertEquals(self.client.get(rooms_url, headers={"If-None-Match": '"other"'}).status_code, 200)
+        resp = self.client.put(self.url,
+                               data=json.dumps(ROOM_REQUEST),
+                               headers={"Content-Type": JSON})
+        self.assertEquals(resp.status_code, 204)
+        # The rooms are sent again with a new ETag
+        resp = self.client.get(rooms_url, headers={"If-None-Match": etag})
+        self.assertEquals(resp.status_code, 200)
+        self.assertNotEquals(resp.headers["ETag"], etag)
+        self.assertEquals(json.loads(resp.data)["items"][0]["photo"], ROOM_REQUEST["photo"])
+        self.assertEquals(self.client.get(self.url, headers={"If-None-Match": etag}).status_code, 200)
+
     def test_modify_unexisting_room(self):
         """
         Try to modify a room that does not exist
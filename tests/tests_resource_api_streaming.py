@@ -0,0 +1,145 @@
+import unittest
+import json
+import sqlite3
+
+import reservation.resources as resources
+import reservation.database as database
+
+#Path to the database file, different from the deployment db
+#Please run setup script first to make sure test database is OK.
+DB_PATH = "database/test_tellus.db"
+ENGINE = database.Engine(DB_PATH)
+
+MASONJSON = "application/vnd.mason+json"
+JSON = "application/json"
+
+# Tell Flask that I am running it in testing mode.
+resources.app.config["TESTING"] = True
+# Necessary for correct translation in url_for
+resources.app.config["SERVER_NAME"] = "localhost:5000"
+
+# Database Engine utilized in our testing
+resources.app.config.update({"Engine": ENGINE})
+
+ROOM_NAME = "Aspire"
+USERNAME = "lam"
+LIMIT_PARAM = "?limit=1"
+
+
+class StreamingTestCase(unittest.TestCase):
+    # INITIATION AND TEARDOWN METHODS
+    @classmethod
+    def setUpClass(cls):
+        """
+        Setup Class
+        """
+        print "Testing ", cls.__name__
+
+    @classmethod
+    def tearDownClass(cls):
+        """TearDown Class"""
+        print "Testing ENDED for ", cls.__name__
+
+    def setUp(self):
+        """
+        Creates a client to use the API.
+        """
+        # Activate app_context for using url_for
+        self.app_context = resources.app.app_context()
+        self.app_context.push()
+        # Create a test client
+        self.client = resources.app.test_client()
+        self.urls = [resources.api.url_for(resources.Bookings),
+                     resources.api.url_for(resources.BookingsOfRoom, name=ROOM_NAME),
+                     resources.api.url_for(resources.BookingsOfUser, username=USERNAME),
+                     resources.api.url_for(resources.HistoryBookings)]
+
+    def tearDown(self):
+        """
+        Turn streaming back on.
+        """
+        resources.app.config["STREAM_COLLECTIONS"] = True
+        self.app_context.pop()
+
+    def _get_body(self, url, stream):
+        """
+        Returns the body of a GET request with streaming on or off.
+        """
+        resources.app.config["STREAM_COLLECTIONS"] = stream
+        resp = self.client.get(url)
+        self.assertEquals(resp.status_code, 200)
+        return resp.data
+
+    def test_streamed_body_identical(self):
+        """
+        Checks that streamed collections are byte-identical to rendered ones
+        """
+        print "(" + self.test_streamed_body_identical.__name__ + ")", self.test_streamed_body_identical.__doc__
+        for url in self.urls:
+            for query in ("", LIMIT_PARAM):
+                streamed = self._get_body(url + query, True)
+                rendered = self._get_body(url + query, False)
+                self.assertEqual(streamed, rendered, url + query)
+                data = json.loads(streamed)
+                self.assertIn("items", data)
+                if query:
+                    self.assertEqual(len(data["items"]), 1)
+                    self.assertIn("next", data["@controls"])
+
+    def test_streamed_in_chunks(self):
+        """
+        Checks that a collection is sent as several chunks without a length
+        """
+        print "(" + self.test_streamed_in_chunks.__name__ + ")", self.test_streamed_in_chunks.__doc__
+        resp = self.client.get(self.urls[0])
+        self.assertEquals(resp.status_code, 200)
+        self.assertNotIn("Content-Length", resp.headers)
+        chunks = list(resp.response)
+        # Head, one chunk per item and tail
+        items = json.loads("".join(chunks))["items"]
+        self.assertEqual(len(chunks), len(items) + 2)
+
+    def test_next_control_added_before_rendering(self):
+        """
+        Checks that the next control is in the envelope before the items are
+        rendered
+        """
+        print "(" + self.test_next_control_added_before_rendering.__name__ + ")", \
+            self.test_next_control_added_before_rendering.__doc__
+        url = self.urls[0]
+        with resources.app.test_request_context(url + LIMIT_PARAM):
+            # Borrow the connection, it is given back when the context ends
+            resources.app.preprocess_request()
+            envelope = resources.ReservationObject()
+            page = resources.get_bookings_page(envelope, url)
+            self.assertIn("next", envelope["@controls"])
+            self.assertEqual(len(page), 1)
+
+    def test_database_error_before_streaming(self):
+        """
+        Checks that a database error while reading a collection is answered
+        with 500 instead of a cut-off document
+        """
+        print "(" + self.test_database_error_before_streaming.__name__ + ")", \
+            self.test_database_error_before_streaming.__doc__
+
+        def iter_bookings(*args, **kwargs):
+            raise sqlite3.OperationalError("no such column: bookingStart")
+
+        original = database.Connection.iter_bookings
+        database.Connection.iter_bookings = iter_bookings
+        resources.app.config["PROPAGATE_EXCEPTIONS"] = False
+        try:
+            resp = self.client.get(self.urls[0])
+        finally:
+            database.Connection.iter_bookings = original
+            resources.app.config["PROPAGATE_EXCEPTIONS"] = None
+        self.assertEquals(resp.status_code, 500)
+        # A whole error document, not the start of the collection
+        data = json.loads(resp.data)
+        self.assertIn("@error", data)
+        self.assertNotIn("items", data)
+
+if __name__ == "__main__":
+    print "Start running tests"
+    unittest.main()
@@ -0,0 +1,102 @@
+import unittest
+import json
+
+import reservation.resources as resources
+import reservation.database as database
+
+#Path to the database file, different from the deployment db
+#Please run setup script first to make sure test database is OK.
+DB_PATH = "database/test_tellus.db"
+ENGINE = database.Engine(DB_PATH)
+
+# Tell Flask that I am running it in testing mode.
+resources.app.config["TESTING"] = True
+# Necessary for correct translation in url_for
+resources.app.config["SERVER_NAME"] = "localhost:5000"
+
+# Database Engine utilized in our testing
+resources.app.config.update({"Engine": ENGINE})
+
+# Values which url_for quotes
+NAMES = ["Stage", "Big Room", u"Sauna \xe4\xf6", "A/B", "50%", "What?", "Room#1", "a+b", "x:y"]
+BOOKING_IDS = [1, 25, "7"]
+ROOM_NAME = "Aspire"
+USER_NAME = "lam"
+
+
+class UrlTemplatesTestCase(unittest.TestCase):
+    # INITIATION AND TEARDOWN METHODS
+    @classmethod
+    def setUpClass(cls):
+        """
+        Setup Class
+        """
+        print "Testing ", cls.__name__
+
+    @classmethod
+    def tearDownClass(cls):
+        """TearDown Class"""
+        print "Testing ENDED for ", cls.__name__
+
+    def setUp(self):
+        """
+        Creates a client to use the API.
+        """
+        self.client = resources.app.test_client()
+
+    def test_compiled_routes(self):
+        """
+        Checks that every resource of the API has a template
+        """
+        print "(" + self.test_compiled_routes.__name__ + ")", self.test_compiled_routes.__doc__
+        self.assertEquals(set(resources.URL_TEMPLATES), set(resources.api.endpoints))
+        self.assertEquals(resources.URL_TEMPLATES["booking_of_room"].template,
+                          "/tellus/api/rooms/%s/bookings/%s/")
+
+    def test_same_urls_as_url_for(self):
+        """
+        Checks that the templates build the URLs of url_for
+        """
+        print "(" + self.test_same_urls_as_url_for.__name__ + ")", self.test_same_urls_as_url_for.__doc__
+        for script_root in ("", "/app"):
+            with resources.app.test_request_context("/", base_url="http://localhost:5000" + script_root):
+                for name in NAMES:
+                    self.assertEquals(resources.URL_TEMPLATES["room"].expand(name=name),
+                                      resources.api.url_for(resources.Room, name=name))
+                    self.assertEquals(resources.URL_TEMPLATES["user"].expand(username=name),
+                                      resources.api.url_for(resources.User, username=name))
+                    for booking_id in BOOKING_IDS:
+                        self.assertEquals(resources.URL_TEMPLATES["booking_of_room"].expand(
+                                              name=name, booking_id=booking_id),
+                                          resources.api.url_for(resources.BookingOfRoom, name=name,
+                                                                booking_id=booking_id))
+                self.assertEquals(resources.URL_TEMPLATES["history_bookings"].expand(),
+                                  resources.api.url_for(resources.HistoryBookings))
+                self.assertTrue(resources.URL_TEMPLATES["rooms_list"].expand().startswith(script_root + "/"))
+
+    def test_item_controls(self):
+        """
+        Checks the controls of the booking items built from the templates
+        """
+        print "(" + self.test_item_controls.__name__ + ")", self.test_item_controls.__doc__
+        resp = self.client.get("/tellus/api/rooms/%s/bookings/" % ROOM_NAME)
+        items = json.loads(resp.data)["items"]
+        self.assertTrue(items)
+        with resources.app.test_request_context("/"):
+            for item in items:
+                controls = item["@controls"]
+                booking_id = controls["tellus:delete"]["href"].split("/")[-2]
+                self.assertEquals(controls["tellus:delete"]["href"],
+                                  resources.api.url_for(resources.BookingOfRoom, name=ROOM_NAME,
+                                                        booking_id=booking_id))
+                self.assertEquals(controls["collection"]["href"],
+                                  resources.api.url_for(resources.BookingsOfRoom, name=ROOM_NAME))
+                self.assertEquals(controls["edit"]["schema"], resources.BOOKING_SCHEMA)
+        resp = self.client.get("/tellus/api/users/%s/bookings/" % USER_NAME)
+        for item in json.loads(resp.data)["items"]:
+            self.assertTrue(item["@controls"]["tellus:delete"]["href"].startswith(
+                "/tellus/api/users/%s/bookings/" % USER_NAME))
+
+if __name__ == "__main__":
+    print "Start running tests"
+    unittest.main()